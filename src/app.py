@@ -1,12 +1,22 @@
+import asyncio
+import base64
+import functools
+import gzip
+import hashlib
 import json
 import logging
+import os
 import re
-import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
-from time import monotonic
-from typing import Dict, List, Mapping
+from time import monotonic, perf_counter, time as wall_time
+from typing import AsyncIterator, Callable, Dict, List, Mapping, Tuple, TypeVar
 
 import yaml
 from fastapi import (
@@ -20,12 +30,40 @@ from fastapi import (
     Response,
 )
 from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, generate_latest
-from jsonschema.exceptions import ValidationError
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
 
+from .auth_backoff import BackoffBackendError, build_backoff_tracker
 from .config import MODULES_DIR, DATA_DIR, settings
-from tools.generate_build_db import schema_for_mode, validate_with_schema
+from .knowledge_index import (
+    KnowledgeIndexUnavailable,
+    PageIndex,
+    build_index,
+    ensure_indexes,
+    is_indexable,
+    load_index,
+)
+from .module_manifest import (
+    DirectoryManifest,
+    FileSignature,
+    ManifestEntry,
+    ManifestWatcher,
+    file_signature,
+)
+from .taverna_saves import QuotaLedger
+from .module_search import SearchIndex
+from .module_sections import SectionSpan, build_section_index
+from tools.schema_validation import schema_for_mode, validate_with_schema
 
+try:  # pragma: no cover - dipendenza opzionale (pip install brotli)
+    import brotli
+except ModuleNotFoundError:  # pragma: no cover - si negozia solo gzip
+    brotli = None  # type: ignore[assignment]
 
 REFERENCE_MANIFEST_PATH = (
     Path(__file__).resolve().parent.parent / "data" / "reference" / "manifest.json"
@@ -37,7 +75,18 @@ async def lifespan(_: FastAPI):
     """Perform startup checks using FastAPI lifespan API."""
 
     _validate_directories(raise_on_error=True)
-    yield
+    _stub_progressions()
+    _load_reference_manifest()
+    _search_index().refresh()
+    if settings.knowledge_index_on_startup:
+        _build_knowledge_indexes()
+    watcher = _start_manifest_watcher()
+    try:
+        yield
+    finally:
+        watcher.stop()
+        _shutdown_blocking_executor()
+        _failed_attempts.close()
 
 
 app = FastAPI(
@@ -48,7 +97,12 @@ app = FastAPI(
 )
 
 
-_failed_attempts: Dict[str, Dict[str, float | int]] = {}
+_failed_attempts = build_backoff_tracker(
+    settings.auth_backoff_backend,
+    max_entries=settings.auth_backoff_max_clients,
+    sqlite_path=settings.auth_backoff_sqlite_path,
+    redis_url=settings.auth_backoff_redis_url,
+)
 
 
 REQUEST_COUNT = Counter(
@@ -61,15 +115,65 @@ ERROR_COUNT = Counter(
     "Totale risposte di errore (4xx/5xx) per endpoint, metodo e classe di status.",
     labelnames=["endpoint", "method", "status_class"],
 )
+REQUEST_LATENCY = Histogram(
+    "app_request_duration_seconds",
+    "Durata delle richieste per route e metodo, fino all'invio degli header.",
+    labelnames=["endpoint", "method"],
+    buckets=settings.metrics_latency_buckets,
+)
+RESPONSE_SIZE = Histogram(
+    "app_response_size_bytes",
+    "Dimensione del corpo delle risposte per route e metodo.",
+    labelnames=["endpoint", "method"],
+    buckets=settings.metrics_size_buckets,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "app_requests_in_flight",
+    "Richieste HTTP attualmente in elaborazione.",
+)
 AUTH_BACKOFF_TRIGGER = Counter(
     "auth_backoff_trigger_total",
     "Numero di volte in cui è stato attivato il backoff sull'autenticazione.",
 )
+AUTH_BACKOFF_TRACKED_CLIENTS = Gauge(
+    "app_auth_backoff_tracked_clients",
+    "Client con tentativi di autenticazione falliti ancora tracciati.",
+)
 DIRECTORY_STATUS = Gauge(
     "app_directory_status",
     "Stato delle directory configurate: 1 ok, 0 errore.",
     labelnames=["directory"],
 )
+MODULE_CACHE_HITS = Counter(
+    "app_module_cache_hits_total",
+    "Letture di moduli servite dalla cache in memoria.",
+)
+MODULE_CACHE_MISSES = Counter(
+    "app_module_cache_misses_total",
+    "Letture di moduli che hanno richiesto un accesso al disco.",
+)
+MODULE_CACHE_EVICTIONS = Counter(
+    "app_module_cache_evictions_total",
+    "Voci rimosse dalla cache moduli per rispettare il tetto di memoria.",
+)
+MODULE_CACHE_BYTES = Gauge(
+    "app_module_cache_bytes",
+    "Byte attualmente occupati dalla cache moduli.",
+)
+STUB_CACHE_HITS = Counter(
+    "app_stub_cache_hits_total",
+    "Risposte stub del builder servite dalla memo cache.",
+)
+STUB_CACHE_MISSES = Counter(
+    "app_stub_cache_misses_total",
+    "Risposte stub del builder generate e validate da zero.",
+)
+STUB_STEP_LATENCY = Histogram(
+    "app_stub_builder_step_seconds",
+    "Durata delle fasi dello stub builder (build, validate, serialize) per modalità.",
+    labelnames=["step", "mode"],
+    buckets=settings.metrics_latency_buckets,
+)
 
 
 REQUIRED_MODULE_FILES = [
@@ -81,21 +185,151 @@ REQUIRED_MODULE_FILES = [
 TAVERNA_SAVES_DIR = MODULES_DIR / "taverna_saves"
 TAVERNA_SAVES_MAX_FILES = 200
 
+_T = TypeVar("_T")
+_blocking_executor: ThreadPoolExecutor | None = None
+_blocking_executor_lock = threading.Lock()
+
+
+def _get_blocking_executor() -> ThreadPoolExecutor | None:
+    """Return the shared I/O pool, or ``None`` when ``API_IO_WORKERS=0``."""
+
+    global _blocking_executor
+
+    if settings.api_io_workers <= 0:
+        return None
+    with _blocking_executor_lock:
+        if _blocking_executor is None:
+            _blocking_executor = ThreadPoolExecutor(
+                max_workers=settings.api_io_workers, thread_name_prefix="api-io"
+            )
+        return _blocking_executor
+
+
+async def _run_blocking(func: Callable[..., _T], /, *args, **kwargs) -> _T:
+    """Run filesystem/validation work on the bounded pool, off the event loop.
+
+    Exceptions (including ``HTTPException``) propagate to the caller unchanged.
+    """
+
+    call = functools.partial(func, *args, **kwargs)
+    executor = _get_blocking_executor()
+    if executor is None:
+        return call()
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+def _shutdown_blocking_executor() -> None:
+    """Stop the I/O pool; the next request lazily creates a new one."""
+
+    global _blocking_executor
+
+    with _blocking_executor_lock:
+        executor, _blocking_executor = _blocking_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
 
 def _reset_failed_attempts() -> None:
-    """Utility to clear the in-memory tracker (mainly for tests)."""
+    """Utility to clear the backoff tracker (mainly for tests)."""
 
     _failed_attempts.clear()
 
 
+def _backoff_now() -> float:
+    """Clock of the backoff tracker: wall time when shared across processes."""
+
+    return wall_time() if _failed_attempts.shared else monotonic()
+
+
+async def _backoff_call(method: Callable[..., _T], /, *args, **kwargs) -> _T | None:
+    """Run a tracker operation; shared backends use the I/O pool and fail open."""
+
+    if not _failed_attempts.shared:
+        return method(*args, **kwargs)
+    try:
+        return await _run_blocking(method, *args, **kwargs)
+    except BackoffBackendError as exc:
+        logging.warning(
+            "Authentication backoff backend unavailable",
+            extra={"event": "auth_backoff_backend_error", "error": str(exc)},
+        )
+        return None
+
+
+def _tracked_backoff_clients() -> float:
+    try:
+        return _failed_attempts.tracked(_backoff_now())
+    except BackoffBackendError:
+        return float("nan")
+
+
+@dataclass(frozen=True)
+class _ReferenceManifestSnapshot:
+    signature: FileSignature
+    manifest: Mapping[str, object]
+    loaded_at: datetime
+
+
+_reference_manifest_snapshot: _ReferenceManifestSnapshot | None = None
+_reference_manifest_lock = threading.Lock()
+
+
 def _load_reference_manifest() -> Mapping[str, object]:
+    """Return the parsed reference manifest, re-reading it only when it changes.
+
+    The file is parsed once per ``(mtime_ns, size, inode)`` signature, so the
+    request path only pays a ``stat``. The returned mapping is shared: callers
+    must not mutate it.
+    """
+
+    global _reference_manifest_snapshot
+
     try:
-        manifest = json.loads(REFERENCE_MANIFEST_PATH.read_text(encoding="utf-8"))
-    except Exception as exc:  # pragma: no cover - safety net for missing fixtures
+        signature = file_signature(REFERENCE_MANIFEST_PATH.stat())
+    except OSError as exc:  # pragma: no cover - safety net for missing fixtures
         logging.error("Impossibile leggere il manifest di riferimento: %s", exc)
         return {}
 
-    return manifest if isinstance(manifest, Mapping) else {}
+    snapshot = _reference_manifest_snapshot
+    if snapshot is not None and snapshot.signature == signature:
+        return snapshot.manifest
+
+    with _reference_manifest_lock:
+        snapshot = _reference_manifest_snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot.manifest
+        try:
+            manifest = json.loads(REFERENCE_MANIFEST_PATH.read_text(encoding="utf-8"))
+        except Exception as exc:  # pragma: no cover - safety net for broken fixtures
+            logging.error("Impossibile leggere il manifest di riferimento: %s", exc)
+            manifest = {}
+        if not isinstance(manifest, Mapping):
+            manifest = {}
+        _reference_manifest_snapshot = _ReferenceManifestSnapshot(
+            signature=signature,
+            manifest=manifest,
+            loaded_at=datetime.now(timezone.utc),
+        )
+        return manifest
+
+
+def _reset_reference_manifest() -> None:
+    """Utility to force a re-read of the reference manifest (mainly for tests)."""
+
+    global _reference_manifest_snapshot
+
+    _reference_manifest_snapshot = None
+
+
+def _reference_catalog_status() -> Dict[str, object]:
+    version = _reference_catalog_version()
+    snapshot = _reference_manifest_snapshot
+    return {
+        "status": "ok" if version else "error",
+        "version": version,
+        "loaded_at": snapshot.loaded_at.isoformat() if snapshot else None,
+        "path": str(REFERENCE_MANIFEST_PATH),
+    }
 
 
 def _reference_catalog_version() -> str | None:
@@ -119,11 +353,11 @@ async def require_api_key(
     """Validate the provided API key header against settings and apply backoff."""
 
     client_id = _client_identifier(request)
-    now = monotonic()
-    attempt_state = _failed_attempts.get(client_id, {"count": 0, "blocked_until": 0.0})
+    now = _backoff_now()
+    attempt = await _backoff_call(_failed_attempts.lookup, client_id, now)
 
-    if now < attempt_state.get("blocked_until", 0.0):
-        retry_after = int(attempt_state["blocked_until"] - now)
+    if attempt is not None and now < attempt.blocked_until:
+        retry_after = int(attempt.blocked_until - now)
         logging.warning(
             "Authentication backoff active",
             extra={
@@ -139,7 +373,8 @@ async def require_api_key(
         )
 
     if settings.allow_anonymous:
-        _failed_attempts.pop(client_id, None)
+        if attempt is not None:
+            await _backoff_call(_failed_attempts.discard, client_id)
         return
 
     if settings.api_key is None:
@@ -151,46 +386,43 @@ async def require_api_key(
         )
 
     if x_api_key != settings.api_key:
-        updated_count = int(attempt_state.get("count", 0)) + 1
+        attempt = await _backoff_call(
+            _failed_attempts.record_failure,
+            client_id,
+            now,
+            threshold=settings.auth_backoff_threshold,
+            window=settings.auth_backoff_seconds,
+        )
         logging.warning(
             "Authentication failed",
             extra={
                 "event": "auth_failed",
                 "client_ip": client_id,
-                "fail_count": updated_count,
+                "fail_count": attempt.count if attempt is not None else None,
                 "headers": dict(request.headers),
             },
         )
-        blocked_until = attempt_state.get("blocked_until", 0.0)
-        if updated_count >= settings.auth_backoff_threshold:
-            blocked_until = now + settings.auth_backoff_seconds
+        if attempt is not None and attempt.count >= settings.auth_backoff_threshold:
             logging.warning(
                 "Authentication backoff triggered",
                 extra={
                     "event": "auth_backoff_triggered",
                     "client_ip": client_id,
-                    "fail_count": updated_count,
+                    "fail_count": attempt.count,
                     "retry_after": settings.auth_backoff_seconds,
                 },
             )
             AUTH_BACKOFF_TRIGGER.inc()
-            _failed_attempts[client_id] = {
-                "count": updated_count,
-                "blocked_until": blocked_until,
-            }
             raise HTTPException(
                 status_code=429,
                 detail="Troppi tentativi non autorizzati, riprova più tardi",
                 headers={"Retry-After": str(settings.auth_backoff_seconds)},
             )
 
-        _failed_attempts[client_id] = {
-            "count": updated_count,
-            "blocked_until": blocked_until,
-        }
         raise HTTPException(status_code=401, detail="Invalid or missing API key")
 
-    _failed_attempts.pop(client_id, None)
+    if attempt is not None:
+        await _backoff_call(_failed_attempts.discard, client_id)
 
 
 def _is_metrics_ip_allowed(request: Request) -> bool:
@@ -221,23 +453,152 @@ async def require_metrics_access(
     raise HTTPException(status_code=403, detail="Accesso alle metriche non autorizzato")
 
 
-def _list_files(base: Path) -> List[Dict]:
-    out: List[Dict] = []
+_manifests: Dict[Tuple[str, Path], DirectoryManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def _manifest_for(kind: str, base: Path) -> DirectoryManifest:
+    key = (kind, base)
+    manifest = _manifests.get(key)
+    if manifest is None:
+        with _manifests_lock:
+            manifest = _manifests.get(key)
+            if manifest is None:
+                parser = _module_metadata_from_bytes if kind == "modules" else None
+                manifest = DirectoryManifest(base, metadata_parser=parser)
+                _manifests[key] = manifest
+    return manifest
+
+
+def _modules_manifest() -> DirectoryManifest:
+    return _manifest_for("modules", MODULES_DIR)
+
+
+def _knowledge_manifest() -> DirectoryManifest:
+    return _manifest_for("knowledge", DATA_DIR)
+
+
+def _start_manifest_watcher() -> ManifestWatcher:
+    """Build the module/knowledge manifests and start keeping them in sync."""
+
+    manifests = [_modules_manifest(), _knowledge_manifest()]
+    for manifest in manifests:
+        if manifest.base.is_dir():
+            manifest.rescan()
+    # il ledger delle quote espone la stessa interfaccia base/rescan/refresh
+    watched = [*manifests, _taverna_ledger()]
+
+    watcher = ManifestWatcher(
+        watched,
+        mode=settings.module_manifest_watch,
+        poll_interval=settings.module_manifest_poll_seconds,
+    )
+    watcher.start()
+    return watcher
+
+
+def _lookup_manifest_entry(
+    manifest: DirectoryManifest,
+    base: Path,
+    name: str,
+    *,
+    invalid_detail: str,
+    missing_detail: str,
+) -> ManifestEntry:
+    """Resolve ``name`` under ``base`` and return its manifest entry (400/404)."""
+
+    path = (base / Path(name)).resolve()
+    if not path.is_relative_to(base):
+        raise HTTPException(status_code=400, detail=invalid_detail)
+    entry = manifest.lookup(path)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=missing_detail)
+    return entry
+
+
+_search_indexes: Dict[Tuple[Path, Path], SearchIndex] = {}
+
+
+def _search_index() -> SearchIndex:
+    """Return the search index for the configured module directories."""
+
+    key = (MODULES_DIR, DATA_DIR)
+    with _manifests_lock:
+        index = _search_indexes.get(key)
+        if index is None:
+            index = SearchIndex({"modules": MODULES_DIR, "data": DATA_DIR / "modules"})
+            _search_indexes[key] = index
+        return index
+
+
+_taverna_ledgers: Dict[Path, QuotaLedger] = {}
+
+
+def _taverna_ledger() -> QuotaLedger:
+    """Return the quota ledger of the configured taverna_saves directory."""
+
+    with _manifests_lock:
+        ledger = _taverna_ledgers.get(TAVERNA_SAVES_DIR)
+        if ledger is None:
+            ledger = QuotaLedger(
+                TAVERNA_SAVES_DIR, ttl=settings.taverna_saves_quota_ttl_seconds
+            )
+            _taverna_ledgers[TAVERNA_SAVES_DIR] = ledger
+        return ledger
+
+
+_knowledge_indexes: Dict[Tuple[Path, str], PageIndex] = {}
+_knowledge_index_build_lock = threading.Lock()
+
+
+def _knowledge_page_index(entry: ManifestEntry, *, build: bool) -> PageIndex | None:
+    """Return the sidecar page index of a knowledge PDF, loaded once per version.
+
+    With ``build`` a missing or stale index is extracted on the spot, one PDF
+    at a time; otherwise ``None`` is returned until it has been built.
+    """
+
+    index_dir = settings.knowledge_index_dir
+    key = (index_dir, entry.name)
+    cached = _knowledge_indexes.get(key)
+    if cached is not None and cached.source_sha256 == entry.sha256:
+        return cached
+    index = load_index(index_dir, entry.name, entry.sha256)
+    if index is None and build:
+        with _knowledge_index_build_lock:
+            # un'altra richiesta può averlo costruito mentre si attendeva
+            index = load_index(index_dir, entry.name, entry.sha256)
+            if index is None:
+                index = build_index(
+                    DATA_DIR / entry.name, index_dir, source_sha256=entry.sha256
+                )
+    if index is not None:
+        with _manifests_lock:
+            _knowledge_indexes[key] = index
+    return index
+
+
+def _build_knowledge_indexes() -> None:
+    """Extract missing or stale PDF page indexes before serving (startup)."""
+
+    if not DATA_DIR.is_dir():
+        return
+    try:
+        outcomes = ensure_indexes(DATA_DIR, settings.knowledge_index_dir)
+    except (KnowledgeIndexUnavailable, OSError) as exc:
+        logging.warning("Indici pagine knowledge non generati: %s", exc)
+        return
+    logging.info("Indici pagine knowledge: %s", outcomes)
+
+
+def _list_files(manifest: DirectoryManifest) -> List[Dict]:
+    base = manifest.base
     if not base.exists() or not base.is_dir():
         raise HTTPException(
             status_code=503,
             detail=f"Directory di configurazione non trovata: {base}",
         )
-    for p in sorted(base.iterdir()):
-        if p.is_file():
-            out.append(
-                {
-                    "name": p.name,
-                    "size_bytes": p.stat().st_size,
-                    "suffix": p.suffix,
-                }
-            )
-    return out
+    return list(manifest.current().listing)
 
 
 def _parse_json_module_metadata(
@@ -274,29 +635,30 @@ def _parse_json_module_metadata(
 
 
 def _taverna_saves_metrics() -> Dict[str, object]:
-    if not TAVERNA_SAVES_DIR.exists() or not TAVERNA_SAVES_DIR.is_dir():
+    try:
+        quota = _taverna_ledger().snapshot()
+    except OSError:
+        quota = None
+    if quota is None or not TAVERNA_SAVES_DIR.is_dir():
         raise HTTPException(
             status_code=503,
             detail=f"Directory taverna_saves non trovata: {TAVERNA_SAVES_DIR}",
         )
 
-    files = [p for p in TAVERNA_SAVES_DIR.iterdir() if p.is_file()]
-    file_count = len(files)
-    total_size = sum(p.stat().st_size for p in files)
-    disk_usage = shutil.disk_usage(TAVERNA_SAVES_DIR)
-
+    file_count = quota.file_count
     return {
         "path": str(TAVERNA_SAVES_DIR),
         "max_files": TAVERNA_SAVES_MAX_FILES,
         "current_files": file_count,
         "remaining_files": max(TAVERNA_SAVES_MAX_FILES - file_count, 0),
-        "total_size_bytes": total_size,
+        "total_size_bytes": quota.total_bytes,
+        "oldest_file": quota.oldest.name if quota.oldest is not None else None,
         "disk_usage": {
-            "total_bytes": disk_usage.total,
-            "used_bytes": disk_usage.used,
-            "free_bytes": disk_usage.free,
+            "total_bytes": quota.disk_total_bytes,
+            "used_bytes": quota.disk_used_bytes,
+            "free_bytes": quota.disk_free_bytes,
         },
-        "quota_ok": file_count < TAVERNA_SAVES_MAX_FILES and disk_usage.free > 0,
+        "quota_ok": file_count < TAVERNA_SAVES_MAX_FILES and quota.disk_free_bytes > 0,
     }
 
 
@@ -333,12 +695,18 @@ def _taverna_saves_metadata() -> Dict[str, object]:
 @app.get("/health")
 async def health() -> Dict[str, Dict]:
     """Simple healthcheck for Actions."""
-    diagnostic = _validate_directories()
+    diagnostic = await _run_blocking(_health_diagnostic)
     status_code = 200 if diagnostic["status"] == "ok" else 503
 
     return JSONResponse(status_code=status_code, content=diagnostic)
 
 
+def _health_diagnostic() -> Dict[str, Dict]:
+    diagnostic = _validate_directories()
+    diagnostic["reference_catalog"] = _reference_catalog_status()
+    return diagnostic
+
+
 _dir_validation_error: str | None = None
 
 
@@ -424,9 +792,24 @@ def _validate_directories(raise_on_error: bool = False) -> Dict[str, Dict]:
     return diagnostic
 
 
+async def _metered_body(
+    body: AsyncIterator[bytes], endpoint: str, method: str
+) -> AsyncIterator[bytes]:
+    """Pass a streamed body through, observing its size once it is complete."""
+
+    size = 0
+    async for chunk in body:
+        size += len(chunk)
+        yield chunk
+    RESPONSE_SIZE.labels(endpoint=endpoint, method=method).observe(size)
+
+
 @app.middleware("http")
 async def metrics_middleware(request: Request, call_next):
     status_code = 500
+    response = None
+    started = perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
     try:
         response = await call_next(request)
         status_code = response.status_code
@@ -438,21 +821,143 @@ async def metrics_middleware(request: Request, call_next):
         status_code = 500
         raise
     finally:
-        endpoint = getattr(request.scope.get("route"), "path", request.url.path)
+        REQUESTS_IN_FLIGHT.dec()
+        # senza route (404) si usa un'etichetta fissa: i path arbitrari
+        # farebbero esplodere la cardinalità degli istogrammi
+        endpoint = getattr(request.scope.get("route"), "path", "unmatched")
+        method = request.method
         status_class = f"{int(status_code) // 100}xx" if status_code else "unknown"
         REQUEST_COUNT.labels(
-            endpoint=endpoint, method=request.method, status_class=status_class
+            endpoint=endpoint, method=method, status_class=status_class
         ).inc()
         if status_code >= 400:
             ERROR_COUNT.labels(
-                endpoint=endpoint, method=request.method, status_class=status_class
+                endpoint=endpoint, method=method, status_class=status_class
             ).inc()
+        REQUEST_LATENCY.labels(endpoint=endpoint, method=method).observe(
+            perf_counter() - started
+        )
+        if response is not None:
+            content_length = response.headers.get("content-length")
+            if content_length is not None:
+                RESPONSE_SIZE.labels(endpoint=endpoint, method=method).observe(
+                    int(content_length)
+                )
+            else:
+                response.body_iterator = _metered_body(
+                    response.body_iterator, endpoint, method
+                )
 
 
 @app.get("/modules", response_model=List[Dict])
 async def list_modules(_: None = Depends(require_api_key)) -> List[Dict]:
     """Return the list of available module files (txt/md/json)."""
-    return _list_files(MODULES_DIR)
+    return await _run_blocking(_list_files, _modules_manifest())
+
+
+MODULE_BATCH_MAX_NAMES = 500
+
+
+def _batch_module_item(name: str) -> Dict[str, object]:
+    """Metadata and policy-compliant content of one module for ``/modules:batch``.
+
+    The content follows the same rules as ``GET /modules/{name}`` without
+    Range/offset: full text (or base64 for binaries) when the dump is allowed,
+    otherwise the truncated excerpt, or no content at all for binaries and
+    the ledger.
+    """
+
+    item: Dict[str, object] = {"name": name}
+    try:
+        path = _resolve_module_file(Path(name))
+        entry = _lookup_manifest_entry(
+            _modules_manifest(),
+            MODULES_DIR,
+            name,
+            invalid_detail="Invalid module path",
+            missing_detail="Module not found",
+        )
+    except HTTPException as exc:
+        item.update(status=exc.status_code, detail=exc.detail)
+        return item
+
+    meta = entry.summary()
+    meta.update(entry.metadata)
+    item.update(meta=meta, sha256=entry.sha256)
+
+    is_text = path.suffix.lower() in TEXT_SUFFIXES
+    allow_full_dump = _allow_full_dump(path)
+    if (not is_text or path.name in LEDGER_TEXT_MODULES) and not allow_full_dump:
+        item.update(status=403, detail="Module download not allowed")
+        return item
+
+    if not is_text:
+        item.update(
+            status=200,
+            partial=False,
+            content_encoding="base64",
+            content=base64.b64encode(path.read_bytes()).decode("ascii"),
+        )
+        return item
+
+    cached = _module_cache.get(path)
+    if allow_full_dump:
+        item.update(status=200, partial=False, content=cached.text)
+        return item
+
+    strict_truncation = (not settings.allow_module_dump) or (
+        path.name in STRICT_TRUNCATION_MODULES
+    )
+    body, headers = cached.partial_response(strict_truncation)
+    item.update(
+        status=206,
+        partial=True,
+        content=body.decode("utf-8"),
+        remaining_bytes=int(headers.get("X-Content-Remaining-Bytes", 0)),
+    )
+    served_chars = 0 if strict_truncation else len(cached.excerpt)
+    if _allow_paging(path) and served_chars < len(cached.text):
+        item["next_offset"] = served_chars
+    return item
+
+
+@app.post("/modules:batch")
+async def batch_modules(
+    body: Dict | None = Body(default=None),
+    _: None = Depends(require_api_key),
+) -> StreamingResponse:
+    """Stream metadata and content of many modules as NDJSON, one per line.
+
+    ``{"names": [...]}`` selects the modules (default: every listed module);
+    each line carries its own ``status``, so one missing module does not fail
+    the batch. Lines are produced one at a time to keep memory flat.
+    """
+
+    names = (body or {}).get("names")
+    if names is None:
+        listing = await _run_blocking(_list_files, _modules_manifest())
+        names = [str(item["name"]) for item in listing]
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        raise HTTPException(
+            status_code=422, detail="names deve essere una lista di stringhe"
+        )
+    names = list(dict.fromkeys(names))
+    if len(names) > MODULE_BATCH_MAX_NAMES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Massimo {MODULE_BATCH_MAX_NAMES} moduli per batch",
+        )
+
+    async def lines() -> AsyncIterator[bytes]:
+        for name in names:
+            item = await _run_blocking(_batch_module_item, name)
+            yield json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Count": str(len(names))},
+    )
 
 
 def _parse_front_matter_metadata(
@@ -518,10 +1023,11 @@ def _parse_knowledge_pack_metadata(text: str) -> Dict[str, str]:
     }
 
 
-def _parse_module_metadata(path: Path) -> Dict[str, object]:
+def _parse_module_metadata(path: Path, text: str | None = None) -> Dict[str, object]:
     """Extract optional metadata fields from a module file."""
 
-    text = path.read_text(encoding="utf-8", errors="ignore")
+    if text is None:
+        text = path.read_text(encoding="utf-8", errors="ignore")
     metadata: Dict[str, object] = {}
 
     if path.suffix.lower() == ".json":
@@ -536,34 +1042,19 @@ def _parse_module_metadata(path: Path) -> Dict[str, object]:
     return metadata
 
 
-@app.get("/modules/{name:path}/meta")
-async def get_module_meta(name: str, _: None = Depends(require_api_key)) -> Dict:
-    """Return metadata (no content) for a module file."""
-    name_path = Path(name)
-    path = (MODULES_DIR / name_path).resolve()
-    if not path.is_relative_to(MODULES_DIR):
-        raise HTTPException(status_code=400, detail="Invalid module path")
-    if not path.is_file():
-        raise HTTPException(status_code=404, detail="Module not found")
-
-    metadata = {
-        "name": path.name,
-        "size_bytes": path.stat().st_size,
-        "suffix": path.suffix,
-    }
-
-    metadata.update(_parse_module_metadata(path))
-
-    return metadata
+def _module_metadata_from_bytes(path: Path, raw: bytes) -> Dict[str, object]:
+    return _parse_module_metadata(path, raw.decode("utf-8", errors="ignore"))
 
 
+# registrate prima delle route generiche /modules/{name:path}/..., che altrimenti
+# le oscurerebbero
 @app.get("/modules/taverna_saves/meta")
 async def get_taverna_saves_meta(
     _: None = Depends(require_api_key),
 ) -> Dict[str, object]:
     """Expose metadata and quota information for the taverna_saves service directory."""
 
-    meta = _taverna_saves_metadata()
+    meta = await _run_blocking(_taverna_saves_metadata)
     meta["storage_policy"] = {
         "file_naming": "{name}.json",
         "auto_name_pattern": meta.get("auto_name_policy", {}).get("pattern"),
@@ -572,20 +1063,205 @@ async def get_taverna_saves_meta(
     return meta
 
 
+@app.post("/modules/taverna_saves", status_code=201)
+async def save_taverna_entry(
+    document: Dict = Body(..., description="Documento JSON da salvare"),
+    name: str | None = Query(
+        default=None,
+        description="Nome del salvataggio senza estensione (sovrascrive); default NPC-YYYYMMDD-HHMM",
+    ),
+    _: None = Depends(require_api_key),
+) -> Dict[str, object]:
+    """Save a JSON document in taverna_saves, evicting the oldest over quota."""
+
+    data = json.dumps(document, ensure_ascii=False, indent=2).encode("utf-8")
+    try:
+        result = await _run_blocking(
+            _taverna_ledger().save,
+            data,
+            max_files=TAVERNA_SAVES_MAX_FILES,
+            name=name,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except FileNotFoundError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Directory taverna_saves non trovata: {TAVERNA_SAVES_DIR}",
+        ) from exc
+
+    quota = await _run_blocking(_taverna_saves_metrics)
+    if result.evicted:
+        logging.info(
+            "Taverna saves overflow",
+            extra={"event": "taverna_saves_evicted", "evicted": list(result.evicted)},
+        )
+    return {
+        "name": result.name,
+        "size_bytes": result.size_bytes,
+        "created": result.created,
+        "evicted": list(result.evicted),
+        "on_overflow": "delete_oldest",
+        "current_files": quota["current_files"],
+        "remaining_files": quota["remaining_files"],
+        "max_files": TAVERNA_SAVES_MAX_FILES,
+    }
+
+
 @app.get("/modules/taverna_saves/quota")
 async def get_taverna_saves_quota(
     _: None = Depends(require_api_key),
 ) -> Dict[str, object]:
     """Return a focused view on taverna_saves quota/usage metrics."""
 
-    return _taverna_saves_metrics()
+    return await _run_blocking(_taverna_saves_metrics)
+
+
+@app.get("/modules/{name:path}/sections")
+async def list_module_sections(
+    name: str, request: Request, _: None = Depends(require_api_key)
+) -> Dict[str, object]:
+    """List the addressable sections (top-level keys, banners, headings)."""
+
+    path, entry, sections = await _run_blocking(_load_sectioned_module, name)
+    validators = _validator_headers(entry.sha256, entry.signature[0], "sections")
+    if _is_not_modified(request, validators):
+        return _not_modified_response(validators)
+
+    return JSONResponse(
+        {"name": path.name, "sections": [span.summary() for span in sections]},
+        headers=validators,
+    )
+
+
+@app.get("/modules/{name:path}/sections/{key}")
+async def get_module_section(
+    name: str,
+    key: str,
+    request: Request,
+    offset: int = Query(default=0, ge=0, description="Char offset inside the section"),
+    _: None = Depends(require_api_key),
+) -> Response:
+    """Return a single section, paged at 4000 chars when dumps are not allowed."""
+
+    path, entry, sections = await _run_blocking(_load_sectioned_module, name)
+    span = next((item for item in sections if item.key == key), None)
+    if span is None:
+        raise HTTPException(status_code=404, detail="Section not found")
+
+    full_section = _allow_full_dump(path)
+    if not full_section and not _allow_paging(path):
+        raise HTTPException(status_code=403, detail="Section retrieval not allowed")
+
+    variant = f"section-{span.key}" + (f"-{offset}" if offset else "")
+    validators = _validator_headers(entry.sha256, entry.signature[0], variant)
+    if _is_not_modified(request, validators):
+        return _not_modified_response(validators)
+
+    raw = entry.raw[span.start : span.end]
+    section_headers = {"X-Section-Key": span.key, "X-Section-Kind": span.kind}
+    media_type = _media_type_for_path(path)
+    if full_section and not offset:
+        return Response(
+            content=raw,
+            media_type=media_type,
+            headers={**section_headers, **validators},
+        )
+
+    text = raw.decode("utf-8", errors="ignore")
+    if offset and offset >= len(text):
+        raise HTTPException(
+            status_code=416,
+            detail="Range non soddisfacibile",
+            headers={"Content-Range": f"chars */{len(text)}"},
+        )
+    body, headers = _text_page(text, offset, len(text), len(raw))
+    headers.update(section_headers)
+    headers.update(validators)
+    complete = offset == 0 and "X-Content-Next-Offset" not in headers
+    if complete:
+        headers["X-Content-Partial"] = "false"
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers=headers,
+        status_code=200 if complete else 206,
+    )
+
+
+@app.get("/modules/{name:path}/meta")
+async def get_module_meta(
+    name: str, request: Request, _: None = Depends(require_api_key)
+) -> Dict:
+    """Return metadata (no content) for a module file."""
+    entry = await _run_blocking(
+        _lookup_manifest_entry,
+        _modules_manifest(),
+        MODULES_DIR,
+        name,
+        invalid_detail="Invalid module path",
+        missing_detail="Module not found",
+    )
+
+    validators = _validator_headers(entry.sha256, entry.mtime_ns, "meta")
+    if _is_not_modified(request, validators):
+        return _not_modified_response(validators)
+
+    metadata = entry.summary()
+    metadata.update(entry.metadata)
+
+    return JSONResponse(metadata, headers=validators)
 
 
 @app.get("/storage_meta")
 async def storage_meta(_: None = Depends(require_api_key)) -> Dict[str, object]:
     """Expose storage metadata with quota, max_files and auto-naming policy."""
 
-    return _taverna_saves_metadata()
+    return await _run_blocking(_storage_metadata)
+
+
+def _storage_metadata() -> Dict[str, object]:
+    meta = _taverna_saves_metadata()
+    meta["module_compression"] = _module_compression_breakdown()
+    return meta
+
+
+def _module_compression_breakdown() -> Dict[str, object]:
+    """Per-module size of the cached compressed variants and their ratio."""
+
+    try:
+        listing = _modules_manifest().current().listing
+    except OSError:
+        listing = ()
+
+    def ratio(compressed: int, original: int) -> float:
+        return round(compressed / original, 3) if original else 1.0
+
+    totals: Dict[str, float] = {"size_bytes": 0}
+    modules: List[Dict[str, object]] = []
+    for item in listing:
+        path = MODULES_DIR / str(item["name"])
+        if path.suffix.lower() not in TEXT_SUFFIXES:
+            continue
+        try:
+            entry = _module_cache.get(path)
+        except OSError:
+            continue
+        row: Dict[str, object] = {"name": path.name, "size_bytes": entry.size_bytes}
+        totals["size_bytes"] += entry.size_bytes
+        for encoding in MODULE_ENCODINGS:
+            body = _module_cache.encoded(path, entry, encoding)
+            size = len(body) if body is not None else entry.size_bytes
+            row[f"{encoding}_bytes"] = size
+            row[f"{encoding}_ratio"] = ratio(size, entry.size_bytes)
+            totals[f"{encoding}_bytes"] = totals.get(f"{encoding}_bytes", 0) + size
+        modules.append(row)
+
+    for encoding in MODULE_ENCODINGS:
+        totals[f"{encoding}_ratio"] = ratio(
+            int(totals.get(f"{encoding}_bytes", 0)), int(totals["size_bytes"])
+        )
+    return {"encodings": list(MODULE_ENCODINGS), "modules": modules, "totals": totals}
 
 
 TEXT_SUFFIXES = {".txt", ".md"}
@@ -594,30 +1270,895 @@ STRICT_TRUNCATION_MODULES = {"adventurer_ledger.txt", "narrative_flow.txt"}
 LEDGER_TEXT_MODULES = {"adventurer_ledger.txt"}
 
 
-def _media_type_for_path(path: Path) -> str:
-    suffix = path.suffix.lower()
-    if suffix == ".txt":
-        return "text/plain"
-    if suffix == ".md":
-        return "text/markdown"
-    return "text/plain"
+MODULE_EXCERPT_MAX_CHARS = 4000
 
 
-@app.api_route("/modules/{name:path}", methods=["GET", "POST"])
-async def get_module_content(
-    name: str,
-    mode: str = Query(default="extended"),
-    class_name: str | None = Query(default=None, alias="class"),
-    race: str | None = Query(default=None),
-    archetype: str | None = Query(default=None),
-    level: int | None = Query(default=None),
-    stub: bool = Query(
-        default=False, description="Return stub payload for minmax builder"
-    ),
-    body: Dict | None = Body(default=None),
-    _: None = Depends(require_api_key),
-):
-    """Return the raw text content of a module file or a stubbed builder payload.
+@dataclass(frozen=True)
+class _ModuleCacheEntry:
+    """Decoded module text plus the pre-computed truncated excerpt."""
+
+    signature: FileSignature
+    raw: bytes
+    sha256: str
+    text: str
+    excerpt: str
+    excerpt_bytes: int
+    exceeds_limit: bool
+    _partial_responses: Dict[bool, Tuple[bytes, Dict[str, str]]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+    _section_indexes: Dict[str, Tuple[SectionSpan, ...]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+    _encoded: Dict[str, bytes | None] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+    _encode_lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    @classmethod
+    def from_bytes(cls, signature: FileSignature, raw: bytes) -> "_ModuleCacheEntry":
+        text = raw.decode("utf-8", errors="ignore")
+        excerpt = text[:MODULE_EXCERPT_MAX_CHARS]
+        return cls(
+            signature=signature,
+            raw=raw,
+            sha256=hashlib.sha256(raw).hexdigest(),
+            text=text,
+            excerpt=excerpt,
+            excerpt_bytes=len(excerpt.encode("utf-8", errors="ignore")),
+            exceeds_limit=len(text) > MODULE_EXCERPT_MAX_CHARS,
+        )
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.raw)
+
+    @property
+    def weight(self) -> int:
+        # Byte grezzi + testo decodificato: stima conservativa dell'occupazione.
+        return len(self.raw) + len(self.text)
+
+    def encoded(self, encoding: str) -> Tuple[bytes | None, bool]:
+        """Return the pre-compressed body for ``encoding`` and whether it was built now.
+
+        The variant is computed once per file version; ``None`` means the
+        compressed body would not be smaller than the original.
+        """
+
+        with self._encode_lock:
+            if encoding in self._encoded:
+                return self._encoded[encoding], False
+            body = _compress(self.raw, encoding)
+            if body is not None and len(body) >= len(self.raw):
+                body = None
+            self._encoded[encoding] = body
+            return body, True
+
+    def partial_response(self, strict: bool) -> Tuple[bytes, Dict[str, str]]:
+        """Return body and headers for the truncated (206) response."""
+
+        cached = self._partial_responses.get(strict)
+        if cached is None:
+            cached = _build_partial_response(self, strict)
+            self._partial_responses[strict] = cached
+        return cached
+
+    def sections(self, suffix: str) -> Tuple[SectionSpan, ...]:
+        """Return the byte-offset section index, built once per file version."""
+
+        cached = self._section_indexes.get(suffix)
+        if cached is None:
+            cached = build_section_index(self.raw, suffix)
+            self._section_indexes[suffix] = cached
+        return cached
+
+
+class _ModuleCache:
+    """Process-wide LRU cache of module files, invalidated on file changes.
+
+    Entries are keyed by resolved path and validated against
+    ``(st_mtime_ns, st_size, st_ino)`` on every lookup, so edits and atomic
+    replacements are picked up without explicit invalidation.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Path, _ModuleCacheEntry]" = OrderedDict()
+        # peso contabilizzato per voce: cresce quando si aggiungono varianti compresse
+        self._weights: Dict[Path, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: Path) -> _ModuleCacheEntry:
+        signature = file_signature(path.stat())
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(path)
+                MODULE_CACHE_HITS.inc()
+                return entry
+
+        MODULE_CACHE_MISSES.inc()
+        with path.open("rb") as source:
+            signature = file_signature(os.fstat(source.fileno()))
+            raw = source.read()
+        entry = _ModuleCacheEntry.from_bytes(signature, raw)
+        self._store(path, entry)
+        return entry
+
+    def encoded(
+        self, path: Path, entry: _ModuleCacheEntry, encoding: str
+    ) -> bytes | None:
+        """Return ``entry``'s compressed variant, charging its size to the cache."""
+
+        body, created = entry.encoded(encoding)
+        if created and body is not None:
+            with self._lock:
+                if self._entries.get(path) is entry:
+                    self._weights[path] += len(body)
+                    self._total_bytes += len(body)
+                    self._evict_overflow()
+                    MODULE_CACHE_BYTES.set(self._total_bytes)
+        return body
+
+    def _store(self, path: Path, entry: _ModuleCacheEntry) -> None:
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._total_bytes -= self._weights.pop(path)
+            if 0 < entry.weight <= self.max_bytes:
+                self._entries[path] = entry
+                self._weights[path] = entry.weight
+                self._total_bytes += entry.weight
+                self._evict_overflow()
+            MODULE_CACHE_BYTES.set(self._total_bytes)
+
+    def _evict_overflow(self) -> None:
+        while self._total_bytes > self.max_bytes:
+            evicted_path, _ = self._entries.popitem(last=False)
+            self._total_bytes -= self._weights.pop(evicted_path)
+            MODULE_CACHE_EVICTIONS.inc()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._weights.clear()
+            self._total_bytes = 0
+            MODULE_CACHE_BYTES.set(0)
+
+
+_module_cache = _ModuleCache(settings.module_cache_max_bytes)
+
+
+def _reset_module_cache() -> None:
+    """Utility to drop every cached module (mainly for tests)."""
+
+    _module_cache.clear()
+
+
+def _validator_headers(
+    digest: str, mtime_ns: int, variant: str | None = None
+) -> Dict[str, str]:
+    """Build strong ETag/Last-Modified headers for a file representation.
+
+    ``variant`` distinguishes representations derived from the same file
+    (metadata, truncated excerpt) so each one gets its own strong ETag.
+    """
+
+    etag = f'"{digest}-{variant}"' if variant else f'"{digest}"'
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime_ns // 1_000_000_000, usegmt=True),
+    }
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        if candidate.strip().removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def _is_not_modified(request: Request, validators: Mapping[str, str]) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against ``validators``."""
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, validators["ETag"])
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            last_modified = parsedate_to_datetime(validators["Last-Modified"])
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return last_modified <= since
+
+    return False
+
+
+MODULE_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+
+def _compress(raw: bytes, encoding: str) -> bytes | None:
+    if encoding == "gzip":
+        return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(raw, quality=BROTLI_QUALITY)
+    return None
+
+
+def _negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """Pick the preferred supported coding from ``Accept-Encoding`` (q-values)."""
+
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if coding:
+            weights[coding.strip().lower()] = quality
+    best = None
+    best_quality = 0.0
+    for coding in MODULE_ENCODINGS:
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def _not_modified_response(validators: Mapping[str, str]) -> Response:
+    return Response(status_code=304, headers=dict(validators))
+
+
+def _parse_single_range(header: str, unit: str, total: int) -> Tuple[int, int] | None:
+    """Parse ``<unit>=start-end`` into half-open bounds clamped to ``total``.
+
+    Malformed headers, other units and multi-range requests return ``None`` so
+    the caller serves the regular representation, as RFC 9110 allows. A
+    syntactically valid range starting past the end raises ``416``.
+    """
+
+    try:
+        requested_unit, spec = header.split("=", 1)
+    except ValueError:
+        return None
+    if requested_unit.strip().lower() != unit or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last):
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else total
+        else:
+            suffix = int(last)
+            start, end = max(total - suffix, 0), total
+            if suffix == 0:
+                start = total
+    except ValueError:
+        return None
+    if start < 0 or (first and last and end <= start):
+        return None
+    if start >= total:
+        raise HTTPException(
+            status_code=416,
+            detail="Range non soddisfacibile",
+            headers={"Content-Range": f"{unit} */{total}"},
+        )
+    return start, min(end, total)
+
+
+def _requested_range(
+    request: Request, unit: str, total: int, validators: Mapping[str, str]
+) -> Tuple[int, int] | None:
+    """Return the ``Range`` bounds to honour, applying ``If-Range`` first."""
+
+    header = request.headers.get("range")
+    if not header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range is not None:
+        if_range = if_range.strip()
+        if if_range.startswith(("W/", '"')):
+            if if_range != validators["ETag"]:
+                return None
+        elif if_range != validators["Last-Modified"]:
+            return None
+    return _parse_single_range(header, unit, total)
+
+
+def _build_partial_response(
+    entry: _ModuleCacheEntry, strict: bool
+) -> Tuple[bytes, Dict[str, str]]:
+    total_size = entry.size_bytes
+
+    if strict:
+        served_chunk = ""
+        is_truncated = True
+        truncated_size = 0
+    else:
+        served_chunk = entry.excerpt
+        # Anche con ALLOW_MODULE_DUMP=false serviamo un estratto iniziale, mantenendo
+        # l'header di parzialità per indicare il troncamento forzato.
+        is_truncated = entry.exceeds_limit
+        truncated_size = entry.excerpt_bytes
+    remaining = max(total_size - truncated_size, 0)
+    original_length = total_size
+
+    body = served_chunk + (
+        "\n\n[contenuto troncato — restano circa "
+        f"{remaining} byte su {total_size}; x-truncated=true; "
+        f"original-length={original_length}]"
+    )
+
+    headers = {
+        "X-Content-Partial": "true",
+        "X-Content-Partial-Reason": "ALLOW_MODULE_DUMP=false",
+        "X-Content-Served-Bytes": str(truncated_size),
+        "X-Content-Total-Bytes": str(total_size),
+        "X-Content-Remaining-Bytes": str(remaining),
+        "X-Content-Truncated": str(is_truncated).lower(),
+        "X-Content-Original-Length": str(total_size),
+        "X-Truncated": str(is_truncated).lower(),
+        "X-Original-Length": str(original_length),
+        "Warning": '199 - "Contenuto parziale: ALLOW_MODULE_DUMP=false"',
+    }
+
+    if is_truncated:
+        headers["X-Truncation-Limit-Chars"] = str(MODULE_EXCERPT_MAX_CHARS)
+        headers["X-Truncated"] = "true"
+        headers["x-truncated"] = "true"
+        headers["x-original-length"] = str(original_length)
+
+    headers.update(
+        _validator_headers(
+            entry.sha256, entry.signature[0], "strict" if strict else "excerpt"
+        )
+    )
+
+    return body.encode("utf-8"), headers
+
+
+def _text_page(
+    text: str, start: int, end: int, total_bytes: int
+) -> Tuple[bytes, Dict[str, str]]:
+    """Slice ``text`` into a page of at most ``MODULE_EXCERPT_MAX_CHARS`` chars."""
+
+    end = min(end, start + MODULE_EXCERPT_MAX_CHARS, len(text))
+    chunk = text[start:end].encode("utf-8")
+    remaining = len(text[end:].encode("utf-8"))
+    headers = {
+        "Content-Range": f"chars {start}-{end - 1}/{len(text)}",
+        "Accept-Ranges": "chars",
+        "X-Content-Partial": "true",
+        "X-Content-Offset": str(start),
+        "X-Content-Served-Bytes": str(len(chunk)),
+        "X-Content-Total-Bytes": str(total_bytes),
+        "X-Content-Remaining-Bytes": str(remaining),
+        "X-Truncation-Limit-Chars": str(MODULE_EXCERPT_MAX_CHARS),
+    }
+    if end < len(text):
+        headers["X-Content-Next-Offset"] = str(end)
+    return chunk, headers
+
+
+def _build_page_response(
+    entry: _ModuleCacheEntry, start: int, end: int
+) -> Tuple[bytes, Dict[str, str]]:
+    """Return one char-offset page (``Content-Range: chars``) of a module."""
+
+    chunk, headers = _text_page(entry.text, start, end, entry.size_bytes)
+    headers.update(_validator_headers(entry.sha256, entry.signature[0], "text"))
+    return chunk, headers
+
+
+def _media_type_for_path(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix == ".txt":
+        return "text/plain"
+    if suffix == ".md":
+        return "text/markdown"
+    return "text/plain"
+
+
+STUB_PROGRESSIONS_PATH = DATA_DIR / "stub_progressions.json"
+STUB_SLOT_PATTERN = re.compile(
+    r"(\d+)\s*(?:[°º]|lvl|liv(?:ello)?|level)?\s*[:=]?\s*(\d+)"
+)
+
+
+@dataclass(frozen=True)
+class _StubProgression:
+    """Per-level plan of a (class, archetype) pair; ``levels[n - 1]`` is level n."""
+
+    levels: Tuple[Mapping[str, object], ...]
+    base_stats: Mapping[str, object] | None
+    initiative: int
+    speed: int
+    skill_ranks_per_level: int | None
+    slot_fallback: str | None
+
+
+StubProgressionIndex = Dict[Tuple[str, str], _StubProgression]
+
+_stub_progression_index: StubProgressionIndex | None = None
+
+
+def _load_stub_progressions(
+    path: Path = STUB_PROGRESSIONS_PATH,
+) -> StubProgressionIndex:
+    """Parse the progression data file into an index keyed by (class, archetype)."""
+
+    document = json.loads(path.read_text(encoding="utf-8"))
+    index: StubProgressionIndex = {}
+    for item in document.get("progressions", []):
+        levels = tuple(item.get("levels", []))
+        for expected, entry in enumerate(levels, start=1):
+            if entry.get("livello") != expected:
+                raise ValueError(
+                    f"{path.name}: livelli non contigui per "
+                    f"{item.get('class')}/{item.get('archetype')} (atteso {expected})"
+                )
+        base_stats = next(
+            (e["stats"] for e in levels if isinstance(e.get("stats"), Mapping)), None
+        )
+        key = (str(item["class"]).lower(), str(item["archetype"]).lower())
+        index[key] = _StubProgression(
+            levels=levels,
+            base_stats=base_stats,
+            initiative=int(item.get("initiative", 2)),
+            speed=int(item.get("speed", 9)),
+            skill_ranks_per_level=item.get("skill_ranks_per_level"),
+            slot_fallback=item.get("slot_fallback"),
+        )
+    return index
+
+
+def _stub_progressions() -> StubProgressionIndex:
+    global _stub_progression_index
+
+    if _stub_progression_index is None:
+        _stub_progression_index = _load_stub_progressions()
+    return _stub_progression_index
+
+
+def _render_stub_response(
+    *,
+    class_name: str | None,
+    resolved_race: str,
+    resolved_archetype: str,
+    normalized_mode: str,
+    resolved_level: int,
+    hooks: object,
+    catalog_manifest: Mapping[str, object],
+    catalog_version: str,
+) -> bytes:
+    """Build, validate and serialise the minmax_builder stub payload."""
+
+    started = perf_counter()
+    step_total = 8 if normalized_mode == "core" else 16
+    step_labels = {
+        "1": "Profilo Base",
+        "2": "Razza & Classe",
+        "3": "Archetipi & Multiclasse",
+        "4": "Feats & Talenti",
+        "5": "Spell & Power Set",
+        "6": "Equip & Risorse",
+        "7": "Benchmark & Simulazioni",
+        "8": "QA & Export",
+    }
+    if normalized_mode == "extended":
+        step_labels.update(
+            {
+                "9": "Dummies Sheet",
+                "10": "Esportazione",
+                "11": "Fork/Varianti",
+                "12": "Comparativa",
+                "13": "Meta Rating",
+                "14": "Companion",
+                "15": "Report",
+                "16": "Chiusura",
+            }
+        )
+
+    base_build_state = {
+        "class": class_name or "Unknown",
+        "mode": normalized_mode,
+        "race": resolved_race,
+        "archetype": resolved_archetype,
+        "step": 1,
+        "step_total": step_total,
+        "step_labels": step_labels,
+    }
+
+    benchmark = {
+        "meta_tier": "T3",
+        "ruling_badge": "validated",
+        "dpr_snapshot": {
+            "livello_1": {"media": 6, "picco": 9},
+            "livello_5": {"media": 18, "picco": 26},
+        },
+    }
+
+    plan = _stub_progressions().get(
+        (str(class_name or "").lower(), str(resolved_archetype or "").lower())
+    )
+    plan_levels = plan.levels[: max(resolved_level, 0)] if plan is not None else ()
+    snapshot = plan_levels[-1] if plan_levels else None
+
+    progression: list[dict[str, object]] = []
+    base_hp = 12 + 5 * max(resolved_level - 1, 0)
+
+    if plan is not None:
+        for entry in plan_levels:
+            progression.append(
+                {
+                    "livello": entry["livello"],
+                    "privilegi": entry.get("privilegi", []),
+                    "talenti": entry.get("talenti", []),
+                }
+            )
+        if snapshot is not None:
+            base_hp = snapshot.get("pf", base_hp)
+    else:
+        for lvl in range(1, resolved_level + 1):
+            progression.append(
+                {
+                    "livello": lvl,
+                    "privilegi": [
+                        f"Privilegio {lvl}",
+                        (
+                            f"Tecnica distintiva {resolved_archetype}"
+                            if resolved_archetype
+                            else "Tecnica distintiva"
+                        ),
+                    ],
+                    "talenti": [f"Talento di livello {lvl}"],
+                }
+            )
+
+    hp_progression: list[object] = [entry.get("pf", base_hp) for entry in plan_levels]
+    if not hp_progression:
+        hp_progression = [base_hp]
+
+    saves_block = (
+        snapshot.get("salvezze")
+        if snapshot
+        else {"Tempra": 4, "Riflessi": 3, "Volontà": 4}
+    )
+    skills_map = (
+        {name: {"totale": value} for name, value in snapshot.get("skills", {}).items()}
+        if snapshot
+        else {
+            "Percezione": {"totale": 5},
+            "Acrobazia": {"totale": 4},
+            "Conoscenze": {"totale": 3},
+        }
+    )
+    if plan is not None and plan.slot_fallback is not None:
+        slot_text = plan.slot_fallback
+    elif snapshot:
+        slot_text = snapshot.get("slot")
+    else:
+        slot_text = "Liv1:4/Liv2:3"
+    spell_levels: list[dict[str, object]] = []
+    for level_str, per_day_str in STUB_SLOT_PATTERN.findall(slot_text or ""):
+        try:
+            level = int(level_str)
+            per_day = int(per_day_str)
+        except ValueError:
+            continue
+        if level <= 0:
+            continue
+        spell_levels.append({"liv": level, "per_day": per_day})
+    ac_block = (
+        snapshot.get("ca")
+        if snapshot
+        else {"totale": 18, "armatura": 5, "destrezza": 2, "scudo": 1}
+    )
+    if isinstance(ac_block, Mapping) and "scudo" not in ac_block:
+        ac_block = {**ac_block, "scudo": 0}
+    equip_full = []
+    talents_full: list[str] = []
+    class_features: list[str] = []
+    if plan_levels:
+        for entry in plan_levels:
+            equip_full.extend(entry.get("equip", []))
+            talents_full.extend(entry.get("talenti", []))
+            class_features.extend(entry.get("privilegi", []))
+    else:
+        equip_full.extend(["Arma preferita", "Armatura leggera"])
+        talents_full.extend(["Colpo possente", "Iniziativa migliorata"])
+        class_features.extend(["Addestramento marziale", "Specializzazione"])
+    inventory_full = ["Kit da avventuriero", "Pozione di cura x2"]
+
+    stats_block = (
+        snapshot.get("stats")
+        if snapshot and isinstance(snapshot.get("stats"), Mapping)
+        else (
+            plan.base_stats
+            if plan is not None and plan.base_stats is not None
+            else {
+                "FOR": 16,
+                "DES": 14,
+                "COS": 14,
+                "INT": 10,
+                "SAG": 12,
+                "CAR": 8,
+            }
+        )
+    )
+    attack_text = snapshot.get("attacco") if snapshot else "+4"
+    damage_text = snapshot.get("danni") if snapshot else "1d8+3"
+    initiative_bonus = plan.initiative if plan is not None else 2
+    speed_value = plan.speed if plan is not None else 9
+    skill_points = max(5 * resolved_level, 4 * resolved_level)
+    if plan is not None and plan.skill_ranks_per_level is not None:
+        int_mod = (
+            int((stats_block.get("INT") or 10) - 10) // 2
+            if isinstance(stats_block.get("INT"), (int, float))
+            else 0
+        )
+        skill_points = (plan.skill_ranks_per_level + max(int_mod, 0)) * resolved_level
+
+    sheet_payload = {
+        "classi": [
+            {
+                "nome": class_name or "Unknown",
+                "livelli": resolved_level,
+                "archetipi": [resolved_archetype] if resolved_archetype else [],
+            }
+        ],
+        "statistiche": stats_block,
+        "statistiche_chiave": {
+            "attacco": attack_text,
+            "danni": damage_text,
+            "ca": (ac_block.get("totale", 17) if isinstance(ac_block, Mapping) else 17),
+        },
+        "pf_totali": base_hp,
+        "hp": {"totali": base_hp, "per_livello": hp_progression},
+        "salvezze": saves_block,
+        "skills_map": skills_map,
+        "skill_points": skill_points,
+        "talenti": sorted(set(talents_full)),
+        "capacita_classe": sorted(set(class_features)),
+        "equipaggiamento": sorted(set(equip_full)),
+        "inventario": sorted(set(inventory_full + equip_full)),
+        "spell_levels": spell_levels,
+        "slot_incantesimi": slot_text,
+        "ac_breakdown": (
+            ac_block
+            if isinstance(ac_block, Mapping)
+            else {"totale": 18, "armatura": 5, "destrezza": 2, "scudo": 1}
+        ),
+        "iniziativa": initiative_bonus,
+        "velocita": speed_value,
+        "progressione": progression,
+        "benchmarks": {"meta_tier": "T3"},
+        "hooks": hooks,
+    }
+
+    export_block = {"sheet_payload": sheet_payload}
+
+    base_build_state["statistics"] = sheet_payload["statistiche"]
+    benchmark["statistics"] = sheet_payload["statistiche_chiave"]
+
+    narrative = (
+        f"{resolved_race or 'Avventuriero'} {resolved_archetype or 'Base'} pronta/o per il campo, "
+        f"specializzata/o in tattiche da {class_name or 'classe'}."
+    )
+    ledger = {
+        "movimenti": [
+            {"voce": "Equipaggiamento iniziale", "importo": -150},
+            {"voce": "Ricompensa missione", "importo": 250},
+        ],
+        "currency": {"oro": 100, "argento": 25, "rame": 40},
+    }
+
+    payload: Dict = {
+        "build_state": base_build_state,
+        "benchmark": benchmark,
+        "export": export_block,
+        "narrative": narrative,
+        "sheet": sheet_payload,
+        "ledger": ledger,
+        "class": class_name,
+        "mode": normalized_mode,
+        "reference_catalog_version": catalog_version,
+        "catalog_manifest": catalog_manifest,
+    }
+
+    payload["composite"] = {
+        "build": {
+            "build_state": payload["build_state"],
+            "benchmark": payload["benchmark"],
+            "export": payload["export"],
+            "sheet_payload": sheet_payload,
+            "reference_catalog_version": catalog_version,
+        },
+        "narrative": narrative,
+        "sheet": payload["sheet"],
+        "sheet_payload": sheet_payload,
+        "ledger": ledger,
+    }
+
+    built = perf_counter()
+    STUB_STEP_LATENCY.labels(step="build", mode=normalized_mode).observe(
+        built - started
+    )
+
+    schema_filename = schema_for_mode(normalized_mode)
+    # non strict: l'errore arriva come messaggio, senza importare le eccezioni
+    # di jsonschema all'avvio dell'API
+    validation_error = validate_with_schema(
+        schema_filename,
+        payload,
+        "minmax_builder_stub",
+        strict=False,
+    )
+    validated = perf_counter()
+    STUB_STEP_LATENCY.labels(step="validate", mode=normalized_mode).observe(
+        validated - built
+    )
+    if validation_error is not None:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Stub payload non valido per {schema_filename}: {validation_error}",
+        )
+
+    response_payload = {
+        key: value
+        for key, value in payload.items()
+        if key not in {"catalog_manifest", "reference_catalog_version"}
+    }
+
+    body = JSONResponse(response_payload).body
+    STUB_STEP_LATENCY.labels(step="serialize", mode=normalized_mode).observe(
+        perf_counter() - validated
+    )
+    return body
+
+
+StubCacheKey = Tuple[str | None, str, str, str, int, str, str]
+
+
+class _StubResponseCache:
+    """Bounded LRU memo of validated, serialised stub responses.
+
+    The stub is a pure function of the normalised request parameters and
+    the reference catalog version, so the jsonschema validation only runs
+    on the first request for each key.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[StubCacheKey, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: StubCacheKey) -> bytes | None:
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+        if content is None:
+            STUB_CACHE_MISSES.inc()
+        else:
+            STUB_CACHE_HITS.inc()
+        return content
+
+    def put(self, key: StubCacheKey, content: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_stub_response_cache = _StubResponseCache(settings.stub_cache_max_entries)
+
+
+def _reset_stub_cache() -> None:
+    """Utility to drop memoised stub responses (mainly for tests)."""
+
+    _stub_response_cache.clear()
+
+
+def _allow_full_dump(path: Path) -> bool:
+    return settings.allow_module_dump and (
+        path.name not in PROTECTED_DUMP_MODULES
+        or path.name in settings.module_dump_whitelist
+    )
+
+
+def _allow_paging(path: Path) -> bool:
+    # Le pagine per offset ricompongono l'intero testo: per i moduli protetti
+    # valgono le stesse regole del dump completo.
+    if path.name in STRICT_TRUNCATION_MODULES:
+        return False
+    return path.name not in PROTECTED_DUMP_MODULES or _allow_full_dump(path)
+
+
+def _load_sectioned_module(
+    name: str,
+) -> Tuple[Path, _ModuleCacheEntry, Tuple[SectionSpan, ...]]:
+    """Resolve a text module and return its cache entry and section index."""
+
+    path = _resolve_module_file(Path(name))
+    if path.suffix.lower() not in TEXT_SUFFIXES:
+        raise HTTPException(
+            status_code=400, detail="Sections available only for text modules"
+        )
+    if path.name in LEDGER_TEXT_MODULES and not _allow_full_dump(path):
+        raise HTTPException(status_code=403, detail="Module download not allowed")
+    entry = _module_cache.get(path)
+    return path, entry, entry.sections(path.suffix)
+
+
+def _resolve_module_file(name_path: Path) -> Path:
+    path = (MODULES_DIR / name_path).resolve()
+    if not path.is_relative_to(MODULES_DIR):
+        raise HTTPException(status_code=400, detail="Invalid module path")
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Module not found")
+    return path
+
+
+@app.api_route("/modules/{name:path}", methods=["GET", "POST"])
+async def get_module_content(
+    name: str,
+    request: Request,
+    mode: str = Query(default="extended"),
+    class_name: str | None = Query(default=None, alias="class"),
+    race: str | None = Query(default=None),
+    archetype: str | None = Query(default=None),
+    level: int | None = Query(default=None),
+    stub: bool = Query(
+        default=False, description="Return stub payload for minmax builder"
+    ),
+    offset: int | None = Query(
+        default=None,
+        ge=0,
+        description="Char offset of the page to return for truncated text modules",
+    ),
+    body: Dict | None = Body(default=None),
+    _: None = Depends(require_api_key),
+):
+    """Return the raw text content of a module file or a stubbed builder payload.
 
     Example names:
     - base_profile.txt
@@ -648,1022 +2189,283 @@ async def get_module_content(
         normalized_mode = (
             "core" if str(builder_mode or "").lower().startswith("core") else "extended"
         )
-        step_total = 8 if normalized_mode == "core" else 16
         resolved_level = int((body or {}).get("level") or level or 1)
-        step_labels = {
-            "1": "Profilo Base",
-            "2": "Razza & Classe",
-            "3": "Archetipi & Multiclasse",
-            "4": "Feats & Talenti",
-            "5": "Spell & Power Set",
-            "6": "Equip & Risorse",
-            "7": "Benchmark & Simulazioni",
-            "8": "QA & Export",
-        }
-        if normalized_mode == "extended":
-            step_labels.update(
-                {
-                    "9": "Dummies Sheet",
-                    "10": "Esportazione",
-                    "11": "Fork/Varianti",
-                    "12": "Comparativa",
-                    "13": "Meta Rating",
-                    "14": "Companion",
-                    "15": "Report",
-                    "16": "Chiusura",
-                }
-            )
-
-        base_build_state = {
-            "class": class_name or "Unknown",
-            "mode": normalized_mode,
-            "race": resolved_race,
-            "archetype": resolved_archetype,
-            "step": 1,
-            "step_total": step_total,
-            "step_labels": step_labels,
-        }
-
-        benchmark = {
-            "meta_tier": "T3",
-            "ruling_badge": "validated",
-            "dpr_snapshot": {
-                "livello_1": {"media": 6, "picco": 9},
-                "livello_5": {"media": 18, "picco": 26},
-            },
-        }
+        hooks = (body or {}).get("hooks")
 
-        is_wizard_evoker = (
-            str(class_name or "").lower() == "wizard"
-            and str(resolved_archetype or "").lower() == "evoker"
-        )
-
-        wizard_progression_plan: list[dict[str, object]] = [
-            {
-                "livello": 1,
-                "talenti": ["Iniziativa migliorata"],
-                "slot": "1°: 4",
-                "equip": ["Bastone ferrato", "Spellbook", "Abito da viaggiatore"],
-                "pf": 12,
-                "salvezze": {"Tempra": 2, "Riflessi": 3, "Volontà": 4},
-                "skills": {
-                    "Conoscenze (arcana)": 6,
-                    "Sapienza Magica": 6,
-                    "Percezione": 5,
-                },
-                "ca": {
-                    "totale": 15,
-                    "armatura": 3,
-                    "destrezza": 2,
-                    "deflessione": 0,
-                    "misc": 0,
-                },
-                "privilegi": [
-                    "Legame arcano (famiglio)",
-                    "Scuola di Invocazione — Intensified Spells",
-                    "PF 12 | TS +2/+3/+4 | CA 15",
-                    "Slot 1°:4 | Equip: bastone ferrato, spellbook, abito da viaggiatore",
-                ],
-            },
-            {
-                "livello": 2,
-                "talenti": ["Metamagia (Incantesimi Estesi)"],
-                "slot": "1°: 5 / 2°: 2",
-                "equip": ["Pagina di pergamena", "Mantello resistente +1"],
-                "pf": 20,
-                "salvezze": {"Tempra": 3, "Riflessi": 4, "Volontà": 5},
-                "skills": {
-                    "Conoscenze (arcana)": 7,
-                    "Sapienza Magica": 7,
-                    "Percezione": 6,
-                },
-                "ca": {
-                    "totale": 15,
-                    "armatura": 3,
-                    "destrezza": 2,
-                    "deflessione": 0,
-                    "misc": 0,
-                },
-                "privilegi": [
-                    "Potere di scuola (Evoker's Admixture)",
-                    "PF 20 | TS +3/+4/+5 | CA 15",
-                    "Slot 1°:5 / 2°:2 | Equip: pergamene aggiuntive, mantello resistente +1",
-                ],
-            },
-            {
-                "livello": 3,
-                "talenti": ["Incantesimi focalizzati (Invocazione)"],
-                "slot": "1°: 6 / 2°: 4 / 3°: 2",
-                "equip": ["Bacchetta di dardo incantato (CL3)"],
-                "pf": 28,
-                "salvezze": {"Tempra": 3, "Riflessi": 4, "Volontà": 6},
-                "skills": {
-                    "Conoscenze (arcana)": 9,
-                    "Sapienza Magica": 9,
-                    "Percezione": 6,
-                },
-                "ca": {
-                    "totale": 16,
-                    "armatura": 3,
-                    "destrezza": 2,
-                    "deflessione": 1,
-                    "misc": 0,
-                },
-                "privilegi": [
-                    "Talento bonus del mago",
-                    "PF 28 | TS +3/+4/+6 | CA 16",
-                    "Slot 1°:6 / 2°:4 / 3°:2 | Equip: bacchetta di dardo incantato (CL3)",
-                ],
-            },
-            {
-                "livello": 4,
-                "talenti": ["Magia focalizzata superiore (Invocazione)"],
-                "slot": "1°: 6 / 2°: 5 / 3°: 4",
-                "equip": ["Veste da mago rinforzata"],
-                "pf": 36,
-                "salvezze": {"Tempra": 4, "Riflessi": 5, "Volontà": 7},
-                "skills": {
-                    "Conoscenze (arcana)": 10,
-                    "Sapienza Magica": 10,
-                    "Percezione": 7,
-                },
-                "ca": {
-                    "totale": 16,
-                    "armatura": 3,
-                    "destrezza": 2,
-                    "deflessione": 1,
-                    "misc": 0,
-                },
-                "privilegi": [
-                    "Scoperta arcana: specializzazione intensificata",
-                    "PF 36 | TS +4/+5/+7 | CA 16",
-                    "Slot 1°:6 / 2°:5 / 3°:4 | Equip: veste da mago rinforzata",
-                ],
-            },
-            {
-                "livello": 5,
-                "talenti": ["Incantesimi massimizzati (metamagia)"],
-                "slot": "1°: 7 / 2°: 6 / 3°: 5 / 4°: 3",
-                "equip": ["Perla di potere I", "Anello di protezione +1"],
-                "pf": 44,
-                "salvezze": {"Tempra": 4, "Riflessi": 5, "Volontà": 8},
-                "skills": {
-                    "Conoscenze (arcana)": 12,
-                    "Sapienza Magica": 12,
-                    "Percezione": 8,
-                },
-                "ca": {
-                    "totale": 17,
-                    "armatura": 3,
-                    "destrezza": 2,
-                    "deflessione": 1,
-                    "misc": 1,
-                },
-                "privilegi": [
-                    "Scuola di opposizione consolidata",
-                    "PF 44 | TS +4/+5/+8 | CA 17",
-                    "Slot 1°:7 / 2°:6 / 3°:5 / 4°:3 | Equip: perla di potere I, anello di protezione +1",
-                ],
-            },
-            {
-                "livello": 6,
-                "talenti": ["Talento bonus (Mago) — Incantesimi rapidi"],
-                "slot": "1°: 7 / 2°: 6 / 3°: 6 / 4°: 4",
-                "equip": ["Bacchetta di palla di fuoco (CL6)"],
-                "pf": 52,
-                "salvezze": {"Tempra": 5, "Riflessi": 6, "Volontà": 9},
-                "skills": {
-                    "Conoscenze (arcana)": 13,
-                    "Sapienza Magica": 13,
-                    "Percezione": 9,
-                },
-                "ca": {
-                    "totale": 17,
-                    "armatura": 3,
-                    "destrezza": 2,
-                    "deflessione": 1,
-                    "misc": 1,
-                },
-                "privilegi": [
-                    "Potere di scuola avanzato (Force Missile)",
-                    "PF 52 | TS +5/+6/+9 | CA 17",
-                    "Slot 1°:7 / 2°:6 / 3°:6 / 4°:4 | Equip: bacchetta di palla di fuoco (CL6)",
-                ],
-            },
-            {
-                "livello": 7,
-                "talenti": [
-                    "Incantesimi focalizzati superiori (Invocazione)",
-                    "Talento bonus (Difensivo)",
-                ],
-                "slot": "1°: 8 / 2°: 7 / 3°: 7 / 4°: 5 / 5°: 3",
-                "equip": ["Cintura della destrezza +2"],
-                "pf": 60,
-                "salvezze": {"Tempra": 5, "Riflessi": 6, "Volontà": 10},
-                "skills": {
-                    "Conoscenze (arcana)": 14,
-                    "Sapienza Magica": 14,
-                    "Percezione": 9,
-                },
-                "ca": {
-                    "totale": 18,
-                    "armatura": 3,
-                    "destrezza": 3,
-                    "deflessione": 1,
-                    "misc": 1,
-                },
-                "privilegi": [
-                    "Talento bonus del mago (difesa arcana)",
-                    "PF 60 | TS +5/+6/+10 | CA 18",
-                    "Slot 1°:8 / 2°:7 / 3°:7 / 4°:5 / 5°:3 | Equip: cintura della destrezza +2",
-                ],
-            },
-            {
-                "livello": 8,
-                "talenti": ["Penetrare resistenza magica"],
-                "slot": "1°: 8 / 2°: 7 / 3°: 7 / 4°: 6 / 5°: 4",
-                "equip": ["Pergamena di muro di forza"],
-                "pf": 68,
-                "salvezze": {"Tempra": 6, "Riflessi": 7, "Volontà": 11},
-                "skills": {
-                    "Conoscenze (arcana)": 15,
-                    "Sapienza Magica": 15,
-                    "Percezione": 10,
-                },
-                "ca": {
-                    "totale": 18,
-                    "armatura": 3,
-                    "destrezza": 3,
-                    "deflessione": 1,
-                    "misc": 1,
-                },
-                "privilegi": [
-                    "Ricerca superiore (arcane discovery)",
-                    "PF 68 | TS +6/+7/+11 | CA 18",
-                    "Slot 1°:8 / 2°:7 / 3°:7 / 4°:6 / 5°:4 | Equip: pergamena di muro di forza",
-                ],
-            },
-            {
-                "livello": 9,
-                "talenti": ["Incantesimi rapidi migliorati"],
-                "slot": "1°: 8 / 2°: 7 / 3°: 7 / 4°: 7 / 5°: 5",
-                "equip": ["Bacchetta di fulmine (CL9)"],
-                "pf": 76,
-                "salvezze": {"Tempra": 6, "Riflessi": 7, "Volontà": 12},
-                "skills": {
-                    "Conoscenze (arcana)": 17,
-                    "Sapienza Magica": 17,
-                    "Percezione": 10,
-                },
-                "ca": {
-                    "totale": 19,
-                    "armatura": 3,
-                    "destrezza": 3,
-                    "deflessione": 2,
-                    "misc": 1,
-                },
-                "privilegi": [
-                    "Talento bonus (metamagia di scuola)",
-                    "PF 76 | TS +6/+7/+12 | CA 19",
-                    "Slot 1°:8 / 2°:7 / 3°:7 / 4°:7 / 5°:5 | Equip: bacchetta di fulmine (CL9)",
-                ],
-            },
-            {
-                "livello": 10,
-                "talenti": [
-                    "Incantesimi potenziati (metamagia)",
-                    "Penetrare resistenza magica migliorato",
-                ],
-                "slot": "1°: 8 / 2°: 7 / 3°: 7 / 4°: 7 / 5°: 6",
-                "equip": ["Testa di bacco runica", "Perla di potere IV"],
-                "pf": 84,
-                "salvezze": {"Tempra": 7, "Riflessi": 8, "Volontà": 13},
-                "skills": {
-                    "Conoscenze (arcana)": 18,
-                    "Sapienza Magica": 18,
-                    "Percezione": 11,
-                },
-                "ca": {
-                    "totale": 20,
-                    "armatura": 3,
-                    "destrezza": 3,
-                    "deflessione": 2,
-                    "misc": 2,
-                },
-                "privilegi": [
-                    "Potere di scuola maggiore (elemental mastery)",
-                    "PF 84 | TS +7/+8/+13 | CA 20",
-                    "Slot 1°:8 / 2°:7 / 3°:7 / 4°:7 / 5°:6 | Equip: perla di potere IV, focus arcani runici",
-                ],
-            },
-        ]
-
-        is_cutpurse = (
-            str(class_name or "").lower() == "rogue"
-            and str(resolved_archetype or "").lower() == "cutpurse"
-        )
-
-        cutpurse_progression_plan: list[dict[str, object]] = [
-            {
-                "livello": 1,
-                "stats": {
-                    "FOR": 12,
-                    "DES": 18,
-                    "COS": 12,
-                    "INT": 14,
-                    "SAG": 10,
-                    "CAR": 8,
-                },
-                "talenti": ["Arma accurata"],
-                "pf": 11,
-                "attacco": "+6 (pugnale) / +5 (fionda)",
-                "danni": "1d4+2 (pugnale) / 1d3+2 (fionda)",
-                "salvezze": {"Tempra": 2, "Riflessi": 4, "Volontà": 1},
-                "skills": {
-                    "Furtività": 9,
-                    "Rapidità di mano": 9,
-                    "Percezione": 6,
-                    "Acrobazia": 8,
-                    "Disattivare Congegni": 9,
-                },
-                "ca": {"totale": 18, "armatura": 3, "destrezza": 4, "misc": 1},
-                "equip": [
-                    "Armatura di cuoio borchiato",
-                    "Pugnale bilanciato",
-                    "Fionda con 20 proiettili",
-                    "Attrezzi da scasso di qualità",
-                ],
-                "privilegi": [
-                    "Attacco furtivo +1d6",
-                    "Percepire trappole +1",
-                    "Cutpurse: Mano lesta (Pickpocket)",
-                    "PF 11 | TS +2/+4/+1 | CA 18",
-                ],
-            },
-            {
-                "livello": 2,
-                "talenti": ["Schivare prodigioso"],
-                "pf": 18,
-                "attacco": "+7 (pugnale)",
-                "danni": "1d4+2 (pugnale) +1d6 furtivo",
-                "salvezze": {"Tempra": 3, "Riflessi": 5, "Volontà": 1},
-                "skills": {
-                    "Furtività": 10,
-                    "Rapidità di mano": 10,
-                    "Percezione": 7,
-                    "Acrobazia": 9,
-                    "Disattivare Congegni": 10,
-                },
-                "ca": {"totale": 19, "armatura": 3, "destrezza": 4, "misc": 2},
-                "equip": ["Cappa elfica grigia", "Mantello della resistenza +1"],
-                "privilegi": [
-                    "Talento ladresco: Furtività rapida",
-                    "Cutpurse: Afferrare oggetti (Quick Steal)",
-                    "PF 18 | TS +3/+5/+1 | CA 19",
-                ],
-            },
-            {
-                "livello": 3,
-                "talenti": ["Schivare"],
-                "pf": 26,
-                "attacco": "+8 (pugnale)",
-                "danni": "1d4+3 (pugnale) +2d6 furtivo",
-                "salvezze": {"Tempra": 3, "Riflessi": 6, "Volontà": 2},
-                "skills": {
-                    "Furtività": 11,
-                    "Rapidità di mano": 11,
-                    "Percezione": 8,
-                    "Acrobazia": 10,
-                    "Intimidire": 5,
-                },
-                "ca": {
-                    "totale": 19,
-                    "armatura": 3,
-                    "destrezza": 4,
-                    "schivare": 1,
-                    "misc": 1,
-                },
-                "equip": ["Pugnale masterwork", "Anello di protezione +1"],
-                "privilegi": [
-                    "Attacco furtivo +2d6",
-                    "Scherma agile (Finesse Training)",
-                    "PF 26 | TS +3/+6/+2 | CA 19",
-                ],
-            },
-            {
-                "livello": 4,
-                "talenti": ["Arma focalizzata (pugnale)"],
-                "pf": 34,
-                "attacco": "+10 (pugnale)",
-                "danni": "1d4+4 (pugnale) +2d6 furtivo",
-                "salvezze": {"Tempra": 4, "Riflessi": 7, "Volontà": 2},
-                "skills": {
-                    "Furtività": 12,
-                    "Rapidità di mano": 12,
-                    "Percezione": 9,
-                    "Acrobazia": 11,
-                    "Diplomazia": 5,
-                },
-                "ca": {
-                    "totale": 20,
-                    "armatura": 4,
-                    "destrezza": 4,
-                    "schivare": 1,
-                    "misc": 1,
-                },
-                "equip": ["Giaco di maglia ombreggiato", "Guanti da ladro"],
-                "privilegi": [
-                    "Talento ladresco: Arma improvvisata",
-                    "Uncanny Dodge",
-                    "PF 34 | TS +4/+7/+2 | CA 20",
-                ],
-            },
-            {
-                "livello": 5,
-                "talenti": ["Combattere con due armi"],
-                "pf": 42,
-                "attacco": "+11/+11 (pugnali)",
-                "danni": "1d4+4 (pugnale) +3d6 furtivo",
-                "salvezze": {"Tempra": 4, "Riflessi": 8, "Volontà": 3},
-                "skills": {
-                    "Furtività": 13,
-                    "Rapidità di mano": 13,
-                    "Percezione": 10,
-                    "Acrobazia": 12,
-                    "Disattivare Congegni": 13,
-                },
-                "ca": {
-                    "totale": 21,
-                    "armatura": 4,
-                    "destrezza": 4,
-                    "schivare": 1,
-                    "misc": 2,
-                },
-                "equip": ["Pugnale +1", "Cintura dell'agilità +2"],
-                "privilegi": [
-                    "Attacco furtivo +3d6",
-                    "Talento ladresco: Attacco debilitante",
-                    "PF 42 | TS +4/+8/+3 | CA 21",
-                ],
-            },
-            {
-                "livello": 6,
-                "talenti": ["Riflessi in combattimento"],
-                "pf": 50,
-                "attacco": "+13/+13 (pugnali)",
-                "danni": "1d4+5 (pugnale) +3d6 furtivo",
-                "salvezze": {"Tempra": 5, "Riflessi": 9, "Volontà": 3},
-                "skills": {
-                    "Furtività": 14,
-                    "Rapidità di mano": 14,
-                    "Percezione": 11,
-                    "Acrobazia": 13,
-                    "Raggirare": 9,
-                },
-                "ca": {
-                    "totale": 22,
-                    "armatura": 4,
-                    "destrezza": 5,
-                    "schivare": 1,
-                    "misc": 2,
-                },
-                "equip": ["Stivali dell'agilità", "Mantello della resistenza +2"],
-                "privilegi": [
-                    "Talento ladresco: Furtività leggendaria",
-                    "Evasione migliorata",
-                    "PF 50 | TS +5/+9/+3 | CA 22",
-                ],
-            },
-            {
-                "livello": 7,
-                "talenti": ["Mobilità"],
-                "pf": 58,
-                "attacco": "+15/+15 (pugnali)",
-                "danni": "1d4+6 (pugnale) +4d6 furtivo",
-                "salvezze": {"Tempra": 5, "Riflessi": 10, "Volontà": 4},
-                "skills": {
-                    "Furtività": 15,
-                    "Rapidità di mano": 15,
-                    "Percezione": 12,
-                    "Acrobazia": 14,
-                    "Disattivare Congegni": 15,
-                },
-                "ca": {
-                    "totale": 23,
-                    "armatura": 5,
-                    "destrezza": 5,
-                    "schivare": 1,
-                    "misc": 2,
-                },
-                "equip": ["Pugnale +2 bilanciato", "Bracciali dell'armatura +1"],
-                "privilegi": [
-                    "Attacco furtivo +4d6",
-                    "Cutpurse: Ruba arma (Steal Weapon)",
-                    "PF 58 | TS +5/+10/+4 | CA 23",
-                ],
-            },
-            {
-                "livello": 8,
-                "stats": {
-                    "FOR": 12,
-                    "DES": 20,
-                    "COS": 12,
-                    "INT": 14,
-                    "SAG": 10,
-                    "CAR": 8,
-                },
-                "talenti": [
-                    "Arma focalizzata superiore (pugnale)",
-                    "Talento ladresco: Opportunista",
-                ],
-                "pf": 66,
-                "attacco": "+17/+17 (pugnali)",
-                "danni": "1d4+6 (pugnale) +4d6 furtivo",
-                "salvezze": {"Tempra": 6, "Riflessi": 11, "Volontà": 4},
-                "skills": {
-                    "Furtività": 17,
-                    "Rapidità di mano": 17,
-                    "Percezione": 13,
-                    "Acrobazia": 15,
-                    "Intuizione": 11,
-                },
-                "ca": {
-                    "totale": 24,
-                    "armatura": 5,
-                    "destrezza": 6,
-                    "schivare": 1,
-                    "misc": 2,
-                },
-                "equip": ["Cintura dell'agilità +4", "Pugnale agile +2"],
-                "privilegi": [
-                    "Schivare prodigioso migliorato",
-                    "Attacco furtivo +4d6",
-                    "PF 66 | TS +6/+11/+4 | CA 24",
-                ],
-            },
-            {
-                "livello": 9,
-                "talenti": ["Arma accurata superiore"],
-                "pf": 74,
-                "attacco": "+19/+19 (pugnali)",
-                "danni": "1d4+7 (pugnale) +5d6 furtivo",
-                "salvezze": {"Tempra": 6, "Riflessi": 12, "Volontà": 5},
-                "skills": {
-                    "Furtività": 18,
-                    "Rapidità di mano": 18,
-                    "Percezione": 14,
-                    "Acrobazia": 16,
-                    "Diplomazia": 8,
-                },
-                "ca": {
-                    "totale": 25,
-                    "armatura": 5,
-                    "destrezza": 6,
-                    "schivare": 1,
-                    "misc": 3,
-                },
-                "equip": ["Pugnale velocità +2", "Anello di protezione +2"],
-                "privilegi": [
-                    "Attacco furtivo +5d6",
-                    "Talento ladresco: Debilitare difese",
-                    "PF 74 | TS +6/+12/+5 | CA 25",
-                ],
-            },
-            {
-                "livello": 10,
-                "talenti": ["Colpo senz'armi migliorato"],
-                "pf": 82,
-                "attacco": "+21/+21 (pugnali)",
-                "danni": "1d4+8 (pugnale) +5d6 furtivo",
-                "salvezze": {"Tempra": 7, "Riflessi": 13, "Volontà": 5},
-                "skills": {
-                    "Furtività": 19,
-                    "Rapidità di mano": 19,
-                    "Percezione": 15,
-                    "Acrobazia": 17,
-                    "Disattivare Congegni": 19,
-                },
-                "ca": {
-                    "totale": 26,
-                    "armatura": 6,
-                    "destrezza": 6,
-                    "schivare": 1,
-                    "misc": 3,
-                },
-                "equip": [
-                    "Giaco di maglia ombreggiato +2",
-                    "Guanti della destrezza +4",
-                ],
-                "privilegi": [
-                    "Attacco furtivo +5d6",
-                    "Talento ladresco: Bleeding Attack",
-                    "Cutpurse: Maestro borseggiatore",
-                    "PF 82 | TS +7/+13/+5 | CA 26",
-                ],
-            },
-        ]
-
-        progression: list[dict[str, object]] = []
-        base_hp = 12 + 5 * max(resolved_level - 1, 0)
-
-        wizard_levels = (
-            [
-                entry
-                for entry in wizard_progression_plan
-                if entry["livello"] <= resolved_level
-            ]
-            if is_wizard_evoker
-            else []
-        )
-        wizard_snapshot = wizard_levels[-1] if wizard_levels else None
-
-        cutpurse_levels = (
-            [
-                entry
-                for entry in cutpurse_progression_plan
-                if entry["livello"] <= resolved_level
-            ]
-            if is_cutpurse
-            else []
-        )
-        cutpurse_snapshot = cutpurse_levels[-1] if cutpurse_levels else None
-
-        if is_wizard_evoker:
-            for entry in wizard_levels:
-                progression.append(
-                    {
-                        "livello": entry["livello"],
-                        "privilegi": entry["privilegi"],
-                        "talenti": entry["talenti"],
-                    }
-                )
-            if progression:
-                base_hp = (
-                    wizard_snapshot.get("pf", base_hp) if wizard_snapshot else base_hp
-                )
-        elif is_cutpurse:
-            for entry in cutpurse_levels:
-                progression.append(
-                    {
-                        "livello": entry["livello"],
-                        "privilegi": entry.get("privilegi", []),
-                        "talenti": entry.get("talenti", []),
-                    }
-                )
-            if progression and cutpurse_snapshot:
-                base_hp = cutpurse_snapshot.get("pf", base_hp)
-        else:
-            for lvl in range(1, resolved_level + 1):
-                progression.append(
-                    {
-                        "livello": lvl,
-                        "privilegi": [
-                            f"Privilegio {lvl}",
-                            (
-                                f"Tecnica distintiva {resolved_archetype}"
-                                if resolved_archetype
-                                else "Tecnica distintiva"
-                            ),
-                        ],
-                        "talenti": [f"Talento di livello {lvl}"],
-                    }
-                )
-
-        hp_progression: list[object] = []
-        if is_wizard_evoker:
-            hp_progression = [entry.get("pf", base_hp) for entry in wizard_levels]
-        elif is_cutpurse:
-            hp_progression = [entry.get("pf", base_hp) for entry in cutpurse_levels]
-        if not hp_progression:
-            hp_progression = [base_hp]
-
-        snapshot = wizard_snapshot or cutpurse_snapshot
-        saves_block = (
-            snapshot.get("salvezze")
-            if snapshot
-            else {"Tempra": 4, "Riflessi": 3, "Volontà": 4}
-        )
-        skills_map = (
-            {
-                name: {"totale": value}
-                for name, value in (snapshot.get("skills") if snapshot else {}).items()
-            }
-            if snapshot
-            else {
-                "Percezione": {"totale": 5},
-                "Acrobazia": {"totale": 4},
-                "Conoscenze": {"totale": 3},
-            }
-        )
-        slot_text = (
-            snapshot.get("slot")
-            if snapshot and not is_cutpurse
-            else ("Non incantatore" if is_cutpurse else "Liv1:4/Liv2:3")
-        )
-        spell_levels: list[dict[str, object]] = []
-        slot_pattern = re.compile(
-            r"(\d+)\s*(?:[°º]|lvl|liv(?:ello)?|level)?\s*[:=]?\s*(\d+)"
-        )
-        for level_str, per_day_str in slot_pattern.findall(slot_text or ""):
-            try:
-                level = int(level_str)
-                per_day = int(per_day_str)
-            except ValueError:
-                continue
-            if level <= 0:
-                continue
-            spell_levels.append({"liv": level, "per_day": per_day})
-        ac_block = (
-            snapshot.get("ca")
-            if snapshot
-            else {"totale": 18, "armatura": 5, "destrezza": 2, "scudo": 1}
-        )
-        if isinstance(ac_block, Mapping) and "scudo" not in ac_block:
-            ac_block = {**ac_block, "scudo": 0}
-        equip_full = []
-        if wizard_levels:
-            for entry in wizard_levels:
-                equip_full.extend(entry.get("equip", []))
-        elif cutpurse_levels:
-            for entry in cutpurse_levels:
-                equip_full.extend(entry.get("equip", []))
-        else:
-            equip_full.extend(["Arma preferita", "Armatura leggera"])
-        inventory_full = ["Kit da avventuriero", "Pozione di cura x2"]
-        talents_full: list[str] = []
-        if wizard_levels:
-            for entry in wizard_levels:
-                talents_full.extend(entry.get("talenti", []))
-        elif cutpurse_levels:
-            for entry in cutpurse_levels:
-                talents_full.extend(entry.get("talenti", []))
-        else:
-            talents_full.extend(["Colpo possente", "Iniziativa migliorata"])
-        class_features: list[str] = []
-        if wizard_levels:
-            for entry in wizard_levels:
-                class_features.extend(entry.get("privilegi", []))
-        elif cutpurse_levels:
-            for entry in cutpurse_levels:
-                class_features.extend(entry.get("privilegi", []))
-        else:
-            class_features.extend(["Addestramento marziale", "Specializzazione"])
-
-        base_cutpurse_stats = None
-        if is_cutpurse:
-            for entry in cutpurse_progression_plan:
-                stats_candidate = entry.get("stats")
-                if isinstance(stats_candidate, Mapping):
-                    base_cutpurse_stats = stats_candidate
-                    break
-        stats_block = (
-            snapshot.get("stats")
-            if snapshot and isinstance(snapshot.get("stats"), Mapping)
-            else (
-                base_cutpurse_stats
-                if base_cutpurse_stats is not None
-                else {
-                    "FOR": 16,
-                    "DES": 14,
-                    "COS": 14,
-                    "INT": 10,
-                    "SAG": 12,
-                    "CAR": 8,
-                }
-            )
-        )
-        attack_text = snapshot.get("attacco") if snapshot else "+4"
-        damage_text = snapshot.get("danni") if snapshot else "1d8+3"
-        initiative_bonus = 4 if is_cutpurse else 2
-        speed_value = 6 if is_cutpurse else 9
-        skill_points = max(5 * resolved_level, 4 * resolved_level)
-        if is_cutpurse:
-            int_mod = (
-                int((stats_block.get("INT") or 10) - 10) // 2
-                if isinstance(stats_block.get("INT"), (int, float))
-                else 0
-            )
-            skill_points = (8 + max(int_mod, 0)) * resolved_level
-
-        sheet_payload = {
-            "classi": [
-                {
-                    "nome": class_name or "Unknown",
-                    "livelli": resolved_level,
-                    "archetipi": [resolved_archetype] if resolved_archetype else [],
-                }
-            ],
-            "statistiche": stats_block,
-            "statistiche_chiave": {
-                "attacco": attack_text,
-                "danni": damage_text,
-                "ca": (
-                    ac_block.get("totale", 17) if isinstance(ac_block, Mapping) else 17
-                ),
-            },
-            "pf_totali": base_hp,
-            "hp": {"totali": base_hp, "per_livello": hp_progression},
-            "salvezze": saves_block,
-            "skills_map": skills_map,
-            "skill_points": skill_points,
-            "talenti": sorted(set(talents_full)),
-            "capacita_classe": sorted(set(class_features)),
-            "equipaggiamento": sorted(set(equip_full)),
-            "inventario": sorted(set(inventory_full + equip_full)),
-            "spell_levels": spell_levels,
-            "slot_incantesimi": slot_text,
-            "ac_breakdown": (
-                ac_block
-                if isinstance(ac_block, Mapping)
-                else {"totale": 18, "armatura": 5, "destrezza": 2, "scudo": 1}
-            ),
-            "iniziativa": initiative_bonus,
-            "velocita": speed_value,
-            "progressione": progression,
-            "benchmarks": {"meta_tier": "T3"},
-            "hooks": (body or {}).get("hooks"),
-        }
-
-        export_block = {"sheet_payload": sheet_payload}
-
-        base_build_state["statistics"] = sheet_payload["statistiche"]
-        benchmark["statistics"] = sheet_payload["statistiche_chiave"]
-
-        narrative = (
-            f"{resolved_race or 'Avventuriero'} {resolved_archetype or 'Base'} pronta/o per il campo, "
-            f"specializzata/o in tattiche da {class_name or 'classe'}."
-        )
-        ledger = {
-            "movimenti": [
-                {"voce": "Equipaggiamento iniziale", "importo": -150},
-                {"voce": "Ricompensa missione", "importo": 250},
-            ],
-            "currency": {"oro": 100, "argento": 25, "rame": 40},
-        }
-
-        catalog_manifest = _load_reference_manifest()
-        catalog_version = (
-            str(catalog_manifest.get("version"))
+        catalog_manifest = await _run_blocking(_load_reference_manifest)
+        manifest_version = (
+            catalog_manifest.get("version")
             if isinstance(catalog_manifest, Mapping)
             else None
         )
+        catalog_version = str(manifest_version) if manifest_version else None
         if not catalog_version:
             raise HTTPException(
                 status_code=503,
                 detail="Reference catalog manifest non disponibile",
             )
 
-        payload: Dict = {
-            "build_state": base_build_state,
-            "benchmark": benchmark,
-            "export": export_block,
-            "narrative": narrative,
-            "sheet": sheet_payload,
-            "ledger": ledger,
-            "class": class_name,
-            "mode": normalized_mode,
-            "reference_catalog_version": catalog_version,
-            "catalog_manifest": catalog_manifest,
-        }
-
-        payload["composite"] = {
-            "build": {
-                "build_state": payload["build_state"],
-                "benchmark": payload["benchmark"],
-                "export": payload["export"],
-                "sheet_payload": sheet_payload,
-                "reference_catalog_version": catalog_version,
-            },
-            "narrative": narrative,
-            "sheet": payload["sheet"],
-            "sheet_payload": sheet_payload,
-            "ledger": ledger,
-        }
-
-        schema_filename = schema_for_mode(normalized_mode)
-        try:
-            validate_with_schema(
-                schema_filename,
-                payload,
-                "minmax_builder_stub",
-                strict=True,
+        cache_key = (
+            class_name,
+            str(resolved_race),
+            str(resolved_archetype),
+            normalized_mode,
+            resolved_level,
+            json.dumps(hooks, sort_keys=True, default=str),
+            catalog_version,
+        )
+        content = _stub_response_cache.get(cache_key)
+        if content is None:
+            content = await _run_blocking(
+                _render_stub_response,
+                class_name=class_name,
+                resolved_race=resolved_race,
+                resolved_archetype=resolved_archetype,
+                normalized_mode=normalized_mode,
+                resolved_level=resolved_level,
+                hooks=hooks,
+                catalog_manifest=catalog_manifest,
+                catalog_version=catalog_version,
             )
-        except ValidationError as exc:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Stub payload non valido per {schema_filename}: {exc}",
-            ) from exc
-
-        response_payload = {
-            key: value
-            for key, value in payload.items()
-            if key not in {"catalog_manifest", "reference_catalog_version"}
-        }
+            _stub_response_cache.put(cache_key, content)
 
-        return JSONResponse(response_payload)
+        return Response(content=content, media_type="application/json")
 
-    path = (MODULES_DIR / name_path).resolve()
-    if not path.is_relative_to(MODULES_DIR):
-        raise HTTPException(status_code=400, detail="Invalid module path")
-    if not path.is_file():
-        raise HTTPException(status_code=404, detail="Module not found")
+    path = await _run_blocking(_resolve_module_file, name_path)
     media_type = _media_type_for_path(path)
     is_text = path.suffix.lower() in TEXT_SUFFIXES
     is_ledger_text = path.name in LEDGER_TEXT_MODULES
 
-    allow_full_dump = settings.allow_module_dump and (
-        path.name not in PROTECTED_DUMP_MODULES
-        or path.name in settings.module_dump_whitelist
-    )
+    allow_full_dump = _allow_full_dump(path)
 
     if (not is_text or is_ledger_text) and not allow_full_dump:
         raise HTTPException(status_code=403, detail="Module download not allowed")
 
     if not is_text and allow_full_dump:
-        return FileResponse(path, media_type=media_type, filename=path.name)
+        manifest_entry = await _run_blocking(_modules_manifest().lookup, path)
+        if manifest_entry is None:
+            raise HTTPException(status_code=404, detail="Module not found")
+        validators = _validator_headers(manifest_entry.sha256, manifest_entry.mtime_ns)
+        if _is_not_modified(request, validators):
+            return _not_modified_response(validators)
+        return FileResponse(
+            path,
+            media_type=media_type,
+            filename=path.name,
+            headers=validators,
+        )
+
+    entry = await _run_blocking(_module_cache.get, path)
 
     if allow_full_dump:
-        return FileResponse(path, media_type=media_type, filename=path.name)
+        # Le richieste Range operano sulla rappresentazione identity.
+        encoding = None
+        encoded_body = None
+        if not request.headers.get("range"):
+            encoding = _negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding is not None:
+            encoded_body = await _run_blocking(
+                _module_cache.encoded, path, entry, encoding
+            )
+            if encoded_body is None:
+                encoding = None
+        validators = _validator_headers(entry.sha256, entry.signature[0], encoding)
+        if _is_not_modified(request, validators):
+            return _not_modified_response({**validators, "Vary": "Accept-Encoding"})
+        headers = {
+            "Content-Disposition": f'attachment; filename="{path.name}"',
+            "Accept-Ranges": "bytes",
+            "Vary": "Accept-Encoding",
+            **validators,
+        }
+        if encoded_body is not None:
+            headers["Content-Encoding"] = encoding
+            return Response(
+                content=encoded_body, media_type=media_type, headers=headers
+            )
+        byte_range = _requested_range(request, "bytes", entry.size_bytes, validators)
+        if byte_range is None:
+            return Response(content=entry.raw, media_type=media_type, headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{entry.size_bytes}"
+        return Response(
+            content=entry.raw[start:end],
+            media_type=media_type,
+            headers=headers,
+            status_code=206,
+        )
 
-    max_chars = 4000
+    # I moduli a troncamento rigido e quelli protetti fuori whitelist non sono
+    # paginabili; per gli altri ogni pagina resta entro MODULE_EXCERPT_MAX_CHARS
+    # caratteri.
+    pageable = _allow_paging(path)
+    if pageable:
+        validators = _validator_headers(entry.sha256, entry.signature[0], "text")
+        if offset is not None:
+            if offset >= len(entry.text):
+                raise HTTPException(
+                    status_code=416,
+                    detail="Range non soddisfacibile",
+                    headers={"Content-Range": f"chars */{len(entry.text)}"},
+                )
+            char_range = (offset, offset + MODULE_EXCERPT_MAX_CHARS)
+        else:
+            char_range = _requested_range(request, "chars", len(entry.text), validators)
+        if char_range is not None:
+            if _is_not_modified(request, validators):
+                return _not_modified_response(validators)
+            body, headers = _build_page_response(entry, *char_range)
+            return Response(
+                content=body, media_type=media_type, headers=headers, status_code=206
+            )
 
-    total_size = path.stat().st_size
     strict_truncation = (not settings.allow_module_dump) or (
         path.name in STRICT_TRUNCATION_MODULES
     )
-
-    if strict_truncation:
-        served_chunk = ""
-        is_truncated = True
-        truncated_size = 0
-    else:
-        with path.open("r", encoding="utf-8", errors="ignore") as source:
-            chunk = source.read(max_chars + 1)
-
-        served_chunk = chunk[:max_chars]
-        # Anche con ALLOW_MODULE_DUMP=false serviamo un estratto iniziale, mantenendo
-        # l'header di parzialità per indicare il troncamento forzato.
-        is_truncated = (not settings.allow_module_dump) or len(chunk) > max_chars
-        truncated_size = len(served_chunk.encode("utf-8", errors="ignore"))
-    remaining = max(total_size - truncated_size, 0)
-    original_length = total_size
-
-    def _truncated_text():
-        if served_chunk:
-            yield served_chunk
-        yield (
-            "\n\n[contenuto troncato — restano circa "
-            f"{remaining} byte su {total_size}; x-truncated=true; "
-            f"original-length={original_length}]"
-        )
-
-    headers = {
-        "X-Content-Partial": "true",
-        "X-Content-Partial-Reason": "ALLOW_MODULE_DUMP=false",
-        "X-Content-Served-Bytes": str(truncated_size),
-        "X-Content-Total-Bytes": str(total_size),
-        "X-Content-Remaining-Bytes": str(remaining),
-        "X-Content-Truncated": str(is_truncated).lower(),
-        "X-Content-Original-Length": str(total_size),
-        "X-Truncated": str(is_truncated).lower(),
-        "X-Original-Length": str(original_length),
-        "Warning": '199 - "Contenuto parziale: ALLOW_MODULE_DUMP=false"',
-    }
-
-    if is_truncated:
-        headers["X-Truncation-Limit-Chars"] = str(max_chars)
-        headers["X-Truncated"] = "true"
-        headers["x-truncated"] = "true"
-        headers["x-original-length"] = str(original_length)
-
-    return StreamingResponse(
-        _truncated_text(),
+    body, headers = entry.partial_response(strict_truncation)
+    validators = {key: headers[key] for key in ("ETag", "Last-Modified")}
+    if _is_not_modified(request, validators):
+        return _not_modified_response(validators)
+    if pageable:
+        served_chars = 0 if strict_truncation else len(entry.excerpt)
+        headers = {**headers, "Accept-Ranges": "chars"}
+        if served_chars < len(entry.text):
+            headers["X-Content-Next-Offset"] = str(served_chars)
+
+    return Response(
+        content=body,
         media_type=media_type,
         headers=headers,
         status_code=206,
     )
 
 
+def _search_modules(query: str, limit: int) -> List[Dict[str, object]]:
+    index = _search_index()
+    index.refresh()
+    results = []
+    for hit in index.search(query, limit):
+        result = hit.as_dict()
+        path = Path(hit.name)
+        # Gli snippet seguono la policy di troncamento: niente testo dai moduli
+        # rigidi, protetti o dal ledger se il dump completo non è consentito.
+        if (
+            path.name in LEDGER_TEXT_MODULES or not _allow_paging(path)
+        ) and not _allow_full_dump(path):
+            result["snippet"] = None
+        results.append(result)
+    return results
+
+
+@app.get("/search")
+async def search_modules(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(default=10, ge=1, le=50),
+    _: None = Depends(require_api_key),
+) -> Dict[str, object]:
+    """Full-text search over module sections, ranked with BM25."""
+
+    results = await _run_blocking(_search_modules, q, limit)
+    return {"query": q, "total": len(results), "results": results}
+
+
 @app.get("/knowledge", response_model=List[Dict])
 async def list_knowledge(_: None = Depends(require_api_key)) -> List[Dict]:
     """List knowledge PDFs/MD available in /data."""
-    return _list_files(DATA_DIR)
+    return await _run_blocking(_list_files, _knowledge_manifest())
 
 
 @app.get("/knowledge/{name:path}/meta")
-async def get_knowledge_meta(name: str, _: None = Depends(require_api_key)) -> Dict:
+async def get_knowledge_meta(
+    name: str, request: Request, _: None = Depends(require_api_key)
+) -> Dict:
     """Return metadata for a knowledge file (PDF/MD)."""
-    name_path = Path(name)
-    path = (DATA_DIR / name_path).resolve()
-    if not path.is_relative_to(DATA_DIR):
-        raise HTTPException(status_code=400, detail="Invalid knowledge path")
-    if not path.is_file():
-        raise HTTPException(status_code=404, detail="Knowledge file not found")
-    return {
-        "name": path.name,
-        "size_bytes": path.stat().st_size,
-        "suffix": path.suffix,
-    }
+    entry = await _run_blocking(
+        _lookup_manifest_entry,
+        _knowledge_manifest(),
+        DATA_DIR,
+        name,
+        invalid_detail="Invalid knowledge path",
+        missing_detail="Knowledge file not found",
+    )
+
+    metadata = entry.summary()
+    variant = "meta"
+    if _pageable_knowledge(name):
+        index = await _run_blocking(_knowledge_page_index, entry, build=False)
+        metadata["pages_indexed"] = index is not None
+        if index is not None:
+            metadata.update(index.summary())
+            variant = "meta-pages"
+
+    validators = _validator_headers(entry.sha256, entry.mtime_ns, variant)
+    if _is_not_modified(request, validators):
+        return _not_modified_response(validators)
+
+    return JSONResponse(metadata, headers=validators)
+
+
+def _pageable_knowledge(name: str) -> bool:
+    # solo i PDF nella radice di DATA_DIR hanno un indice sidecar
+    return Path(name).name == name and is_indexable(Path(name))
+
+
+@app.get("/knowledge/{name:path}/pages/{number}")
+async def get_knowledge_page(
+    name: str, number: int, request: Request, _: None = Depends(require_api_key)
+) -> Dict:
+    """Return the text of one page (1-based) of a knowledge PDF.
+
+    The text comes from the sidecar page index, so the PDF is never sent nor
+    parsed per request; a missing index is built on first use (needs pypdf).
+    """
+    entry = await _run_blocking(
+        _lookup_manifest_entry,
+        _knowledge_manifest(),
+        DATA_DIR,
+        name,
+        invalid_detail="Invalid knowledge path",
+        missing_detail="Knowledge file not found",
+    )
+    if not _pageable_knowledge(name):
+        raise HTTPException(
+            status_code=404, detail="Pagine disponibili solo per i PDF di /knowledge"
+        )
+
+    if number < 1:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    validators = _validator_headers(entry.sha256, entry.mtime_ns, f"page-{number}")
+    if _is_not_modified(request, validators):
+        return _not_modified_response(validators)
+
+    try:
+        index = await _run_blocking(_knowledge_page_index, entry, build=True)
+    except KnowledgeIndexUnavailable as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    except OSError as exc:
+        raise HTTPException(
+            status_code=503, detail="Indice pagine non disponibile"
+        ) from exc
+    if not 1 <= number <= index.page_count:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    # la voce di outline più vicina che inizia entro la pagina richiesta
+    section, section_page = None, 0
+    for item in index.outline:
+        if section_page <= item["page"] <= number:
+            section, section_page = item["title"], item["page"]
+    text = await _run_blocking(index.read_page, number)
+    return JSONResponse(
+        {
+            "name": entry.name,
+            "page": number,
+            "page_count": index.page_count,
+            "section": section,
+            "text": text,
+        },
+        headers=validators,
+    )
 
 
 @app.post("/ruling-expert")
@@ -1677,4 +2479,7 @@ async def ruling_expert_stub(_: None = Depends(require_api_key)) -> Dict[str, ob
 async def metrics(_: None = Depends(require_metrics_access)) -> Response:
     """Espone le metriche Prometheus protette da API key o allowlist IP."""
 
+    # Il backend del backoff (sqlite/redis) può bloccare: il conteggio va letto
+    # fuori dall'event loop, non in una callback della Gauge.
+    AUTH_BACKOFF_TRACKED_CLIENTS.set(await _run_blocking(_tracked_backoff_clients))
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
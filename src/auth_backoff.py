@@ -0,0 +1,477 @@
+"""Tracker dei tentativi di autenticazione falliti usato da ``require_api_key``.
+
+Every backend exposes the same operations (``lookup``, ``record_failure``,
+``discard``, ``tracked``, ``clear``, ``close``) and the same semantics: an
+entry expires once both its backoff (``blocked_until``) and its idle window
+are over, and at most ``max_entries`` clients are kept, evicting the least
+recently updated ones first. Since every update sets the expiry to
+``now + window``, update order is also expiry order.
+
+- ``memory``: per-process ``OrderedDict``. It is only touched from the event
+  loop (``require_api_key`` is an async dependency), so it needs no lock.
+- ``sqlite``: a file shared by every worker on the same host; state survives
+  restarts. Updates run in ``BEGIN IMMEDIATE`` transactions.
+- ``redis``: any server speaking the Redis protocol, reached over a plain
+  socket (no client library needed). A failure is recorded by one Lua
+  script (``EVAL``): counter, threshold check, ``blocked_until`` and the
+  ``PEXPIREAT`` expiry change together, so the hash never loses its TTL.
+
+Shared backends (``shared = True``) use wall-clock timestamps, because
+``time.monotonic`` is not comparable across processes.
+"""
+
+from __future__ import annotations
+
+import math
+import socket
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Protocol, Sequence
+from urllib.parse import unquote, urlsplit
+
+BACKOFF_BACKENDS = ("memory", "sqlite", "redis")
+
+
+class BackoffEntry(NamedTuple):
+    count: int
+    blocked_until: float
+    expires_at: float
+
+
+class BackoffBackendError(RuntimeError):
+    """A shared backend could not be reached or returned an error."""
+
+
+class BackoffTracker(Protocol):
+    shared: bool
+
+    def lookup(self, client_id: str, now: float) -> BackoffEntry | None: ...
+
+    def record_failure(
+        self, client_id: str, now: float, *, threshold: int, window: float
+    ) -> BackoffEntry: ...
+
+    def discard(self, client_id: str) -> None: ...
+
+    def tracked(self, now: float) -> int: ...
+
+    def clear(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+def _next_entry(
+    previous: BackoffEntry | None, now: float, threshold: int, window: float
+) -> BackoffEntry:
+    count = (previous.count if previous is not None else 0) + 1
+    blocked_until = previous.blocked_until if previous is not None else 0.0
+    if count >= threshold:
+        blocked_until = now + window
+    return BackoffEntry(count, blocked_until, max(blocked_until, now + window))
+
+
+class MemoryBackoffTracker(Mapping):
+    """Bounded in-process tracker keyed by client identifier."""
+
+    shared = False
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(int(max_entries), 1)
+        self.evictions = 0
+        self._entries: "OrderedDict[str, BackoffEntry]" = OrderedDict()
+
+    def lookup(self, client_id: str, now: float) -> BackoffEntry | None:
+        """Return the live entry for ``client_id``, dropping it if expired."""
+
+        entry = self._entries.get(client_id)
+        if entry is not None and entry.expires_at <= now:
+            del self._entries[client_id]
+            return None
+        return entry
+
+    def record_failure(
+        self, client_id: str, now: float, *, threshold: int, window: float
+    ) -> BackoffEntry:
+        """Count a failed attempt; block for ``window`` once ``threshold`` is hit."""
+
+        entry = _next_entry(self.lookup(client_id, now), now, threshold, window)
+        self._entries[client_id] = entry
+        self._entries.move_to_end(client_id)
+        self.prune(now)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def discard(self, client_id: str) -> None:
+        self._entries.pop(client_id, None)
+
+    def prune(self, now: float) -> int:
+        """Drop expired entries from the head; return how many were removed."""
+
+        removed = 0
+        while self._entries:
+            client_id, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            del self._entries[client_id]
+            removed += 1
+        return removed
+
+    def tracked(self, now: float) -> int:
+        self.prune(now)
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def close(self) -> None:
+        pass
+
+    def __getitem__(self, client_id: str) -> BackoffEntry:
+        return self._entries[client_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackoffTracker:
+    """Tracker stored in a SQLite file shared by the workers of one host."""
+
+    shared = True
+
+    def __init__(self, path: Path, max_entries: int, *, timeout: float = 5.0) -> None:
+        self.path = Path(path)
+        self.max_entries = max(int(max_entries), 1)
+        self.timeout = timeout
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS auth_backoff ("
+                " client_id TEXT PRIMARY KEY,"
+                " count INTEGER NOT NULL,"
+                " blocked_until REAL NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS auth_backoff_expires"
+                " ON auth_backoff (expires_at)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _run(self, operation, *, write: bool = False):
+        with self._lock:
+            try:
+                connection = self._connect()
+                if not write:
+                    return operation(connection)
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    result = operation(connection)
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+                connection.execute("COMMIT")
+                return result
+            except sqlite3.Error as exc:
+                raise BackoffBackendError(f"sqlite backoff store: {exc}") from exc
+
+    @staticmethod
+    def _select(
+        connection: sqlite3.Connection, client_id: str, now: float
+    ) -> BackoffEntry | None:
+        row = connection.execute(
+            "SELECT count, blocked_until, expires_at FROM auth_backoff"
+            " WHERE client_id = ?",
+            (client_id,),
+        ).fetchone()
+        if row is None or row[2] <= now:
+            return None
+        return BackoffEntry(*row)
+
+    def lookup(self, client_id: str, now: float) -> BackoffEntry | None:
+        return self._run(lambda connection: self._select(connection, client_id, now))
+
+    def record_failure(
+        self, client_id: str, now: float, *, threshold: int, window: float
+    ) -> BackoffEntry:
+        def update(connection: sqlite3.Connection) -> BackoffEntry:
+            entry = _next_entry(
+                self._select(connection, client_id, now), now, threshold, window
+            )
+            connection.execute(
+                "INSERT INTO auth_backoff VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (client_id) DO UPDATE SET count = excluded.count,"
+                " blocked_until = excluded.blocked_until,"
+                " expires_at = excluded.expires_at",
+                (client_id, *entry),
+            )
+            connection.execute("DELETE FROM auth_backoff WHERE expires_at <= ?", (now,))
+            connection.execute(
+                "DELETE FROM auth_backoff WHERE client_id IN ("
+                " SELECT client_id FROM auth_backoff ORDER BY expires_at DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            return entry
+
+        return self._run(update, write=True)
+
+    def discard(self, client_id: str) -> None:
+        self._run(
+            lambda connection: connection.execute(
+                "DELETE FROM auth_backoff WHERE client_id = ?", (client_id,)
+            )
+        )
+
+    def tracked(self, now: float) -> int:
+        def count(connection: sqlite3.Connection) -> int:
+            connection.execute("DELETE FROM auth_backoff WHERE expires_at <= ?", (now,))
+            return connection.execute("SELECT COUNT(*) FROM auth_backoff").fetchone()[0]
+
+        return self._run(count, write=True)
+
+    def clear(self) -> None:
+        self._run(lambda connection: connection.execute("DELETE FROM auth_backoff"))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class _RespConnection:
+    """Minimal Redis-protocol (RESP2) client: pipelined commands over a socket."""
+
+    def __init__(self, url: str, timeout: float) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("redis", ""):
+            raise ValueError(f"Schema Redis non supportato: {url}")
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.strip("/") or 0)
+        self.timeout = timeout
+        self._socket: socket.socket | None = None
+        self._reader = None
+
+    def _connect(self) -> None:
+        self._socket = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout
+        )
+        self._reader = self._socket.makefile("rb")
+        handshake: List[Sequence[object]] = []
+        if self.password is not None:
+            handshake.append(("AUTH", self.password))
+        if self.db:
+            handshake.append(("SELECT", self.db))
+        if handshake:
+            self._roundtrip(handshake)
+
+    @staticmethod
+    def _encode(command: Sequence[object]) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for argument in command:
+            data = argument if isinstance(argument, bytes) else str(argument).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connessione Redis chiusa")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            return BackoffBackendError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2].decode()
+        if prefix == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise BackoffBackendError(f"risposta Redis non valida: {line!r}")
+
+    def _roundtrip(self, commands: Sequence[Sequence[object]]) -> list:
+        self._socket.sendall(b"".join(self._encode(command) for command in commands))
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, BackoffBackendError):
+                raise reply
+        return replies
+
+    def execute(self, *commands: Sequence[object]) -> list:
+        try:
+            if self._socket is None:
+                self._connect()
+            return self._roundtrip(commands)
+        except (OSError, ValueError) as exc:
+            self.close()
+            raise BackoffBackendError(f"redis backoff store: {exc}") from exc
+        except BackoffBackendError:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+                self._reader = None
+
+
+# KEYS: hash del client, zset dell'indice.
+# ARGV: soglia, expires_at (secondi), expires_at (ms), client id.
+RECORD_FAILURE_SCRIPT = """\
+local count = redis.call('HINCRBY', KEYS[1], 'count', 1)
+local blocked = redis.call('HGET', KEYS[1], 'blocked_until') or '0'
+if count >= tonumber(ARGV[1]) and tonumber(blocked) < tonumber(ARGV[2]) then
+  blocked = ARGV[2]
+  redis.call('HSET', KEYS[1], 'blocked_until', blocked)
+end
+redis.call('PEXPIREAT', KEYS[1], ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[4])
+return {count, blocked}
+"""
+
+
+class RedisBackoffTracker:
+    """Tracker shared through a Redis-protocol server.
+
+    Each client is a hash ``{prefix}client:{id}`` with ``count`` and
+    ``blocked_until``, expiring at its ``expires_at``; the sorted set
+    ``{prefix}clients`` scores clients by expiry and bounds the total.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        url: str,
+        max_entries: int,
+        *,
+        prefix: str = "auth_backoff:",
+        timeout: float = 2.0,
+    ) -> None:
+        self.max_entries = max(int(max_entries), 1)
+        self.prefix = prefix
+        self._index = f"{prefix}clients"
+        self._connection = _RespConnection(url, timeout)
+        self._lock = threading.Lock()
+
+    def _key(self, client_id: str) -> str:
+        return f"{self.prefix}client:{client_id}"
+
+    def _execute(self, *commands: Sequence[object]) -> list:
+        with self._lock:
+            return self._connection.execute(*commands)
+
+    def lookup(self, client_id: str, now: float) -> BackoffEntry | None:
+        (count, blocked_until), expires_at = self._execute(
+            ("HMGET", self._key(client_id), "count", "blocked_until"),
+            ("ZSCORE", self._index, client_id),
+        )
+        if count is None or expires_at is None or float(expires_at) <= now:
+            return None
+        return BackoffEntry(int(count), float(blocked_until or 0.0), float(expires_at))
+
+    def record_failure(
+        self, client_id: str, now: float, *, threshold: int, window: float
+    ) -> BackoffEntry:
+        expires_at = now + window
+        ((count, blocked_until),) = self._execute(
+            (
+                "EVAL",
+                RECORD_FAILURE_SCRIPT,
+                2,
+                self._key(client_id),
+                self._index,
+                threshold,
+                repr(expires_at),
+                math.ceil(expires_at * 1000),
+                client_id,
+            )
+        )
+        self._evict(now)
+        return BackoffEntry(int(count), float(blocked_until), expires_at)
+
+    def _evict(self, now: float) -> int:
+        _, size = self._execute(
+            ("ZREMRANGEBYSCORE", self._index, "-inf", repr(now)),
+            ("ZCARD", self._index),
+        )
+        overflow = size - self.max_entries
+        if overflow > 0:
+            (popped,) = self._execute(("ZPOPMIN", self._index, overflow))
+            victims = [self._key(client_id) for client_id in popped[::2]]
+            self._execute(("DEL", *victims))
+            size -= len(victims)
+        return size
+
+    def discard(self, client_id: str) -> None:
+        self._execute(("DEL", self._key(client_id)), ("ZREM", self._index, client_id))
+
+    def tracked(self, now: float) -> int:
+        return self._evict(now)
+
+    def clear(self) -> None:
+        (members,) = self._execute(("ZRANGE", self._index, 0, -1))
+        self._execute(
+            ("DEL", self._index, *(self._key(client_id) for client_id in members))
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def build_backoff_tracker(
+    backend: str,
+    *,
+    max_entries: int,
+    sqlite_path: Path | None = None,
+    redis_url: str | None = None,
+) -> BackoffTracker:
+    """Instantiate the tracker selected by ``AUTH_BACKOFF_BACKEND``."""
+
+    if backend == "memory":
+        return MemoryBackoffTracker(max_entries)
+    if backend == "sqlite":
+        if sqlite_path is None:
+            raise ValueError("AUTH_BACKOFF_SQLITE_PATH è richiesto con backend sqlite")
+        return SQLiteBackoffTracker(sqlite_path, max_entries)
+    if backend == "redis":
+        if not redis_url:
+            raise ValueError("AUTH_BACKOFF_REDIS_URL è richiesto con backend redis")
+        return RedisBackoffTracker(redis_url, max_entries)
+    raise ValueError(
+        f"AUTH_BACKOFF_BACKEND non valido: {backend!r} (ammessi: {', '.join(BACKOFF_BACKENDS)})"
+    )
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -6,6 +7,12 @@ MODULES_DIR = BASE_DIR / "modules"
 DATA_DIR = BASE_DIR / "data"
 
 
+def _buckets(raw: str) -> tuple[float, ...]:
+    """Parse a comma-separated list of histogram bucket boundaries."""
+
+    return tuple(sorted({float(value) for value in raw.split(",") if value.strip()}))
+
+
 class Settings:
     """Configurazione base caricata da variabili d'ambiente."""
 
@@ -36,7 +43,66 @@ class Settings:
         self.auth_backoff_seconds: int = int(
             os.getenv("AUTH_BACKOFF_SECONDS", "60")
         )  # finestra di backoff in secondi
+        self.auth_backoff_max_clients: int = int(
+            os.getenv("AUTH_BACKOFF_MAX_CLIENTS", "10000")
+        )  # client tracciati dal backoff prima dell'evizione LRU
+        self.auth_backoff_backend: str = os.getenv(
+            "AUTH_BACKOFF_BACKEND", "memory"
+        ).lower()  # memory (per processo) | sqlite (file condiviso) | redis
+        self.auth_backoff_sqlite_path: Path = Path(
+            os.getenv(
+                "AUTH_BACKOFF_SQLITE_PATH",
+                str(Path(tempfile.gettempdir()) / "master_dd_auth_backoff.sqlite3"),
+            )
+        )  # file condiviso dai worker dello stesso host
+        self.auth_backoff_redis_url: str = os.getenv(
+            "AUTH_BACKOFF_REDIS_URL", "redis://localhost:6379/0"
+        )  # server compatibile col protocollo Redis
+        self.module_cache_max_bytes: int = int(
+            os.getenv("MODULE_CACHE_MAX_BYTES", str(16 * 1024 * 1024))
+        )  # tetto di memoria della cache moduli (0 = cache disattivata)
+        self.stub_cache_max_entries: int = int(
+            os.getenv("STUB_CACHE_MAX_ENTRIES", "512")
+        )  # risposte stub memorizzate (0 = memo disattivata)
+        self.module_manifest_watch: str = os.getenv(
+            "MODULE_MANIFEST_WATCH", "auto"
+        ).lower()  # auto (watchfiles se disponibile) | poll | off
+        self.module_manifest_poll_seconds: float = float(
+            os.getenv("MODULE_MANIFEST_POLL_SECONDS", "2")
+        )  # intervallo del watcher a polling
+        self.taverna_saves_quota_ttl_seconds: float = float(
+            os.getenv("TAVERNA_SAVES_QUOTA_TTL_SECONDS", "2")
+        )  # validità del ledger quote di taverna_saves prima di ricontrollare il disco
+        self.knowledge_index_dir: Path = Path(
+            os.getenv(
+                "KNOWLEDGE_INDEX_DIR",
+                str(Path(tempfile.gettempdir()) / "master_dd_knowledge_index"),
+            )
+        )  # sidecar con testo per pagina e outline dei PDF di /knowledge
+        self.knowledge_index_on_startup: bool = os.getenv(
+            "KNOWLEDGE_INDEX_ON_STARTUP", "false"
+        ).lower() in (
+            "1",
+            "true",
+            "yes",
+            "y",
+        )  # estrae all'avvio gli indici mancanti o superati (richiede pypdf)
+        self.api_io_workers: int = int(
+            os.getenv("API_IO_WORKERS", "8")
+        )  # thread per I/O su disco e validazione (0 = esecuzione sull'event loop)
         self.metrics_api_key: str | None = os.getenv("METRICS_API_KEY")
+        self.metrics_latency_buckets: tuple[float, ...] = _buckets(
+            os.getenv(
+                "METRICS_LATENCY_BUCKETS",
+                "0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10",
+            )
+        )  # secondi, per durata richieste e fasi dello stub builder
+        self.metrics_size_buckets: tuple[float, ...] = _buckets(
+            os.getenv(
+                "METRICS_SIZE_BUCKETS",
+                "256,1024,4096,16384,65536,262144,1048576,4194304,16777216",
+            )
+        )  # byte, per la dimensione delle risposte
         self.metrics_ip_allowlist: list[str] = [
             ip.strip()
             for ip in os.getenv("METRICS_IP_ALLOWLIST", "").split(",")
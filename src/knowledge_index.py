@@ -0,0 +1,255 @@
+"""Indice delle pagine dei PDF di ``/knowledge``.
+
+Extracting text from the knowledge PDFs takes seconds per file, so it is done
+once (offline with ``tools/build_knowledge_index.py``, at startup with
+``KNOWLEDGE_INDEX_ON_STARTUP`` or on the first page request) and stored in
+two sidecar files per PDF inside the index directory:
+
+- ``<name>.pages.txt``: the UTF-8 text of every page, concatenated;
+- ``<name>.index.json``: page count, outline, document info and the byte
+  ``[offset, length]`` of each page in the text file, plus the sha256 of the
+  source PDF so stale indexes are detected.
+
+Serving a page only seeks into the text file: the PDF itself is never read
+on the request path. Text extraction needs the optional ``pypdf`` package,
+imported only when an index is built; without it existing indexes keep
+working and building raises :class:`KnowledgeIndexUnavailable`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Tuple
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index.json"
+PAGES_SUFFIX = ".pages.txt"
+PDF_SUFFIX = ".pdf"
+DOCUMENT_FIELDS = ("title", "author", "subject", "creator", "producer")
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeIndexUnavailable(RuntimeError):
+    """The index is missing and cannot be built (no ``pypdf``)."""
+
+
+@dataclass(frozen=True)
+class PageIndex:
+    name: str
+    source_sha256: str
+    page_count: int
+    outline: Tuple[Mapping[str, object], ...]
+    document: Mapping[str, str]
+    pages: Tuple[Tuple[int, int], ...]
+    text_path: Path
+
+    def read_page(self, number: int) -> str:
+        """Text of page ``number`` (1-based); raises ``IndexError`` if out of range."""
+
+        if not 1 <= number <= self.page_count:
+            raise IndexError(number)
+        offset, length = self.pages[number - 1]
+        with self.text_path.open("rb") as handle:
+            handle.seek(offset)
+            return handle.read(length).decode("utf-8")
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "page_count": self.page_count,
+            "outline": [dict(item) for item in self.outline],
+            "document": dict(self.document),
+        }
+
+
+def is_indexable(path: Path) -> bool:
+    return path.suffix.lower() == PDF_SUFFIX
+
+
+def index_paths(index_dir: Path, name: str) -> Tuple[Path, Path]:
+    return index_dir / f"{name}{INDEX_SUFFIX}", index_dir / f"{name}{PAGES_SUFFIX}"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_index(index_dir: Path, name: str, source_sha256: str) -> PageIndex | None:
+    """Return the sidecar index of ``name`` or ``None`` if missing or stale."""
+
+    header_path, text_path = index_paths(index_dir, name)
+    try:
+        header = json.loads(header_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(header, dict)
+        or header.get("version") != INDEX_VERSION
+        or header.get("source_sha256") != source_sha256
+        or not text_path.is_file()
+    ):
+        return None
+    pages = tuple((int(offset), int(length)) for offset, length in header["pages"])
+    return PageIndex(
+        name=name,
+        source_sha256=source_sha256,
+        page_count=len(pages),
+        outline=tuple(header.get("outline") or ()),
+        document=dict(header.get("document") or {}),
+        pages=pages,
+        text_path=text_path,
+    )
+
+
+def build_index(
+    source: Path, index_dir: Path, *, source_sha256: str | None = None
+) -> PageIndex:
+    """Extract ``source`` and write its sidecar files atomically."""
+
+    try:
+        # importato solo per estrarre: pypdf pesa ~80 ms sull'avvio dell'API
+        import pypdf
+    except ModuleNotFoundError as exc:
+        raise KnowledgeIndexUnavailable(
+            "Estrazione PDF non disponibile: installa il pacchetto pypdf"
+        ) from exc
+    source_sha256 = source_sha256 or file_sha256(source)
+    texts, outline, document = _extract_pdf(pypdf.PdfReader(str(source)))
+
+    offsets: List[List[int]] = []
+    encoded: List[bytes] = []
+    position = 0
+    for text in texts:
+        data = text.encode("utf-8")
+        offsets.append([position, len(data)])
+        encoded.append(data)
+        position += len(data)
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    header_path, text_path = index_paths(index_dir, source.name)
+    header = {
+        "version": INDEX_VERSION,
+        "source": source.name,
+        "source_sha256": source_sha256,
+        "page_count": len(texts),
+        "outline": outline,
+        "document": document,
+        "pages": offsets,
+    }
+    # il testo va pubblicato prima dell'header che ne descrive gli offset
+    _atomic_write(text_path, b"".join(encoded))
+    _atomic_write(
+        header_path, json.dumps(header, ensure_ascii=False, indent=2).encode("utf-8")
+    )
+    return PageIndex(
+        name=source.name,
+        source_sha256=source_sha256,
+        page_count=len(texts),
+        outline=tuple(outline),
+        document=document,
+        pages=tuple((offset, length) for offset, length in offsets),
+        text_path=text_path,
+    )
+
+
+def ensure_index(source: Path, index_dir: Path) -> Tuple[PageIndex, bool]:
+    """Load the index of ``source`` or rebuild it; the flag is ``True`` if built."""
+
+    source_sha256 = file_sha256(source)
+    index = load_index(index_dir, source.name, source_sha256)
+    if index is not None:
+        return index, False
+    return build_index(source, index_dir, source_sha256=source_sha256), True
+
+
+def ensure_indexes(data_dir: Path, index_dir: Path) -> Dict[str, str]:
+    """Index every PDF of ``data_dir``; map each name to its outcome."""
+
+    outcomes: Dict[str, str] = {}
+    for source in sorted(data_dir.iterdir()):
+        if not source.is_file() or not is_indexable(source):
+            continue
+        try:
+            _, built = ensure_index(source, index_dir)
+        except KnowledgeIndexUnavailable:
+            raise
+        except Exception as exc:  # PDF corrotti: gli altri vanno indicizzati
+            logger.warning(
+                "Indicizzazione PDF non riuscita",
+                extra={"path": str(source), "error": str(exc)},
+            )
+            outcomes[source.name] = "error"
+            continue
+        outcomes[source.name] = "built" if built else "fresh"
+    return outcomes
+
+
+def _extract_pdf(
+    reader,
+) -> Tuple[List[str], List[Dict[str, object]], Dict[str, str]]:
+    texts = [_page_text(page) for page in reader.pages]
+
+    outline: List[Dict[str, object]] = []
+
+    def walk(items, level: int) -> None:
+        for item in items:
+            if isinstance(item, list):
+                walk(item, level + 1)
+                continue
+            try:
+                page = reader.get_destination_page_number(item) + 1
+            except Exception:  # destinazioni esterne o malformate
+                continue
+            title = " ".join(str(item.title or "").split())
+            if title and page >= 1:
+                outline.append({"title": title, "page": page, "level": level})
+
+    try:
+        walk(reader.outline, 1)
+    except Exception as exc:  # pragma: no cover - outline malformato
+        logger.warning("Outline PDF non leggibile", extra={"error": str(exc)})
+
+    document: Dict[str, str] = {}
+    info = reader.metadata or {}
+    for field in DOCUMENT_FIELDS:
+        value = getattr(info, field, None) if info else None
+        if value:
+            document[field] = str(value).strip()
+    return texts, outline, document
+
+
+def _page_text(page) -> str:
+    try:
+        text = page.extract_text(extraction_mode="layout")
+    except Exception:  # il layout mode non regge ogni font: ripiega sul testo piano
+        text = page.extract_text() or ""
+    lines = [line.rstrip() for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip("\n") + "\n"
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    descriptor, raw_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".part"
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        # mkstemp crea file 0600: l'indice è letto anche da altri worker/utenti
+        os.chmod(raw_path, 0o644)
+        os.replace(raw_path, path)
+    except BaseException:
+        Path(raw_path).unlink(missing_ok=True)
+        raise
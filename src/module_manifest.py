@@ -0,0 +1,290 @@
+"""Manifest precalcolato dei file esposti da ``/modules`` e ``/knowledge``.
+
+The manifest is built once at startup and published as an immutable
+snapshot: listing and metadata endpoints only perform dictionary lookups.
+Updates coming from the filesystem watcher, or from a stat mismatch detected
+on lookup, rebuild just the changed entries and publish a new snapshot
+copy-on-write, so readers never take a lock.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import stat
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Tuple
+
+try:  # pragma: no cover - dipende dagli extra installati (uvicorn[standard])
+    import watchfiles
+except ModuleNotFoundError:  # pragma: no cover - fallback a polling
+    watchfiles = None  # type: ignore[assignment]
+
+FileSignature = Tuple[int, int, int]
+MetadataParser = Callable[[Path, bytes], Mapping[str, object]]
+
+logger = logging.getLogger(__name__)
+
+
+def file_signature(stat_result: os.stat_result) -> FileSignature:
+    """Identity of a file version: ``(st_mtime_ns, st_size, st_ino)``."""
+
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    name: str
+    size_bytes: int
+    suffix: str
+    signature: FileSignature
+    sha256: str
+    metadata: Mapping[str, object]
+
+    @property
+    def mtime_ns(self) -> int:
+        return self.signature[0]
+
+    def summary(self) -> Dict[str, object]:
+        return {"name": self.name, "size_bytes": self.size_bytes, "suffix": self.suffix}
+
+
+@dataclass(frozen=True)
+class ManifestSnapshot:
+    """Immutable view of a directory; ``listing`` mirrors its top-level files."""
+
+    base: Path
+    directory_mtime_ns: int
+    entries: Mapping[str, ManifestEntry]
+    listing: Tuple[Dict[str, object], ...]
+
+
+class DirectoryManifest:
+    """Precomputed manifest for the regular files of a single directory."""
+
+    def __init__(self, base: Path, metadata_parser: MetadataParser | None = None):
+        self.base = base
+        self._metadata_parser = metadata_parser
+        self._snapshot: ManifestSnapshot | None = None
+        self._lock = threading.Lock()
+
+    def current(self) -> ManifestSnapshot:
+        """Return the published snapshot, rescanning if entries were added/removed.
+
+        Only the directory itself is stat-ed: in-place edits are picked up by
+        the watcher or by :meth:`lookup`.
+        """
+
+        snapshot = self._snapshot
+        if (
+            snapshot is None
+            or snapshot.directory_mtime_ns != self.base.stat().st_mtime_ns
+        ):
+            snapshot = self.rescan()
+        return snapshot
+
+    def lookup(self, path: Path) -> ManifestEntry | None:
+        """Return the entry for ``path`` or ``None`` if it is not a regular file."""
+
+        try:
+            stat_result = path.stat()
+        except OSError:
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+
+        key = path.relative_to(self.base).as_posix()
+        snapshot = self._snapshot
+        entry = snapshot.entries.get(key) if snapshot is not None else None
+        if entry is not None and entry.signature == file_signature(stat_result):
+            return entry
+
+        with self._lock:
+            entry = self._build_entry(path, stat_result)
+            snapshot = self._snapshot
+            if snapshot is None:
+                self._snapshot = ManifestSnapshot(
+                    base=self.base,
+                    directory_mtime_ns=-1,
+                    entries=MappingProxyType({key: entry}),
+                    listing=(),
+                )
+            else:
+                entries = dict(snapshot.entries)
+                entries[key] = entry
+                self._publish(entries, snapshot.directory_mtime_ns)
+        return entry
+
+    def rescan(self) -> ManifestSnapshot:
+        """Rebuild the snapshot, re-reading only files whose signature changed."""
+
+        with self._lock:
+            previous = self._snapshot
+            previous_entries = previous.entries if previous is not None else {}
+            directory_mtime_ns = self.base.stat().st_mtime_ns
+
+            entries: Dict[str, ManifestEntry] = {}
+            for path in sorted(self.base.iterdir()):
+                try:
+                    stat_result = path.stat()
+                except OSError:
+                    continue
+                if not stat.S_ISREG(stat_result.st_mode):
+                    continue
+                cached = previous_entries.get(path.name)
+                if cached is not None and cached.signature == file_signature(
+                    stat_result
+                ):
+                    entries[path.name] = cached
+                else:
+                    entries[path.name] = self._build_entry(path, stat_result)
+
+            if (
+                previous is not None
+                and previous.directory_mtime_ns == directory_mtime_ns
+                and len(previous.listing) == len(entries)
+                and all(previous_entries.get(k) is v for k, v in entries.items())
+            ):
+                return previous
+
+            # Le voci annidate (es. knowledge/modules/...) restano valide finché
+            # la loro firma coincide: lookup() le ricontrolla a ogni accesso.
+            for key, entry in previous_entries.items():
+                if "/" in key:
+                    entries.setdefault(key, entry)
+            return self._publish(entries, directory_mtime_ns)
+
+    def refresh(self, changed: Iterable[Path]) -> None:
+        """Apply watcher events: drop stale nested entries, then rescan."""
+
+        stale: List[str] = []
+        for path in changed:
+            try:
+                key = path.relative_to(self.base).as_posix()
+            except ValueError:
+                continue
+            if "/" in key:
+                stale.append(key)
+        if stale:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is not None:
+                    entries = {
+                        k: v for k, v in snapshot.entries.items() if k not in stale
+                    }
+                    self._publish(entries, snapshot.directory_mtime_ns)
+        try:
+            self.rescan()
+        except OSError as exc:
+            logger.warning(
+                "Aggiornamento manifest non riuscito",
+                extra={"path": str(self.base), "error": str(exc)},
+            )
+
+    def _build_entry(self, path: Path, stat_result: os.stat_result) -> ManifestEntry:
+        with path.open("rb") as source:
+            stat_result = os.fstat(source.fileno())
+            raw = source.read()
+        metadata: Mapping[str, object] = {}
+        if self._metadata_parser is not None:
+            metadata = MappingProxyType(dict(self._metadata_parser(path, raw)))
+        return ManifestEntry(
+            name=path.name,
+            size_bytes=stat_result.st_size,
+            suffix=path.suffix,
+            signature=file_signature(stat_result),
+            sha256=hashlib.sha256(raw).hexdigest(),
+            metadata=metadata,
+        )
+
+    def _publish(
+        self, entries: Dict[str, ManifestEntry], directory_mtime_ns: int
+    ) -> ManifestSnapshot:
+        listing = tuple(
+            entries[key].summary() for key in sorted(entries) if "/" not in key
+        )
+        snapshot = ManifestSnapshot(
+            base=self.base,
+            directory_mtime_ns=directory_mtime_ns,
+            entries=MappingProxyType(entries),
+            listing=listing,
+        )
+        self._snapshot = snapshot
+        return snapshot
+
+
+class ManifestWatcher:
+    """Background thread keeping a set of manifests in sync with the disk.
+
+    ``mode`` is ``auto`` (native notifications through ``watchfiles`` when
+    installed, polling otherwise), ``poll`` or ``off``.
+    """
+
+    def __init__(
+        self,
+        manifests: Iterable[DirectoryManifest],
+        *,
+        mode: str = "auto",
+        poll_interval: float = 2.0,
+    ) -> None:
+        self.manifests = [m for m in manifests if m.base.is_dir()]
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def native(self) -> bool:
+        return self.mode == "auto" and watchfiles is not None
+
+    def start(self) -> None:
+        if self.mode == "off" or not self.manifests or self._thread is not None:
+            return
+        target = self._run_native if self.native else self._run_polling
+        self._thread = threading.Thread(
+            target=target, name="module-manifest-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run_native(self) -> None:
+        bases = [m.base for m in self.manifests]
+        try:
+            for changes in watchfiles.watch(
+                *bases,
+                watch_filter=None,
+                debounce=200,
+                stop_event=self._stop,
+                raise_interrupt=False,
+            ):
+                self._dispatch(Path(raw_path) for _, raw_path in changes)
+        except Exception as exc:  # pragma: no cover - backend nativo non disponibile
+            logger.warning("Watcher nativo non disponibile, passo al polling: %s", exc)
+            self._run_polling()
+
+    def _run_polling(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            for manifest in self.manifests:
+                try:
+                    manifest.rescan()
+                except OSError as exc:
+                    logger.warning(
+                        "Polling manifest non riuscito",
+                        extra={"path": str(manifest.base), "error": str(exc)},
+                    )
+
+    def _dispatch(self, changed: Iterable[Path]) -> None:
+        changed = list(changed)
+        for manifest in self.manifests:
+            relevant = [p for p in changed if p.is_relative_to(manifest.base)]
+            if relevant:
+                manifest.refresh(relevant)
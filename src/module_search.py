@@ -0,0 +1,294 @@
+"""Indice invertito full-text per ``GET /search``.
+
+Each text module is split into segments along the section index of
+:mod:`src.module_sections` (top-level keys, banners, markdown headings) and
+every segment is a BM25 document. Postings map a folded token to the
+segments containing it, with term frequency and first char offset, so a query
+only touches the postings of its own tokens.
+
+The index is refreshed incrementally: files are re-read only when their
+``(mtime_ns, size, inode)`` signature changes and re-tokenised only when
+their SHA-256 changes.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import math
+import os
+import re
+import stat
+import threading
+import unicodedata
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from .module_manifest import FileSignature, file_signature
+from .module_sections import build_section_index
+
+WORD = re.compile(r"\w+")
+SEARCH_SUFFIXES = {".txt", ".md"}
+MIN_TOKEN_CHARS = 2
+SNIPPET_BEFORE_CHARS = 80
+SNIPPET_AFTER_CHARS = 160
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+DocumentKey = Tuple[str, int]  # (file key, segment index)
+
+
+@functools.lru_cache(maxsize=65536)
+def fold(token: str) -> str:
+    """Lowercase and strip accents, so ``Modalità`` matches ``modalita``."""
+
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[Tuple[str, int]]:
+    """Return ``(folded_token, char_offset)`` pairs for ``text``."""
+
+    return [
+        (fold(match.group()), match.start())
+        for match in WORD.finditer(text)
+        if len(match.group()) >= MIN_TOKEN_CHARS
+    ]
+
+
+@dataclass(frozen=True)
+class Segment:
+    section: str | None
+    start: int  # char offset in the module text
+    end: int
+    length: int  # token count
+
+
+@dataclass(frozen=True)
+class IndexedFile:
+    source: str
+    name: str
+    signature: FileSignature
+    sha256: str
+    text: str
+    segments: Tuple[Segment, ...]
+    # token -> {segment index: (term frequency, first char offset)}
+    postings: Mapping[str, Mapping[int, Tuple[int, int]]]
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    source: str
+    name: str
+    section: str | None
+    offset: int
+    score: float
+    snippet: str
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "source": self.source,
+            "name": self.name,
+            "section": self.section,
+            "offset": self.offset,
+            "score": round(self.score, 4),
+            "snippet": self.snippet,
+        }
+
+
+def _segments(raw: bytes, text: str, suffix: str) -> List[Tuple[str | None, int]]:
+    """Cut the module at every section start: ``(section key, char start)``."""
+
+    spans = sorted(build_section_index(raw, suffix), key=lambda span: span.start)
+    cuts: List[Tuple[str | None, int]] = [(None, 0)]
+    byte_position = char_position = 0
+    for span in spans:
+        char_position += len(
+            raw[byte_position : span.start].decode("utf-8", errors="ignore")
+        )
+        byte_position = span.start
+        # a parità di offset vince la sezione più interna (l'ultima)
+        if cuts[-1][1] == char_position:
+            cuts[-1] = (span.key, char_position)
+        else:
+            cuts.append((span.key, char_position))
+    if len(cuts) > 1 and cuts[0] == (None, 0) and not text[: cuts[1][1]].strip():
+        cuts.pop(0)
+    return cuts
+
+
+def index_file(
+    source: str, name: str, signature: FileSignature, raw: bytes, suffix: str
+) -> IndexedFile:
+    text = raw.decode("utf-8", errors="ignore")
+    cuts = _segments(raw, text, suffix)
+    bounds = [start for _, start in cuts[1:]] + [len(text)]
+
+    segments: List[Segment] = []
+    postings: Dict[str, Dict[int, Tuple[int, int]]] = {}
+    for index, ((section, start), end) in enumerate(zip(cuts, bounds)):
+        tokens = tokenize(text[start:end])
+        for token, offset in tokens:
+            per_segment = postings.setdefault(token, {})
+            frequency, first = per_segment.get(index, (0, start + offset))
+            per_segment[index] = (frequency + 1, first)
+        segments.append(Segment(section, start, end, len(tokens)))
+
+    return IndexedFile(
+        source=source,
+        name=name,
+        signature=signature,
+        sha256=hashlib.sha256(raw).hexdigest(),
+        text=text,
+        segments=tuple(segments),
+        postings=postings,
+    )
+
+
+def snippet(text: str, offset: int) -> str:
+    start = max(offset - SNIPPET_BEFORE_CHARS, 0)
+    end = min(offset + SNIPPET_AFTER_CHARS, len(text))
+    if start > 0:
+        space = text.find(" ", start, offset)
+        start = space + 1 if space != -1 else start
+    if end < len(text):
+        space = text.rfind(" ", offset, end)
+        end = space if space != -1 else end
+    body = " ".join(text[start:end].split())
+    return ("…" if start > 0 else "") + body + ("…" if end < len(text) else "")
+
+
+class SearchIndex:
+    """Inverted index over the top-level text files of a set of directories."""
+
+    def __init__(self, roots: Mapping[str, Path]) -> None:
+        self.roots = dict(roots)
+        self._files: Dict[str, IndexedFile] = {}
+        self._postings: Dict[str, Dict[DocumentKey, Tuple[int, int]]] = {}
+        self._total_length = 0
+        self._document_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def files(self) -> Mapping[str, IndexedFile]:
+        return self._files
+
+    def refresh(self) -> None:
+        """Re-index files whose content changed and drop deleted ones."""
+
+        with self._lock:
+            seen = set()
+            for source, base, path, stat_result in self._scan():
+                key = f"{source}:{path.name}"
+                seen.add(key)
+                signature = file_signature(stat_result)
+                current = self._files.get(key)
+                if current is not None and current.signature == signature:
+                    continue
+                try:
+                    raw = path.read_bytes()
+                except OSError:
+                    continue
+                if (
+                    current is not None
+                    and current.sha256 == hashlib.sha256(raw).hexdigest()
+                ):
+                    self._files[key] = replace(current, signature=signature)
+                    continue
+                self._replace(
+                    key,
+                    index_file(
+                        source,
+                        path.relative_to(base).as_posix(),
+                        signature,
+                        raw,
+                        path.suffix,
+                    ),
+                )
+            for key in [key for key in self._files if key not in seen]:
+                self._replace(key, None)
+
+    def search(self, query: str, limit: int = 10) -> List[SearchHit]:
+        """Rank segments with BM25 over the query tokens (OR semantics)."""
+
+        terms = list(dict.fromkeys(token for token, _ in tokenize(query)))
+        with self._lock:
+            return self._search(terms, limit)
+
+    def _search(self, terms: List[str], limit: int) -> List[SearchHit]:
+        if not terms or not self._document_count:
+            return []
+
+        average_length = self._total_length / self._document_count
+        scores: Dict[DocumentKey, float] = {}
+        best_term: Dict[DocumentKey, Tuple[float, int]] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            matches = len(postings)
+            idf = math.log(1 + (self._document_count - matches + 0.5) / (matches + 0.5))
+            for document, (frequency, first) in postings.items():
+                file_key, segment_index = document
+                length = self._files[file_key].segments[segment_index].length
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[document] = scores.get(document, 0.0) + idf * (
+                    frequency * (BM25_K1 + 1) / (frequency + norm)
+                )
+                if idf > best_term.get(document, (-1.0, 0))[0]:
+                    best_term[document] = (idf, first)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        hits: List[SearchHit] = []
+        for (file_key, segment_index), score in ranked:
+            indexed = self._files[file_key]
+            offset = best_term[(file_key, segment_index)][1]
+            hits.append(
+                SearchHit(
+                    source=indexed.source,
+                    name=indexed.name,
+                    section=indexed.segments[segment_index].section,
+                    offset=offset,
+                    score=score,
+                    snippet=snippet(indexed.text, offset),
+                )
+            )
+        return hits
+
+    def _scan(self) -> Iterable[Tuple[str, Path, Path, os.stat_result]]:
+        for source, base in self.roots.items():
+            try:
+                entries = sorted(base.iterdir())
+            except OSError:
+                continue
+            for path in entries:
+                if path.suffix.lower() not in SEARCH_SUFFIXES:
+                    continue
+                try:
+                    stat_result = path.stat()
+                except OSError:
+                    continue
+                if stat.S_ISREG(stat_result.st_mode):
+                    yield source, base, path, stat_result
+
+    def _replace(self, key: str, indexed: IndexedFile | None) -> None:
+        previous = self._files.pop(key, None)
+        if previous is not None:
+            for token, per_segment in previous.postings.items():
+                postings = self._postings[token]
+                for segment_index in per_segment:
+                    del postings[(key, segment_index)]
+                if not postings:
+                    del self._postings[token]
+            self._total_length -= sum(s.length for s in previous.segments)
+            self._document_count -= len(previous.segments)
+        if indexed is None:
+            return
+        self._files[key] = indexed
+        for token, per_segment in indexed.postings.items():
+            postings = self._postings.setdefault(token, {})
+            for segment_index, value in per_segment.items():
+                postings[(key, segment_index)] = value
+        self._total_length += sum(s.length for s in indexed.segments)
+        self._document_count += len(indexed.segments)
@@ -0,0 +1,188 @@
+"""Indice delle sezioni dei moduli testuali per ``/modules/{name}/sections``.
+
+The kernel modules are YAML-like documents: top-level keys (``triggers:``,
+``objectives:``) grouped under comment banners such as::
+
+    # ---------------------------------
+    # 1) Objectives / Principles / Constraints
+    # ---------------------------------
+
+Markdown modules are split on ``#``/``##``/``###`` headings instead. The index
+stores byte offsets into the raw file, so it is built once per file version
+and a section is served by slicing the cached bytes.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from dataclasses import dataclass, replace
+from typing import Dict, List, Tuple
+
+TOP_LEVEL_KEY = re.compile(r"^([A-Za-z_][A-Za-z0-9_\-]*)\s*:")
+BANNER_RULE = re.compile(r"^#\s*([-=])\1{2,}\s*$")
+BANNER_TITLE = re.compile(r"^#\s?(.*\S)\s*$")
+MARKDOWN_HEADING = re.compile(r"^(#{1,3})\s+(.*\S)\s*$")
+MARKDOWN_SUFFIXES = {".md"}
+
+
+@dataclass(frozen=True)
+class SectionSpan:
+    key: str
+    kind: str  # key | banner | heading
+    title: str
+    line: int
+    start: int
+    end: int
+    parent: str | None = None
+
+    @property
+    def size_bytes(self) -> int:
+        return self.end - self.start
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "key": self.key,
+            "kind": self.kind,
+            "title": self.title,
+            "line": self.line,
+            "size_bytes": self.size_bytes,
+            "parent": self.parent,
+        }
+
+
+def slugify(title: str) -> str:
+    ascii_title = (
+        unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("ascii")
+    )
+    return re.sub(r"[^0-9a-z]+", "-", ascii_title.lower()).strip("-") or "section"
+
+
+def _lines(raw: bytes) -> List[Tuple[int, str]]:
+    """Return ``(byte_offset, decoded_line)`` pairs, newline stripped."""
+
+    offsets: List[Tuple[int, str]] = []
+    position = 0
+    for line in raw.splitlines(keepends=True):
+        offsets.append((position, line.decode("utf-8", errors="ignore").rstrip()))
+        position += len(line)
+    return offsets
+
+
+def _unique(key: str, seen: Dict[str, int]) -> str:
+    count = seen.get(key, 0) + 1
+    seen[key] = count
+    return key if count == 1 else f"{key}-{count}"
+
+
+def _close(spans: List[SectionSpan], open_index: int | None, end: int) -> None:
+    if open_index is not None:
+        spans[open_index] = replace(spans[open_index], end=end)
+
+
+def _index_yaml_like(raw: bytes) -> Tuple[SectionSpan, ...]:
+    lines = _lines(raw)
+    spans: List[SectionSpan] = []
+    seen: Dict[str, int] = {}
+    open_key: int | None = None
+    open_banner: int | None = None
+    # le chiavi YAML hanno la precedenza: un banner omonimo riceve il suffisso
+    reserved = {
+        match.group(1) for _, text in lines if (match := TOP_LEVEL_KEY.match(text))
+    }
+
+    index = 0
+    while index < len(lines):
+        offset, text = lines[index]
+        if BANNER_RULE.match(text):
+            titles: List[str] = []
+            cursor = index + 1
+            while cursor < len(lines) and not BANNER_RULE.match(lines[cursor][1]):
+                title_match = BANNER_TITLE.match(lines[cursor][1])
+                if title_match is None:
+                    break
+                titles.append(title_match.group(1))
+                cursor += 1
+            if titles and cursor < len(lines) and BANNER_RULE.match(lines[cursor][1]):
+                _close(spans, open_key, offset)
+                _close(spans, open_banner, offset)
+                open_key = None
+                title = " ".join(titles)
+                slug = slugify(title)
+                if slug in reserved:
+                    slug = f"{slug}-banner"
+                spans.append(
+                    SectionSpan(
+                        key=_unique(slug, seen),
+                        kind="banner",
+                        title=title,
+                        line=index + 1,
+                        start=offset,
+                        end=len(raw),
+                    )
+                )
+                open_banner = len(spans) - 1
+                index = cursor + 1
+                continue
+
+        key_match = TOP_LEVEL_KEY.match(text)
+        if key_match:
+            _close(spans, open_key, offset)
+            name = key_match.group(1)
+            spans.append(
+                SectionSpan(
+                    key=_unique(name, seen),
+                    kind="key",
+                    title=name,
+                    line=index + 1,
+                    start=offset,
+                    end=len(raw),
+                    parent=spans[open_banner].key if open_banner is not None else None,
+                )
+            )
+            open_key = len(spans) - 1
+        index += 1
+
+    return tuple(spans)
+
+
+def _index_markdown(raw: bytes) -> Tuple[SectionSpan, ...]:
+    spans: List[SectionSpan] = []
+    seen: Dict[str, int] = {}
+    # pila di (livello, indice) delle intestazioni ancora aperte
+    stack: List[Tuple[int, int]] = []
+    in_fence = False
+
+    for line_number, (offset, text) in enumerate(_lines(raw), start=1):
+        if text.lstrip().startswith("```"):
+            in_fence = not in_fence
+            continue
+        heading = None if in_fence else MARKDOWN_HEADING.match(text)
+        if heading is None:
+            continue
+        level = len(heading.group(1))
+        while stack and stack[-1][0] >= level:
+            _close(spans, stack.pop()[1], offset)
+        title = heading.group(2)
+        spans.append(
+            SectionSpan(
+                key=_unique(slugify(title), seen),
+                kind="heading",
+                title=title,
+                line=line_number,
+                start=offset,
+                end=len(raw),
+                parent=spans[stack[-1][1]].key if stack else None,
+            )
+        )
+        stack.append((level, len(spans) - 1))
+
+    return tuple(spans)
+
+
+def build_section_index(raw: bytes, suffix: str) -> Tuple[SectionSpan, ...]:
+    """Index the sections of a module file, in document order."""
+
+    if suffix.lower() in MARKDOWN_SUFFIXES:
+        return _index_markdown(raw)
+    return _index_yaml_like(raw)
@@ -0,0 +1,311 @@
+"""Ledger delle quote di ``modules/taverna_saves``.
+
+Quota checks used to list and stat the whole directory and call
+``shutil.disk_usage`` on every request. The ledger keeps file count, total
+bytes and a min-heap of save files ordered by mtime (for ``delete_oldest``),
+and answers from memory:
+
+- within ``ttl`` seconds of the last check nothing touches the disk;
+- after that a single ``stat`` of the directory decides whether a rescan is
+  needed (saves are written with an atomic rename, which bumps the directory
+  mtime), and ``disk_usage`` is refreshed;
+- the manifest watcher (same ``base``/``rescan``/``refresh`` interface as
+  :class:`~src.module_manifest.DirectoryManifest`) applies file events
+  incrementally; :meth:`QuotaLedger.record` / :meth:`QuotaLedger.forget`
+  cover changes made outside the watched flow.
+
+Only ``*.json`` files count as saves: ``README.md`` and ``.gitkeep`` are
+never accounted for nor evicted.
+
+:meth:`QuotaLedger.save` is the write path behind ``POST
+/modules/taverna_saves``: the document is written to a hidden temp file,
+fsynced and published with ``os.link`` (auto names, never clobbering a
+concurrent save) or ``os.replace`` (explicit names, atomic overwrite); the
+oldest saves are then evicted by popping the heap until ``max_files`` holds.
+Saves are serialised by the ledger lock within a process and by ``flock`` on
+``.lock`` across workers, when available.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import heapq
+import os
+import re
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+try:  # pragma: no cover - non disponibile su Windows
+    import fcntl
+except ModuleNotFoundError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+SAVE_SUFFIX = ".json"
+AUTO_NAME_FORMAT = "NPC-%Y%m%d-%H%M"
+SAVE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_\-]{0,99}$")
+LOCK_FILENAME = ".lock"
+
+
+@dataclass(frozen=True)
+class SaveFile:
+    name: str
+    size_bytes: int
+    mtime_ns: int
+
+
+@dataclass(frozen=True)
+class QuotaSnapshot:
+    file_count: int
+    total_bytes: int
+    disk_total_bytes: int
+    disk_used_bytes: int
+    disk_free_bytes: int
+    oldest: SaveFile | None
+
+
+@dataclass(frozen=True)
+class SaveResult:
+    name: str
+    size_bytes: int
+    created: bool
+    evicted: Tuple[str, ...]
+
+
+def is_save_file(path: Path) -> bool:
+    return path.suffix.lower() == SAVE_SUFFIX and not path.name.startswith(".")
+
+
+class QuotaLedger:
+    """Incrementally maintained usage of a save directory."""
+
+    def __init__(
+        self,
+        base: Path,
+        *,
+        ttl: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.base = base
+        self.ttl = ttl
+        self._clock = clock
+        self._files: Dict[str, SaveFile] = {}
+        self._heap: List[Tuple[int, str]] = []
+        self._total_bytes = 0
+        self._disk = None
+        self._directory_mtime_ns: int | None = None
+        self._checked_at: float | None = None
+        self._lock = threading.RLock()
+
+    def snapshot(self) -> QuotaSnapshot:
+        """Current usage; raises ``OSError`` if the directory is unavailable."""
+
+        with self._lock:
+            now = self._clock()
+            if self._checked_at is None or now - self._checked_at >= self.ttl:
+                self._revalidate(now)
+            return QuotaSnapshot(
+                file_count=len(self._files),
+                total_bytes=self._total_bytes,
+                disk_total_bytes=self._disk.total,
+                disk_used_bytes=self._disk.used,
+                disk_free_bytes=self._disk.free,
+                oldest=self._oldest(),
+            )
+
+    def oldest(self) -> SaveFile | None:
+        with self._lock:
+            return self._oldest()
+
+    def rescan(self) -> None:
+        """Revalidate now (polling watcher); cheap if the directory is unchanged."""
+
+        with self._lock:
+            self._revalidate(self._clock())
+
+    def refresh(self, changed: Iterable[Path]) -> None:
+        """Apply watcher events for single files without a full rescan."""
+
+        with self._lock:
+            for path in changed:
+                if path.parent == self.base and is_save_file(path):
+                    self._restat(path)
+            try:
+                self._directory_mtime_ns = self.base.stat().st_mtime_ns
+            except OSError:
+                self._checked_at = None
+
+    def record(self, path: Path) -> SaveFile | None:
+        """Account for a save just written (or rewritten) by this process."""
+
+        with self._lock:
+            return self._restat(path)
+
+    def forget(self, name: str) -> None:
+        with self._lock:
+            self._drop(name)
+
+    def save(
+        self,
+        data: bytes,
+        *,
+        max_files: int,
+        name: str | None = None,
+        timestamp: datetime | None = None,
+    ) -> SaveResult:
+        """Write a save atomically and evict the oldest ones beyond ``max_files``.
+
+        ``name`` (without suffix) overwrites an existing save; without it the
+        ``NPC-YYYYMMDD-HHMM`` auto name is used, with a ``-N`` suffix when
+        that minute is already taken. Raises ``ValueError`` for invalid names.
+        """
+
+        if name is not None and name.lower().endswith(SAVE_SUFFIX):
+            name = name[: -len(SAVE_SUFFIX)]
+        if name is not None and not SAVE_NAME.match(name):
+            raise ValueError(f"Nome salvataggio non valido: {name!r}")
+        stem = name or (timestamp or datetime.utcnow()).strftime(AUTO_NAME_FORMAT)
+
+        with self._lock, self._directory_lock():
+            # un altro worker può aver scritto: lo stat della directory lo rivela
+            self._revalidate(self._clock())
+            temp_path = self._write_temp(data)
+            try:
+                if name is not None:
+                    target = self.base / f"{stem}{SAVE_SUFFIX}"
+                    created = not target.exists()
+                    os.replace(temp_path, target)
+                else:
+                    target = self._link_unique(temp_path, stem)
+                    created = True
+            finally:
+                temp_path.unlink(missing_ok=True)
+            saved = self._restat(target)
+
+            evicted: List[str] = []
+            skipped: List[Tuple[int, str]] = []
+            while len(self._files) > max(max_files, 1):
+                oldest = self._oldest()
+                if oldest is None:
+                    break
+                if oldest.name == target.name:
+                    # a parità di mtime il nuovo file può affiorare: mai rimuoverlo
+                    skipped.append(heapq.heappop(self._heap))
+                    continue
+                (self.base / oldest.name).unlink(missing_ok=True)
+                self._drop(oldest.name)
+                evicted.append(oldest.name)
+            for item in skipped:
+                heapq.heappush(self._heap, item)
+            self._directory_mtime_ns = self.base.stat().st_mtime_ns
+
+        return SaveResult(
+            name=target.name,
+            size_bytes=saved.size_bytes if saved is not None else len(data),
+            created=created,
+            evicted=tuple(evicted),
+        )
+
+    @contextlib.contextmanager
+    def _directory_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self.base / LOCK_FILENAME, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _write_temp(self, data: bytes) -> Path:
+        descriptor, raw_path = tempfile.mkstemp(
+            dir=self.base, prefix=".tmp-", suffix=".part"
+        )
+        try:
+            with os.fdopen(descriptor, "wb") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+        except BaseException:
+            Path(raw_path).unlink(missing_ok=True)
+            raise
+        return Path(raw_path)
+
+    def _link_unique(self, temp_path: Path, stem: str) -> Path:
+        attempt = 1
+        while True:
+            suffix = "" if attempt == 1 else f"-{attempt}"
+            target = self.base / f"{stem}{suffix}{SAVE_SUFFIX}"
+            try:
+                os.link(temp_path, target)
+                return target
+            except FileExistsError:
+                attempt += 1
+
+    def _revalidate(self, now: float) -> None:
+        directory_mtime_ns = self.base.stat().st_mtime_ns
+        if directory_mtime_ns != self._directory_mtime_ns:
+            self._scan(directory_mtime_ns)
+        self._disk = shutil.disk_usage(self.base)
+        self._checked_at = now
+
+    def _scan(self, directory_mtime_ns: int) -> None:
+        files: Dict[str, SaveFile] = {}
+        for path in self.base.iterdir():
+            if not is_save_file(path):
+                continue
+            try:
+                stat_result = path.stat()
+            except OSError:
+                continue
+            if stat.S_ISREG(stat_result.st_mode):
+                files[path.name] = SaveFile(
+                    path.name, stat_result.st_size, stat_result.st_mtime_ns
+                )
+        self._files = files
+        self._total_bytes = sum(item.size_bytes for item in files.values())
+        self._heap = [(item.mtime_ns, item.name) for item in files.values()]
+        heapq.heapify(self._heap)
+        self._directory_mtime_ns = directory_mtime_ns
+
+    def _restat(self, path: Path) -> SaveFile | None:
+        try:
+            stat_result = path.stat()
+        except OSError:
+            self._drop(path.name)
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            self._drop(path.name)
+            return None
+        self._drop(path.name)
+        item = SaveFile(path.name, stat_result.st_size, stat_result.st_mtime_ns)
+        self._files[item.name] = item
+        self._total_bytes += item.size_bytes
+        heapq.heappush(self._heap, (item.mtime_ns, item.name))
+        # le voci superate restano nell'heap finché non affiorano: compatta
+        # quando superano i file reali, così la memoria resta O(n)
+        if len(self._heap) > 2 * len(self._files) + 16:
+            self._heap = [(f.mtime_ns, f.name) for f in self._files.values()]
+            heapq.heapify(self._heap)
+        return item
+
+    def _drop(self, name: str) -> None:
+        previous = self._files.pop(name, None)
+        if previous is not None:
+            self._total_bytes -= previous.size_bytes
+
+    def _oldest(self) -> SaveFile | None:
+        while self._heap:
+            mtime_ns, name = self._heap[0]
+            current = self._files.get(name)
+            if current is not None and current.mtime_ns == mtime_ns:
+                return current
+            heapq.heappop(self._heap)
+        return None
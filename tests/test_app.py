@@ -1,13 +1,17 @@
 import asyncio
+import base64
+import hashlib
 from pathlib import Path
 import json
+import os
 import re
+import threading
 from urllib.parse import quote
 
 import pytest
 import httpx
 from fastapi.testclient import TestClient
-from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY
 
 import sys
 
@@ -16,7 +20,7 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 import src.app as app_module
 from src.app import app
 from src.config import MODULES_DIR, DATA_DIR, settings
-from tools.generate_build_db import schema_for_mode, validate_with_schema
+from tools.schema_validation import schema_for_mode, validate_with_schema
 
 
 @pytest.fixture
@@ -112,6 +116,15 @@ def reset_backoff_state():
     app_module._reset_failed_attempts()
 
 
+@pytest.fixture(autouse=True)
+def reset_module_cache():
+    app_module._reset_module_cache()
+    app_module._reset_stub_cache()
+    yield
+    app_module._reset_module_cache()
+    app_module._reset_stub_cache()
+
+
 @pytest.fixture(autouse=True)
 def setup_api_key():
     original = settings.api_key
@@ -223,6 +236,171 @@ def test_minmax_builder_stub_payload_matches_schema(client, auth_headers):
     )
 
 
+def test_minmax_builder_stub_is_memoized_per_normalized_inputs(
+    client, auth_headers, monkeypatch
+):
+    calls = []
+    original_validate = app_module.validate_with_schema
+
+    def counting_validate(*args, **kwargs):
+        calls.append(args[0])
+        return original_validate(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, "validate_with_schema", counting_validate)
+    url = "/modules/minmax_builder.txt?stub=true&class=Rogue&archetype=Cutpurse&level=3"
+
+    first = client.get(url, headers=auth_headers)
+    second = client.post(url, headers=auth_headers, json={"mode": "extended"})
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert len(calls) == 1
+
+    with_hooks = client.post(url, headers=auth_headers, json={"hooks": ["taglia"]})
+    assert with_hooks.json()["sheet"]["hooks"] == ["taglia"]
+    core = client.get(url + "&mode=core", headers=auth_headers)
+    assert core.json()["build_state"]["step_total"] == 8
+    assert len(calls) == 3
+
+
+def test_minmax_builder_stub_cache_keyed_on_catalog_version(
+    client, auth_headers, monkeypatch
+):
+    url = "/modules/minmax_builder.txt?stub=true&class=Fighter"
+    first = client.get(url, headers=auth_headers)
+    assert first.status_code == 200
+
+    manifest = dict(app_module._load_reference_manifest())
+    manifest["version"] = "9999.01.01"
+    monkeypatch.setattr(app_module, "_load_reference_manifest", lambda: manifest)
+    misses_before = app_module.STUB_CACHE_MISSES._value.get()
+
+    client.get(url, headers=auth_headers)
+
+    assert app_module.STUB_CACHE_MISSES._value.get() == misses_before + 1
+
+
+def test_stub_progressions_indexed_by_class_archetype_and_level():
+    index = app_module._load_stub_progressions()
+
+    evoker = index[("wizard", "evoker")]
+    cutpurse = index[("rogue", "cutpurse")]
+
+    assert [entry["livello"] for entry in evoker.levels] == list(range(1, 11))
+    assert cutpurse.levels[4]["livello"] == 5
+    assert cutpurse.base_stats["DES"] == 18
+    assert cutpurse.slot_fallback == "Non incantatore"
+    assert evoker.initiative == 2 and cutpurse.initiative == 4
+
+
+def test_stub_progressions_reject_non_contiguous_levels(tmp_path):
+    broken = tmp_path / "progressions.json"
+    broken.write_text(
+        json.dumps(
+            {
+                "version": "test",
+                "progressions": [
+                    {
+                        "class": "Monk",
+                        "archetype": "Base",
+                        "levels": [{"livello": 1}, {"livello": 3}],
+                    }
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    with pytest.raises(ValueError, match="non contigui"):
+        app_module._load_stub_progressions(broken)
+
+
+def test_minmax_builder_stub_uses_progressions_from_data_file(
+    client, auth_headers, monkeypatch, tmp_path
+):
+    data_file = tmp_path / "progressions.json"
+    data_file.write_text(
+        json.dumps(
+            {
+                "version": "test",
+                "progressions": [
+                    {
+                        "class": "Monk",
+                        "archetype": "Qinggong",
+                        "speed": 12,
+                        "levels": [
+                            {
+                                "livello": 1,
+                                "pf": 10,
+                                "talenti": ["Pugno stordente"],
+                                "privilegi": ["Raffica di colpi"],
+                            },
+                            {
+                                "livello": 2,
+                                "pf": 17,
+                                "privilegi": ["Eludere"],
+                                "salvezze": {"Tempra": 3, "Riflessi": 3, "Volontà": 3},
+                                "skills": {"Acrobazia": 6},
+                                "ca": {"totale": 16, "destrezza": 3, "saggezza": 3},
+                            },
+                        ],
+                    }
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(
+        app_module,
+        "_stub_progression_index",
+        app_module._load_stub_progressions(data_file),
+    )
+
+    response = client.get(
+        "/modules/minmax_builder.txt?stub=true&class=Monk&archetype=Qinggong&level=5",
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    sheet = response.json()["sheet"]
+    assert sheet["hp"] == {"totali": 17, "per_livello": [10, 17]}
+    assert sheet["velocita"] == 12
+    assert [step["livello"] for step in sheet["progressione"]] == [1, 2]
+    assert sheet["capacita_classe"] == ["Eludere", "Raffica di colpi"]
+
+
+def test_reference_manifest_parsed_once_until_file_changes(monkeypatch, tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps({"version": "2030.01.01"}), encoding="utf-8")
+    monkeypatch.setattr(app_module, "REFERENCE_MANIFEST_PATH", manifest_path)
+    app_module._reset_reference_manifest()
+
+    reads = []
+    original_loads = app_module.json.loads
+
+    def counting_loads(*args, **kwargs):
+        reads.append(args[0])
+        return original_loads(*args, **kwargs)
+
+    monkeypatch.setattr(app_module.json, "loads", counting_loads)
+
+    try:
+        first = app_module._load_reference_manifest()
+        second = app_module._load_reference_manifest()
+        assert first is second
+        assert app_module._reference_catalog_version() == "2030.01.01"
+        assert len(reads) == 1
+
+        manifest_path.write_text(
+            json.dumps({"version": "2030.02.02", "note": "bump"}), encoding="utf-8"
+        )
+        assert app_module._reference_catalog_version() == "2030.02.02"
+        assert len(reads) == 2
+    finally:
+        monkeypatch.undo()
+        app_module._reset_reference_manifest()
+
+
 def test_get_module_content_path_traversal(client, auth_headers):
     response = client.get(
         f"/modules/{quote('../config.py', safe='')}", headers=auth_headers
@@ -349,6 +527,337 @@ def test_narrative_flow_exposes_truncation_headers(
         target.write_text(original, encoding="utf-8")
 
 
+def test_module_cache_serves_repeated_reads_from_memory(
+    client, auth_headers, disable_module_dump
+):
+    hits_before = app_module.MODULE_CACHE_HITS._value.get()
+    misses_before = app_module.MODULE_CACHE_MISSES._value.get()
+
+    first = client.get("/modules/base_profile.txt", headers=auth_headers)
+    second = client.get("/modules/base_profile.txt", headers=auth_headers)
+
+    assert first.status_code == second.status_code == 206
+    assert first.content == second.content
+    assert app_module.MODULE_CACHE_MISSES._value.get() == misses_before + 1
+    assert app_module.MODULE_CACHE_HITS._value.get() == hits_before + 1
+
+
+def test_module_cache_invalidated_when_file_changes(
+    client, auth_headers, enable_module_dump
+):
+    target = MODULES_DIR / "cache_probe.txt"
+    target.write_text("prima versione", encoding="utf-8")
+
+    try:
+        first = client.get("/modules/cache_probe.txt", headers=auth_headers)
+        assert first.text == "prima versione"
+
+        target.write_text("seconda versione, più lunga", encoding="utf-8")
+        second = client.get("/modules/cache_probe.txt", headers=auth_headers)
+        assert second.status_code == 200
+        assert second.text == "seconda versione, più lunga"
+    finally:
+        target.unlink(missing_ok=True)
+
+
+def test_module_cache_evicts_least_recently_used(tmp_path):
+    cache = app_module._ModuleCache(max_bytes=100)
+    paths = []
+    for idx in range(3):
+        path = tmp_path / f"module_{idx}.txt"
+        path.write_text(str(idx) * 20, encoding="utf-8")
+        paths.append(path)
+
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])
+    cache.get(paths[2])
+
+    assert len(cache) == 2
+    assert cache.total_bytes <= 100
+    assert paths[1] not in cache._entries
+    assert paths[0] in cache._entries
+
+
+def test_module_cache_metrics_exposed(client, auth_headers, metrics_security_settings):
+    settings.metrics_api_key = "metrics-secret"
+    client.get("/modules/base_profile.txt", headers=auth_headers)
+
+    response = client.get("/metrics", headers={"x-api-key": "metrics-secret"})
+
+    assert response.status_code == 200
+    assert "app_module_cache_hits_total" in response.text
+    assert "app_module_cache_misses_total" in response.text
+    assert "app_module_cache_bytes" in response.text
+
+
+def test_module_content_returns_304_for_matching_etag(
+    client, auth_headers, disable_module_dump
+):
+    first = client.get("/modules/base_profile.txt", headers=auth_headers)
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    assert "Last-Modified" in first.headers
+
+    second = client.get(
+        "/modules/base_profile.txt",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+
+
+def test_module_full_dump_etag_is_content_hash(
+    client, auth_headers, enable_module_dump
+):
+    target = MODULES_DIR / "base_profile.txt"
+    expected = hashlib.sha256(target.read_bytes()).hexdigest()
+
+    response = client.get(
+        "/modules/base_profile.txt",
+        headers={**auth_headers, "Accept-Encoding": "identity"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{expected}"'
+
+
+def test_module_full_dump_serves_byte_ranges(client, auth_headers, enable_module_dump):
+    raw = (MODULES_DIR / "base_profile.txt").read_bytes()
+
+    response = client.get(
+        "/modules/base_profile.txt", headers={**auth_headers, "Range": "bytes=10-19"}
+    )
+    assert response.status_code == 206
+    assert response.content == raw[10:20]
+    assert response.headers["Content-Range"] == f"bytes 10-19/{len(raw)}"
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+    suffix = client.get(
+        "/modules/base_profile.txt", headers={**auth_headers, "Range": "bytes=-5"}
+    )
+    assert suffix.content == raw[-5:]
+
+    stale = client.get(
+        "/modules/base_profile.txt",
+        headers={**auth_headers, "Range": "bytes=0-9", "If-Range": '"outdated"'},
+    )
+    assert stale.status_code == 200
+    assert stale.content == raw
+
+    unsatisfiable = client.get(
+        "/modules/base_profile.txt",
+        headers={**auth_headers, "Range": f"bytes={len(raw)}-"},
+    )
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["Content-Range"] == f"bytes */{len(raw)}"
+
+
+def test_module_binary_dump_serves_byte_ranges(
+    client, auth_headers, enable_module_dump
+):
+    raw = (MODULES_DIR / "tavern_hub.json").read_bytes()
+
+    response = client.get(
+        "/modules/tavern_hub.json", headers={**auth_headers, "Range": "bytes=0-15"}
+    )
+
+    assert response.status_code == 206
+    assert response.content == raw[:16]
+    assert response.headers["Content-Range"] == f"bytes 0-15/{len(raw)}"
+
+
+def test_truncated_module_pages_by_char_offset(
+    client, auth_headers, disable_module_dump
+):
+    text = (MODULES_DIR / "Taverna_NPC.txt").read_text(encoding="utf-8")
+
+    first = client.get("/modules/Taverna_NPC.txt", headers=auth_headers)
+    assert first.headers["Accept-Ranges"] == "chars"
+    assert first.headers["X-Content-Next-Offset"] == "0"
+
+    collected = []
+    offset = 0
+    while True:
+        page = client.get(
+            f"/modules/Taverna_NPC.txt?offset={offset}", headers=auth_headers
+        )
+        assert page.status_code == 206
+        assert len(page.text) <= app_module.MODULE_EXCERPT_MAX_CHARS
+        collected.append(page.text)
+        if "X-Content-Next-Offset" not in page.headers:
+            break
+        offset = int(page.headers["X-Content-Next-Offset"])
+
+    assert "".join(collected) == text
+    assert page.headers["X-Content-Remaining-Bytes"] == "0"
+
+    ranged = client.get(
+        "/modules/Taverna_NPC.txt", headers={**auth_headers, "Range": "chars=100-"}
+    )
+    assert ranged.text == text[100 : 100 + app_module.MODULE_EXCERPT_MAX_CHARS]
+    assert ranged.headers["Content-Range"] == (
+        f"chars 100-{100 + app_module.MODULE_EXCERPT_MAX_CHARS - 1}/{len(text)}"
+    )
+
+    beyond = client.get(
+        f"/modules/Taverna_NPC.txt?offset={len(text)}", headers=auth_headers
+    )
+    assert beyond.status_code == 416
+
+
+def test_strict_truncation_modules_ignore_paging(
+    client, auth_headers, disable_module_dump
+):
+    response = client.get(
+        "/modules/narrative_flow.txt?offset=0",
+        headers={**auth_headers, "Range": "chars=0-99"},
+    )
+
+    assert response.status_code == 206
+    assert response.headers["X-Content-Served-Bytes"] == "0"
+    assert "Content-Range" not in response.headers
+
+
+def test_protected_modules_ignore_paging_outside_whitelist(client, auth_headers):
+    original_allow = settings.allow_module_dump
+    original_whitelist = settings.module_dump_whitelist
+    settings.allow_module_dump = True
+    settings.module_dump_whitelist = set()
+
+    try:
+        text = (MODULES_DIR / "ruling_expert.txt").read_text(encoding="utf-8")
+        first = client.get("/modules/ruling_expert.txt", headers=auth_headers)
+        assert first.status_code == 206
+        assert "X-Content-Next-Offset" not in first.headers
+        assert "Accept-Ranges" not in first.headers
+
+        offset = app_module.MODULE_EXCERPT_MAX_CHARS
+        paged = client.get(
+            f"/modules/ruling_expert.txt?offset={offset}", headers=auth_headers
+        )
+        ranged = client.get(
+            "/modules/ruling_expert.txt",
+            headers={**auth_headers, "Range": f"chars={offset}-"},
+        )
+        for response in (paged, ranged):
+            assert "Content-Range" not in response.headers
+            assert response.text == first.text
+        assert text[offset : offset + 100] not in first.text
+    finally:
+        settings.allow_module_dump = original_allow
+        settings.module_dump_whitelist = original_whitelist
+
+
+def _batch_items(response):
+    return {item["name"]: item for item in map(json.loads, response.text.splitlines())}
+
+
+def test_modules_batch_streams_ndjson_with_per_module_status(
+    client, auth_headers, disable_module_dump
+):
+    names = [
+        "Taverna_NPC.txt",
+        "missing.txt",
+        "adventurer_ledger.txt",
+        "ruling_expert.txt",
+    ]
+
+    response = client.post(
+        "/modules:batch",
+        json={"names": names + ["Taverna_NPC.txt"]},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["X-Batch-Count"] == "4"
+    items = _batch_items(response)
+    assert list(items) == names
+
+    page = items["Taverna_NPC.txt"]
+    single = client.get("/modules/Taverna_NPC.txt", headers=auth_headers)
+    meta = client.get("/modules/Taverna_NPC.txt/meta", headers=auth_headers)
+    assert page["status"] == 206 and page["partial"] is True
+    assert page["content"] == single.text
+    assert page["next_offset"] == int(single.headers["X-Content-Next-Offset"])
+    assert page["meta"] == meta.json()
+
+    assert items["missing.txt"]["status"] == 404
+    assert items["adventurer_ledger.txt"]["status"] == 403
+    assert "content" not in items["adventurer_ledger.txt"]
+
+    protected = items["ruling_expert.txt"]
+    assert protected["status"] == 206
+    assert "next_offset" not in protected
+
+
+def test_modules_batch_full_dump_and_defaults(client, auth_headers, enable_module_dump):
+    response = client.post("/modules:batch", headers=auth_headers)
+
+    listing = client.get("/modules", headers=auth_headers).json()
+    items = _batch_items(response)
+    assert set(items) == {item["name"] for item in listing}
+
+    text = items["base_profile.txt"]
+    assert text["status"] == 200 and text["partial"] is False
+    assert text["content"] == (MODULES_DIR / "base_profile.txt").read_text(
+        encoding="utf-8"
+    )
+    binary = items["tavern_hub.json"]
+    assert binary["content_encoding"] == "base64"
+    raw = (MODULES_DIR / "tavern_hub.json").read_bytes()
+    assert base64.b64decode(binary["content"]) == raw
+
+
+def test_modules_batch_rejects_invalid_names(client, auth_headers, monkeypatch):
+    invalid = client.post("/modules:batch", json={"names": "x"}, headers=auth_headers)
+    assert invalid.status_code == 422
+
+    monkeypatch.setattr(app_module, "MODULE_BATCH_MAX_NAMES", 2)
+    too_many = client.post(
+        "/modules:batch", json={"names": ["a", "b", "c"]}, headers=auth_headers
+    )
+    assert too_many.status_code == 422
+
+    assert client.post("/modules:batch", json={"names": []}).status_code == 401
+
+
+def test_module_meta_honours_if_modified_since(client, auth_headers):
+    first = client.get("/modules/base_profile.txt/meta", headers=auth_headers)
+    assert first.status_code == 200
+
+    cached = client.get(
+        "/modules/base_profile.txt/meta",
+        headers={**auth_headers, "If-Modified-Since": first.headers["Last-Modified"]},
+    )
+    assert cached.status_code == 304
+
+    stale = client.get(
+        "/modules/base_profile.txt/meta",
+        headers={**auth_headers, "If-None-Match": '"outdated"'},
+    )
+    assert stale.status_code == 200
+    assert stale.json()["name"] == "base_profile.txt"
+
+
+def test_knowledge_meta_returns_304_for_matching_etag(
+    client, auth_headers, temp_data_dir
+):
+    (temp_data_dir / "guide.md").write_text("# Guida", encoding="utf-8")
+
+    first = client.get("/knowledge/guide.md/meta", headers=auth_headers)
+    assert first.status_code == 200
+
+    second = client.get(
+        "/knowledge/guide.md/meta",
+        headers={**auth_headers, "If-None-Match": first.headers["ETag"]},
+    )
+    assert second.status_code == 304
+
+
 def test_ruling_expert_truncated_when_dump_enabled_without_whitelist(
     client, auth_headers
 ):
@@ -469,6 +978,69 @@ def test_get_module_meta_reads_json_metadata(client, auth_headers):
         assert "compatibility" not in payload
 
 
+def test_list_modules_served_from_manifest_tracks_new_files(client, auth_headers):
+    listing = client.get("/modules", headers=auth_headers).json()
+    assert {item["name"] for item in listing} >= set(app_module.REQUIRED_MODULE_FILES)
+
+    probe = MODULES_DIR / "manifest_probe.txt"
+    probe.write_text("version: 9.9", encoding="utf-8")
+    try:
+        listing = client.get("/modules", headers=auth_headers).json()
+        assert {"name": "manifest_probe.txt", "size_bytes": 12, "suffix": ".txt"} in (
+            listing
+        )
+        meta = client.get("/modules/manifest_probe.txt/meta", headers=auth_headers)
+        assert meta.json()["version"] == "9.9"
+    finally:
+        probe.unlink(missing_ok=True)
+
+    listing = client.get("/modules", headers=auth_headers).json()
+    assert all(item["name"] != "manifest_probe.txt" for item in listing)
+
+
+def test_blocking_handler_work_runs_on_bounded_io_pool(
+    client, auth_headers, monkeypatch
+):
+    seen_threads = []
+    original_list_files = app_module._list_files
+    original_cache_get = app_module._module_cache.get
+
+    def recording_list_files(manifest):
+        seen_threads.append(threading.current_thread().name)
+        return original_list_files(manifest)
+
+    def recording_cache_get(path):
+        seen_threads.append(threading.current_thread().name)
+        return original_cache_get(path)
+
+    monkeypatch.setattr(app_module, "_list_files", recording_list_files)
+    monkeypatch.setattr(app_module._module_cache, "get", recording_cache_get)
+
+    assert client.get("/modules", headers=auth_headers).status_code == 200
+    assert client.get("/modules/Taverna_NPC.txt", headers=auth_headers).status_code in (
+        200,
+        206,
+    )
+    assert len(seen_threads) == 2
+    assert all(name.startswith("api-io") for name in seen_threads)
+
+    app_module._shutdown_blocking_executor()
+    monkeypatch.setattr(settings, "api_io_workers", 0)
+    seen_threads.clear()
+
+    assert client.get("/modules", headers=auth_headers).status_code == 200
+    assert seen_threads and not seen_threads[0].startswith("api-io")
+    assert app_module._blocking_executor is None
+
+
+def test_blocking_pool_propagates_http_errors(client, auth_headers):
+    response = client.get("/modules/missing_module.txt", headers=auth_headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Module not found"
+
+    assert asyncio.run(app_module.health()).status_code == 200
+
+
 def test_get_module_meta_not_found(client, auth_headers):
     response = client.get("/modules/missing_module.txt/meta", headers=auth_headers)
     assert response.status_code == 404
@@ -729,6 +1301,69 @@ def test_metrics_allowlisted_forwarded_for(client, metrics_security_settings):
     assert blocked_response.json()["detail"] == "Accesso alle metriche non autorizzato"
 
 
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_request_latency_and_size_histograms_use_route_template(client, auth_headers):
+    route = {"endpoint": "/modules/{name:path}/meta", "method": "GET"}
+    count_before = _sample("app_request_duration_seconds_count", **route)
+    size_before = _sample("app_response_size_bytes_sum", **route)
+
+    response = client.get("/modules/base_profile.txt/meta", headers=auth_headers)
+    assert response.status_code == 200
+
+    assert _sample("app_request_duration_seconds_count", **route) == count_before + 1
+    assert _sample("app_response_size_bytes_sum", **route) == size_before + len(
+        response.content
+    )
+
+    unmatched = {"endpoint": "unmatched", "method": "GET"}
+    unmatched_before = _sample("app_request_duration_seconds_count", **unmatched)
+    assert client.get("/no-such-route/123").status_code == 404
+    assert (
+        _sample("app_request_duration_seconds_count", **unmatched)
+        == unmatched_before + 1
+    )
+
+
+def test_in_flight_gauge_tracks_running_requests(client, auth_headers, monkeypatch):
+    observed = []
+    original = app_module._list_files
+
+    def observing_list_files(*args, **kwargs):
+        observed.append(app_module.REQUESTS_IN_FLIGHT._value.get())
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, "_list_files", observing_list_files)
+    baseline = app_module.REQUESTS_IN_FLIGHT._value.get()
+
+    assert client.get("/modules", headers=auth_headers).status_code == 200
+
+    assert observed == [baseline + 1]
+    assert app_module.REQUESTS_IN_FLIGHT._value.get() == baseline
+
+
+def test_stub_builder_steps_are_timed_separately(client, auth_headers):
+    steps = ("build", "validate", "serialize")
+    before = {
+        step: _sample("app_stub_builder_step_seconds_count", step=step, mode="core")
+        for step in steps
+    }
+
+    response = client.get(
+        "/modules/minmax_builder.txt?stub=true&class=Wizard&mode=core",
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    for step in steps:
+        assert (
+            _sample("app_stub_builder_step_seconds_count", step=step, mode="core")
+            == before[step] + 1
+        )
+
+
 def test_modules_directory_missing_returns_error(
     auth_headers, missing_modules_dir, allow_missing_directories
 ):
@@ -855,6 +1490,10 @@ def test_health_reports_valid_directories(client):
 
     payload = response.json()
     assert response.status_code == 200
+    reference_catalog = payload.pop("reference_catalog")
+    assert reference_catalog["status"] == "ok"
+    assert reference_catalog["version"] == app_module._reference_catalog_version()
+    assert reference_catalog["loaded_at"]
     assert payload == {
         "status": "ok",
         "directories": {
@@ -914,3 +1553,400 @@ def test_health_with_temp_directories_sets_directory_metrics(
     assert metrics_response.status_code == 200
     assert 'app_directory_status{directory="modules"} 1.0' in metrics_response.text
     assert 'app_directory_status{directory="data"} 1.0' in metrics_response.text
+
+
+def test_module_sections_listing_exposes_keys_and_banners(client, auth_headers):
+    response = client.get("/modules/Taverna_NPC.txt/sections", headers=auth_headers)
+
+    assert response.status_code == 200
+    payload = response.json()
+    sections = {item["key"]: item for item in payload["sections"]}
+    assert payload["name"] == "Taverna_NPC.txt"
+    assert sections["triggers"]["kind"] == "key"
+    assert sections["objectives"]["parent"] == "1-objectives-principles-constraints"
+    assert sections["1-objectives-principles-constraints"]["kind"] == "banner"
+
+    cached = client.get(
+        "/modules/Taverna_NPC.txt/sections",
+        headers={**auth_headers, "If-None-Match": response.headers["ETag"]},
+    )
+    assert cached.status_code == 304
+
+
+def test_module_section_returns_only_the_requested_key(
+    client, auth_headers, disable_module_dump
+):
+    response = client.get(
+        "/modules/Taverna_NPC.txt/sections/triggers", headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    assert response.text.startswith("triggers:")
+    assert '"bacheca missioni"' in response.text
+    assert "objectives:" not in response.text
+    assert response.headers["X-Section-Kind"] == "key"
+    assert response.headers["X-Content-Partial"] == "false"
+
+
+def test_module_section_is_paged_when_larger_than_limit(
+    client, auth_headers, disable_module_dump
+):
+    listing = client.get(
+        "/modules/Taverna_NPC.txt/sections", headers=auth_headers
+    ).json()["sections"]
+    large = max(listing, key=lambda item: item["size_bytes"])
+    assert large["size_bytes"] > app_module.MODULE_EXCERPT_MAX_CHARS
+
+    first = client.get(
+        f"/modules/Taverna_NPC.txt/sections/{large['key']}", headers=auth_headers
+    )
+    assert first.status_code == 206
+    assert len(first.text) == app_module.MODULE_EXCERPT_MAX_CHARS
+    next_offset = first.headers["X-Content-Next-Offset"]
+
+    second = client.get(
+        f"/modules/Taverna_NPC.txt/sections/{large['key']}?offset={next_offset}",
+        headers=auth_headers,
+    )
+    assert second.status_code == 206
+    assert second.headers["X-Content-Offset"] == next_offset
+
+
+def test_module_section_errors(client, auth_headers, disable_module_dump):
+    missing = client.get(
+        "/modules/Taverna_NPC.txt/sections/not_a_key", headers=auth_headers
+    )
+    assert missing.status_code == 404
+    assert missing.json()["detail"] == "Section not found"
+
+    strict = client.get(
+        "/modules/narrative_flow.txt/sections/triggers", headers=auth_headers
+    )
+    assert strict.status_code == 403
+
+    ledger = client.get("/modules/adventurer_ledger.txt/sections", headers=auth_headers)
+    assert ledger.status_code == 403
+
+    binary = client.get("/modules/tavern_hub.json/sections", headers=auth_headers)
+    assert binary.status_code == 400
+
+
+def test_module_section_of_protected_module_requires_whitelist(
+    client, auth_headers, enable_module_dump, monkeypatch
+):
+    monkeypatch.setattr(settings, "module_dump_whitelist", set())
+    listing = client.get("/modules/ruling_expert.txt/sections", headers=auth_headers)
+    key = listing.json()["sections"][0]["key"]
+
+    for suffix in ("", "?offset=100"):
+        response = client.get(
+            f"/modules/ruling_expert.txt/sections/{key}{suffix}", headers=auth_headers
+        )
+        assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "module_dump_whitelist", {"ruling_expert.txt"})
+    allowed = client.get(
+        f"/modules/ruling_expert.txt/sections/{key}", headers=auth_headers
+    )
+    assert allowed.status_code == 200
+
+
+def test_module_section_index_is_built_once_per_file_version(
+    client, auth_headers, monkeypatch
+):
+    calls = []
+    original = app_module.build_section_index
+
+    def counting_index(raw, suffix):
+        calls.append(suffix)
+        return original(raw, suffix)
+
+    monkeypatch.setattr(app_module, "build_section_index", counting_index)
+
+    for _ in range(3):
+        response = client.get(
+            "/modules/base_profile.txt/sections", headers=auth_headers
+        )
+        assert response.status_code == 200
+
+    assert calls == [".txt"]
+
+
+def test_search_returns_ranked_sections_with_snippets(client, auth_headers):
+    response = client.get("/search?q=bacheca missioni", headers=auth_headers)
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["total"] == len(payload["results"]) > 0
+    top = payload["results"][0]
+    assert top["name"] == "Taverna_NPC.txt"
+    assert top["source"] == "modules"
+    assert "bacheca missioni" in top["snippet"].lower()
+    scores = [item["score"] for item in payload["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_withholds_snippets_of_strict_modules(
+    client, auth_headers, disable_module_dump
+):
+    response = client.get("/search?q=narrative&limit=50", headers=auth_headers)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    strict = [item for item in results if item["name"].endswith("narrative_flow.txt")]
+    assert strict
+    assert all(item["snippet"] is None for item in strict)
+    assert any(item["snippet"] for item in results if item not in strict)
+
+
+def test_search_withholds_snippets_of_protected_modules(
+    client, auth_headers, enable_module_dump, monkeypatch
+):
+    monkeypatch.setattr(settings, "module_dump_whitelist", set())
+
+    def ruling_results():
+        response = client.get("/search?q=RAW RAI errata&limit=50", headers=auth_headers)
+        assert response.status_code == 200
+        return [
+            item
+            for item in response.json()["results"]
+            if item["name"].endswith("ruling_expert.txt")
+        ]
+
+    protected = ruling_results()
+    assert protected
+    assert all(item["snippet"] is None for item in protected)
+
+    monkeypatch.setattr(settings, "module_dump_whitelist", {"ruling_expert.txt"})
+    assert any(item["snippet"] for item in ruling_results())
+
+
+def test_search_picks_up_new_modules(client, auth_headers):
+    probe = MODULES_DIR / "search_probe.txt"
+    probe.write_text("probe_section:\n  - zzqxparola unica\n", encoding="utf-8")
+    try:
+        response = client.get("/search?q=zzqxparola", headers=auth_headers)
+        results = response.json()["results"]
+        assert [(item["name"], item["section"]) for item in results] == [
+            ("search_probe.txt", "probe_section")
+        ]
+    finally:
+        probe.unlink(missing_ok=True)
+
+    assert client.get("/search?q=zzqxparola", headers=auth_headers).json()["total"] == 0
+
+
+def test_search_requires_query(client, auth_headers):
+    assert client.get("/search", headers=auth_headers).status_code == 422
+    assert client.get("/search?q=x", headers=auth_headers).status_code == 422
+
+
+def test_module_full_dump_negotiates_gzip_variant(
+    client, auth_headers, enable_module_dump
+):
+    raw = (MODULES_DIR / "Taverna_NPC.txt").read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+
+    response = client.get(
+        "/modules/Taverna_NPC.txt",
+        headers={**auth_headers, "Accept-Encoding": "br;q=0, gzip;q=0.8"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == f'"{digest}-gzip"'
+    assert response.content == raw
+    assert int(response.headers["content-length"]) < len(raw) // 2
+
+    cached = client.get(
+        "/modules/Taverna_NPC.txt",
+        headers={
+            **auth_headers,
+            "Accept-Encoding": "gzip",
+            "If-None-Match": response.headers["ETag"],
+        },
+    )
+    assert cached.status_code == 304
+
+    identity = client.get(
+        "/modules/Taverna_NPC.txt",
+        headers={**auth_headers, "Accept-Encoding": "gzip;q=0"},
+    )
+    assert "Content-Encoding" not in identity.headers
+    assert identity.content == raw
+
+    ranged = client.get(
+        "/modules/Taverna_NPC.txt",
+        headers={**auth_headers, "Accept-Encoding": "gzip", "Range": "bytes=0-9"},
+    )
+    assert ranged.status_code == 206
+    assert "Content-Encoding" not in ranged.headers
+
+
+def test_module_full_dump_negotiates_brotli_variant(
+    client, auth_headers, enable_module_dump
+):
+    brotli = pytest.importorskip("brotli")
+    raw = (MODULES_DIR / "Taverna_NPC.txt").read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    assert app_module.MODULE_ENCODINGS[0] == "br"
+
+    response = client.get(
+        "/modules/Taverna_NPC.txt",
+        headers={**auth_headers, "Accept-Encoding": "gzip;q=0.8, br"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.headers["ETag"] == f'"{digest}-br"'
+    assert response.content == raw
+    assert int(response.headers["content-length"]) < len(raw) // 2
+
+    entry = app_module._module_cache.get(MODULES_DIR / "Taverna_NPC.txt")
+    assert brotli.decompress(entry.encoded("br")[0]) == raw
+
+
+def test_compressed_variant_is_built_once_and_charged_to_cache(
+    client, auth_headers, enable_module_dump, monkeypatch
+):
+    calls = []
+    original = app_module._compress
+
+    def counting_compress(raw, encoding):
+        calls.append(encoding)
+        return original(raw, encoding)
+
+    monkeypatch.setattr(app_module, "_compress", counting_compress)
+
+    for _ in range(3):
+        client.get(
+            "/modules/Taverna_NPC.txt",
+            headers={**auth_headers, "Accept-Encoding": "gzip"},
+        )
+
+    assert calls == ["gzip"]
+    entry = app_module._module_cache.get(MODULES_DIR / "Taverna_NPC.txt")
+    gzip_size = len(entry.encoded("gzip")[0])
+    assert app_module._module_cache.total_bytes == entry.weight + gzip_size
+
+
+def test_negotiate_encoding_honours_q_values():
+    negotiate = app_module._negotiate_encoding
+
+    assert negotiate(None) is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("*;q=0.5") == app_module.MODULE_ENCODINGS[0]
+    expected = "br" if "br" in app_module.MODULE_ENCODINGS else None
+    assert negotiate("*, gzip;q=0") == expected
+
+
+@pytest.fixture
+def taverna_saves_dir(tmp_path, monkeypatch):
+    saves = tmp_path / "taverna_saves"
+    saves.mkdir()
+    (saves / "README.md").write_text("docs", encoding="utf-8")
+    monkeypatch.setattr(app_module, "TAVERNA_SAVES_DIR", saves)
+    monkeypatch.setattr(settings, "taverna_saves_quota_ttl_seconds", 0)
+    return saves
+
+
+def test_taverna_saves_meta_route_is_not_shadowed(
+    client, auth_headers, taverna_saves_dir
+):
+    (taverna_saves_dir / "NPC-20240101-1200.json").write_text("{}", encoding="utf-8")
+
+    response = client.get("/modules/taverna_saves/meta", headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["storage_policy"]["on_overflow"] == "delete_oldest"
+    assert body["current_files"] == 1
+    assert body["oldest_file"] == "NPC-20240101-1200.json"
+
+
+def test_taverna_saves_quota_served_from_ledger(
+    client, auth_headers, taverna_saves_dir
+):
+    for index in range(3):
+        (taverna_saves_dir / f"NPC-{index}.json").write_text("{}", encoding="utf-8")
+
+    quota = client.get("/modules/taverna_saves/quota", headers=auth_headers).json()
+
+    assert quota["current_files"] == 3
+    assert quota["remaining_files"] == app_module.TAVERNA_SAVES_MAX_FILES - 3
+    assert quota["total_size_bytes"] == 6
+    assert quota["quota_ok"] is True
+
+
+def test_post_taverna_save_writes_and_reports_eviction(
+    client, auth_headers, taverna_saves_dir, monkeypatch
+):
+    monkeypatch.setattr(app_module, "TAVERNA_SAVES_MAX_FILES", 2)
+    old = taverna_saves_dir / "NPC-20000101-0000.json"
+    old.write_text("{}", encoding="utf-8")
+    os.utime(old, (1, 1))
+
+    first = client.post(
+        "/modules/taverna_saves", headers=auth_headers, json={"npc": "Brenna"}
+    )
+    assert first.status_code == 201
+    assert first.json()["evicted"] == []
+    assert re.fullmatch(r"NPC-\d{8}-\d{4}\.json", first.json()["name"])
+    saved = json.loads((taverna_saves_dir / first.json()["name"]).read_text())
+    assert saved == {"npc": "Brenna"}
+
+    second = client.post(
+        "/modules/taverna_saves?name=Oste",
+        headers=auth_headers,
+        json={"npc": "Oste"},
+    )
+    body = second.json()
+    assert second.status_code == 201
+    assert body["name"] == "Oste.json"
+    assert body["evicted"] == ["NPC-20000101-0000.json"]
+    assert (body["current_files"], body["remaining_files"]) == (2, 0)
+    assert not old.exists()
+
+
+def test_post_taverna_save_rejects_invalid_input(
+    client, auth_headers, taverna_saves_dir
+):
+    bad_name = client.post(
+        "/modules/taverna_saves?name=../x", headers=auth_headers, json={}
+    )
+    assert bad_name.status_code == 400
+
+    not_object = client.post(
+        "/modules/taverna_saves", headers=auth_headers, json=["a", "b"]
+    )
+    assert not_object.status_code == 422
+    assert list(taverna_saves_dir.glob("*.json")) == []
+
+
+def test_taverna_saves_quota_missing_directory(
+    client, auth_headers, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(app_module, "TAVERNA_SAVES_DIR", tmp_path / "missing")
+
+    response = client.get("/modules/taverna_saves/quota", headers=auth_headers)
+
+    assert response.status_code == 503
+
+
+def test_storage_meta_reports_module_compression(client, auth_headers):
+    response = client.get("/storage_meta", headers=auth_headers)
+
+    assert response.status_code == 200
+    breakdown = response.json()["module_compression"]
+    assert "gzip" in breakdown["encodings"]
+    modules = {item["name"]: item for item in breakdown["modules"]}
+    taverna = modules["Taverna_NPC.txt"]
+    assert taverna["size_bytes"] == (MODULES_DIR / "Taverna_NPC.txt").stat().st_size
+    assert 0 < taverna["gzip_ratio"] < 0.5
+    assert taverna["gzip_bytes"] < taverna["size_bytes"]
+    assert "tavern_hub.json" not in modules
+    assert breakdown["totals"]["size_bytes"] == sum(
+        item["size_bytes"] for item in breakdown["modules"]
+    )
@@ -0,0 +1,352 @@
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import src.app as app_module
+from src.app import app
+from src.auth_backoff import (
+    RECORD_FAILURE_SCRIPT,
+    BackoffBackendError,
+    MemoryBackoffTracker,
+    RedisBackoffTracker,
+    SQLiteBackoffTracker,
+    build_backoff_tracker,
+)
+from src.config import settings
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """In-process server speaking enough RESP2 for ``RedisBackoffTracker``."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _FakeRedisHandler)
+        self.hashes = {}
+        self.zsets = {}
+        self.expiry = {}
+        self.commands = []
+        self.clock = time.time
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"redis://{host}:{port}/0"
+
+    def _expire(self, key):
+        deadline = self.expiry.get(key)
+        if deadline is not None and deadline <= self.clock():
+            self.hashes.pop(key, None)
+            self.expiry.pop(key, None)
+
+    def run(self, name, args):
+        self._expire(args[0]) if args else None
+        if name == "PING":
+            return "PONG"
+        if name == "EVAL":
+            # niente Lua: emula l'unico script inviato dal tracker
+            if args[0] != RECORD_FAILURE_SCRIPT:
+                raise ValueError("unknown script")
+            key, index, threshold, expires_at, deadline_ms, member = args[2:8]
+            self._expire(key)
+            count = self.run("HINCRBY", [key, "count", "1"])
+            blocked = self.run("HGET", [key, "blocked_until"]) or "0"
+            if count >= int(threshold) and float(blocked) < float(expires_at):
+                blocked = expires_at
+                self.run("HSET", [key, "blocked_until", blocked])
+            self.run("PEXPIREAT", [key, deadline_ms])
+            self.run("ZADD", [index, expires_at, member])
+            return [count, blocked]
+        if name == "HINCRBY":
+            fields = self.hashes.setdefault(args[0], {})
+            fields[args[1]] = str(int(fields.get(args[1], 0)) + int(args[2]))
+            return int(fields[args[1]])
+        if name == "HGET":
+            return self.hashes.get(args[0], {}).get(args[1])
+        if name == "HMGET":
+            fields = self.hashes.get(args[0], {})
+            return [fields.get(field) for field in args[1:]]
+        if name == "HSET":
+            self.hashes.setdefault(args[0], {})[args[1]] = args[2]
+            return 1
+        if name == "PEXPIREAT":
+            self.expiry[args[0]] = int(args[1]) / 1000
+            return 1
+        if name == "DEL":
+            removed = 0
+            for key in args:
+                removed += (self.hashes.pop(key, None) is not None) + (
+                    self.zsets.pop(key, None) is not None
+                )
+                self.expiry.pop(key, None)
+            return removed
+        zset = self.zsets.setdefault(args[0], {})
+        if name == "ZADD":
+            zset[args[2]] = float(args[1])
+            return 1
+        if name == "ZREM":
+            return int(zset.pop(args[1], None) is not None)
+        if name == "ZSCORE":
+            return repr(zset[args[1]]) if args[1] in zset else None
+        if name == "ZCARD":
+            return len(zset)
+        if name == "ZREMRANGEBYSCORE":
+            low = float(args[1])
+            high = float(args[2])
+            victims = [m for m, score in zset.items() if low <= score <= high]
+            for member in victims:
+                del zset[member]
+            return len(victims)
+        ordered = sorted(zset.items(), key=lambda item: (item[1], item[0]))
+        if name == "ZPOPMIN":
+            popped = ordered[: int(args[1])]
+            for member, _ in popped:
+                del zset[member]
+            return [
+                value for member, score in popped for value in (member, repr(score))
+            ]
+        if name == "ZRANGE":
+            stop = int(args[2])
+            members = [member for member, _ in ordered]
+            return members[int(args[1]) : None if stop == -1 else stop + 1]
+        raise ValueError(f"unknown command '{name}'")
+
+
+class _FakeRedisHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        arguments = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            arguments.append(self.rfile.read(length + 2)[:-2].decode())
+        return arguments
+
+    def _encode(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, Exception):
+            return b"-ERR %s\r\n" % str(value).encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(map(self._encode, value))
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def handle(self):
+        queued = None
+        while (command := self._read_command()) is not None:
+            name, args = command[0].upper(), command[1:]
+            self.server.commands.append(name)
+            if name == "MULTI":
+                queued = []
+                self.wfile.write(b"+OK\r\n")
+                continue
+            if queued is not None and name != "EXEC":
+                queued.append((name, args))
+                self.wfile.write(b"+QUEUED\r\n")
+                continue
+            with self.server.lock:
+                try:
+                    if name == "EXEC":
+                        reply = [self.server.run(*item) for item in queued]
+                        queued = None
+                    else:
+                        reply = self.server.run(name, args)
+                except ValueError as exc:
+                    reply = exc
+            self.wfile.write(self._encode(reply))
+
+
+@pytest.fixture
+def fake_redis():
+    server = FakeRedisServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def tracker(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryBackoffTracker(3)
+    elif request.param == "sqlite":
+        backend = SQLiteBackoffTracker(tmp_path / "backoff.sqlite3", 3)
+    else:
+        server = request.getfixturevalue("fake_redis")
+        server.clock = lambda: 0.0  # scadenze controllate dal parametro ``now``
+        backend = RedisBackoffTracker(server.url, 3)
+    yield backend
+    backend.close()
+
+
+def test_backends_share_backoff_semantics(tracker):
+    now = 1000.0
+    first = tracker.record_failure("10.0.0.1", now, threshold=2, window=10)
+    assert (first.count, first.blocked_until) == (1, 0.0)
+
+    second = tracker.record_failure("10.0.0.1", now + 1, threshold=2, window=10)
+    assert second.count == 2
+    assert second.blocked_until == pytest.approx(now + 11)
+    assert tracker.lookup("10.0.0.1", now + 5).blocked_until == pytest.approx(now + 11)
+
+    # expired entries are neither returned nor counted
+    assert tracker.lookup("10.0.0.1", now + 11) is None
+    assert tracker.tracked(now + 11) == 0
+
+    tracker.record_failure("10.0.0.2", now, threshold=2, window=10)
+    tracker.discard("10.0.0.2")
+    assert tracker.lookup("10.0.0.2", now) is None
+
+
+def test_backends_evict_least_recently_updated(tracker):
+    for index in range(5):
+        tracker.record_failure(f"10.0.0.{index}", 100.0 + index, threshold=9, window=60)
+
+    assert tracker.tracked(105.0) == 3
+    assert tracker.lookup("10.0.0.1", 105.0) is None
+    assert tracker.lookup("10.0.0.4", 105.0).count == 1
+
+    tracker.clear()
+    assert tracker.tracked(105.0) == 0
+
+
+def test_sqlite_state_is_shared_between_workers(tmp_path):
+    path = tmp_path / "backoff.sqlite3"
+    workers = [SQLiteBackoffTracker(path, 100) for _ in range(4)]
+    now = time.time()
+
+    def fail(worker):
+        for _ in range(25):
+            worker.record_failure("10.0.0.9", now, threshold=1000, window=60)
+
+    threads = [threading.Thread(target=fail, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # no lost updates, and a restarted worker still sees the state
+    restarted = SQLiteBackoffTracker(path, 100)
+    assert restarted.lookup("10.0.0.9", now).count == 100
+    for worker in [*workers, restarted]:
+        worker.close()
+
+
+def test_redis_counts_are_shared_between_workers(fake_redis):
+    workers = [RedisBackoffTracker(fake_redis.url, 100) for _ in range(3)]
+    now = time.time()
+    for attempt in range(3):
+        for worker in workers:
+            worker.record_failure("10.0.0.7", now, threshold=9, window=60)
+
+    entry = workers[0].lookup("10.0.0.7", now)
+    assert entry.count == 9
+    assert entry.blocked_until == pytest.approx(now + 60)
+    for worker in workers:
+        worker.close()
+
+
+def test_redis_block_is_written_atomically_with_expiry(fake_redis):
+    fake_redis.clock = lambda: 0.0
+    tracker = RedisBackoffTracker(fake_redis.url, 10)
+    now = 1000.0
+    tracker.record_failure("10.0.0.8", now, threshold=2, window=60)
+    fake_redis.commands.clear()
+
+    entry = tracker.record_failure("10.0.0.8", now + 1, threshold=2, window=60)
+
+    assert entry.blocked_until == pytest.approx(now + 61)
+    # contatore, blocco e scadenza in un solo comando: niente HSET separato
+    assert "HSET" not in fake_redis.commands
+    key = tracker._key("10.0.0.8")
+    assert fake_redis.hashes[key]["blocked_until"] == repr(now + 61)
+    assert fake_redis.expiry[key] == pytest.approx(now + 61)
+    tracker.close()
+
+
+def test_redis_unreachable_raises_backend_error():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    tracker = RedisBackoffTracker(f"redis://127.0.0.1:{port}/0", 10, timeout=0.5)
+
+    with pytest.raises(BackoffBackendError):
+        tracker.lookup("10.0.0.1", 0.0)
+
+
+def test_build_backoff_tracker_selects_backend(tmp_path):
+    assert isinstance(
+        build_backoff_tracker("memory", max_entries=5), MemoryBackoffTracker
+    )
+    sqlite_tracker = build_backoff_tracker(
+        "sqlite", max_entries=5, sqlite_path=tmp_path / "b.sqlite3"
+    )
+    assert isinstance(sqlite_tracker, SQLiteBackoffTracker)
+    assert isinstance(
+        build_backoff_tracker("redis", max_entries=5, redis_url="redis://h:1/0"),
+        RedisBackoffTracker,
+    )
+    with pytest.raises(ValueError):
+        build_backoff_tracker("memcached", max_entries=5)
+
+
+@pytest.fixture
+def shared_backend_app(monkeypatch):
+    original = (settings.api_key, settings.allow_anonymous)
+    settings.api_key = "test-api-key"
+    settings.allow_anonymous = False
+    monkeypatch.setattr(settings, "auth_backoff_threshold", 2)
+    monkeypatch.setattr(settings, "auth_backoff_seconds", 30)
+
+    def install(tracker):
+        monkeypatch.setattr(app_module, "_failed_attempts", tracker)
+        return tracker
+
+    yield install
+    settings.api_key, settings.allow_anonymous = original
+
+
+def test_require_api_key_uses_shared_backend(shared_backend_app, tmp_path):
+    path = tmp_path / "backoff.sqlite3"
+    shared_backend_app(SQLiteBackoffTracker(path, 100))
+
+    with TestClient(app) as client:
+        assert client.get("/modules", headers={"x-api-key": "x"}).status_code == 401
+
+    # a second worker (fresh tracker on the same file) sees the first failure
+    shared_backend_app(SQLiteBackoffTracker(path, 100))
+    with TestClient(app) as client:
+        blocked = client.get("/modules", headers={"x-api-key": "x"})
+        assert blocked.status_code == 429
+        assert client.get("/modules", headers={"x-api-key": "x"}).status_code == 429
+
+
+def test_require_api_key_fails_open_when_backend_is_down(shared_backend_app):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    shared_backend_app(
+        RedisBackoffTracker(f"redis://127.0.0.1:{port}/0", 10, timeout=0.5)
+    )
+
+    with TestClient(app) as client:
+        for _ in range(3):
+            response = client.get("/modules", headers={"x-api-key": "x"})
+            assert response.status_code == 401
+        ok = client.get("/modules", headers={"x-api-key": "test-api-key"})
+        assert ok.status_code == 200
@@ -1,4 +1,5 @@
 import sys
+import threading
 from pathlib import Path
 
 import pytest
@@ -115,3 +116,68 @@ def test_backoff_blocks_and_expires(
 
     # tracker is cleared after a successful authenticated request
     assert app_module._failed_attempts == {}
+
+
+def test_failures_below_threshold_expire_after_window(
+    client, backoff_config, controllable_monotonic
+):
+    backoff_config(threshold=3, seconds=10)
+    for _ in range(2):
+        assert client.get("/modules", headers={"x-api-key": "wrong"}).status_code == 401
+
+    controllable_monotonic(11)
+    # the old failures are gone: the counter restarts instead of blocking
+    response = client.get("/modules", headers={"x-api-key": "wrong"})
+    assert response.status_code == 401
+    assert [entry.count for entry in app_module._failed_attempts.values()] == [1]
+
+
+def test_tracker_is_bounded_with_lru_eviction(
+    client, backoff_config, controllable_monotonic, monkeypatch
+):
+    backoff_config(threshold=10, seconds=60)
+    monkeypatch.setattr(app_module._failed_attempts, "max_entries", 3)
+
+    for index in range(5):
+        client.get(
+            "/modules",
+            headers={"x-api-key": "wrong", "x-forwarded-for": f"10.0.0.{index}"},
+        )
+        controllable_monotonic(1)
+
+    assert list(app_module._failed_attempts) == ["10.0.0.2", "10.0.0.3", "10.0.0.4"]
+
+
+def test_tracked_clients_gauge_on_metrics(
+    client, backoff_config, controllable_monotonic, auth_headers
+):
+    backoff_config(threshold=10, seconds=5)
+    for index in range(2):
+        client.get(
+            "/modules",
+            headers={"x-api-key": "wrong", "x-forwarded-for": f"10.0.1.{index}"},
+        )
+
+    metrics = client.get("/metrics", headers=auth_headers).text
+    assert "app_auth_backoff_tracked_clients 2.0" in metrics
+
+    controllable_monotonic(6)
+    metrics = client.get("/metrics", headers=auth_headers).text
+    assert "app_auth_backoff_tracked_clients 0.0" in metrics
+
+
+def test_tracked_clients_gauge_is_read_off_the_event_loop(
+    client, auth_headers, monkeypatch
+):
+    threads = []
+
+    def tracked() -> float:
+        threads.append(threading.current_thread())
+        return 0.0
+
+    monkeypatch.setattr(app_module, "_tracked_backoff_clients", tracked)
+    metrics = client.get("/metrics", headers=auth_headers).text
+
+    assert "app_auth_backoff_tracked_clients 0.0" in metrics
+    assert len(threads) == 1
+    assert threads[0].name.startswith("api-io")
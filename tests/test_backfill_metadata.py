@@ -0,0 +1,71 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from tools.backfill_metadata import Paths, backfill_builds
+from tools.blob_store import (
+    BLOB_DIRNAME,
+    BlobStore,
+    has_blob_refs,
+    load_snapshot,
+    write_snapshot,
+)
+
+
+def test_backfill_builds_reads_deduplicated_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr("tools.blob_store.BLOB_MIN_BYTES", 64)
+    snapshot_path = tmp_path / "src/data/builds/alchemist_lvl05.json"
+    payload = {
+        "class": "Alchemist",
+        "level": 5,
+        "export": {
+            "sheet_payload": {
+                "feats": ["Brew Potion", "Throw Anything"],
+                "sources": ["Core Rulebook"],
+                "notes": "Vedi https://example.org/alchemist per i dettagli.",
+            }
+        },
+    }
+    write_snapshot(
+        snapshot_path, payload, BlobStore(snapshot_path.parent / BLOB_DIRNAME)
+    )
+    raw = json.loads(snapshot_path.read_text(encoding="utf-8"))
+    assert set(raw["export"]) == {"$blob"}
+
+    index_path = tmp_path / "src/data/build_index.json"
+    index_path.write_text(
+        json.dumps(
+            {
+                "entries": [
+                    {
+                        "file": "src/data/builds/alchemist_lvl05.json",
+                        "level": 5,
+                        "status": "ok",
+                    }
+                ]
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    backfill_builds(Paths(source_root=tmp_path, output_root=tmp_path))
+
+    expected_feats = ["Brew Potion", "Throw Anything"]
+    expected_citation = {
+        "sources": ["Core Rulebook"],
+        "reference_urls": ["https://example.org/alchemist"],
+    }
+    # lo snapshot resta deduplicato ma i metadati vengono dal payload completo
+    assert has_blob_refs(snapshot_path.read_text(encoding="utf-8"))
+    backfilled = load_snapshot(snapshot_path)
+    assert backfilled["export"] == payload["export"]
+    assert backfilled["feat_plan"] == expected_feats
+    assert backfilled["citation"] == expected_citation
+
+    entry = json.loads(index_path.read_text(encoding="utf-8"))["entries"][0]
+    assert entry["feat_plan"] == expected_feats
+    assert entry["citation"] == expected_citation
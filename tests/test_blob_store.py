@@ -0,0 +1,82 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from tools.blob_store import (
+    BLOB_DIRNAME,
+    BLOB_REF_KEY,
+    BlobStore,
+    disk_usage_report,
+    load_snapshot,
+    pack_directory,
+    unpack_directory,
+    write_snapshot,
+)
+
+
+def _manifest() -> dict:
+    return {
+        "files": [f"{name}.txt" for name in "abcdefghijkl"],
+        "version": "2026.04.03",
+    }
+
+
+def _snapshot(level: int) -> dict:
+    return {
+        "class": "Alchemist",
+        "level": level,
+        "catalog_manifest": _manifest(),
+        "build_state": {
+            "step_labels": {str(i): f"Step {i}" for i in range(10)},
+            "level": level,
+        },
+        "composite": {"catalog_manifest": _manifest()},
+    }
+
+
+def test_dedup_writes_shared_subtrees_once_and_rehydrates(tmp_path):
+    store = BlobStore(tmp_path / BLOB_DIRNAME, min_bytes=120)
+
+    for level in (5, 10):
+        write_snapshot(
+            tmp_path / f"alchemist_lvl{level:02d}.json", _snapshot(level), store
+        )
+
+    raw = json.loads((tmp_path / "alchemist_lvl05.json").read_text(encoding="utf-8"))
+    assert set(raw["catalog_manifest"]) == {BLOB_REF_KEY}
+    assert raw["catalog_manifest"] == raw["composite"]["catalog_manifest"]
+    assert raw["level"] == 5
+    # manifest e step_labels scritti una volta sola per entrambi gli snapshot;
+    # la lista dei file (< 120 byte) resta inline dentro il blob del manifest
+    assert store.written == 2
+    assert store.reused == 4
+    for level in (5, 10):
+        path = tmp_path / f"alchemist_lvl{level:02d}.json"
+        assert load_snapshot(path) == _snapshot(level)
+
+
+def test_pack_report_and_unpack_round_trip(tmp_path):
+    for level in (1, 5, 10):
+        write_snapshot(tmp_path / f"alchemist_lvl{level:02d}.json", _snapshot(level))
+    original = {path.name: path.read_bytes() for path in tmp_path.glob("*.json")}
+
+    assert pack_directory(tmp_path, min_bytes=120) == 3
+    report = disk_usage_report(tmp_path)
+
+    assert report["snapshots"] == 3
+    assert report["blobs"] == 2
+    assert report["orphan_blobs"] == 0
+    assert report["expanded_bytes"] == sum(
+        len(content) for content in original.values()
+    )
+    assert report["saved_bytes"] > 0
+
+    assert unpack_directory(tmp_path) == 3
+    assert {
+        path.name: path.read_bytes() for path in tmp_path.glob("*.json")
+    } == original
+    assert not (tmp_path / BLOB_DIRNAME).exists()
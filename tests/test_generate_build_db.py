@@ -1,25 +1,40 @@
 import argparse
 import asyncio
 import copy
+from dataclasses import replace
 import json
 from pathlib import Path
 import sys
 import logging
+import os
+import shutil
+import signal
 
 import httpx
+import pytest
+from jsonschema.exceptions import ValidationError
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))
 
+from tools.blob_store import BLOB_DIRNAME, has_blob_refs, load_snapshot
+from tools.build_store import BuildStore, load_build_index
 from tools.generate_build_db import (
+    BUILD_INDEX_COMPACT_EVERY,
+    BuildIndexJournal,
     BuildRequest,
+    HarvestCheckpoint,
+    HarvestInterrupted,
     _enrich_sheet_payload,
     analyze_indices,
+    fetch_build,
     review_local_database,
     run_harvest,
     run_dual_pass_harvest,
     parse_args,
+    plan_incremental_harvest,
+    request_fingerprint,
 )
 
 
@@ -390,6 +405,12 @@ async def _run_core_harvest(
     reference_dir: Path | None = None,
     suggest_combos: bool = False,
     validate_combo: bool = False,
+    index_compact_every: int = BUILD_INDEX_COMPACT_EVERY,
+    build_db_path: Path | None = None,
+    dedup_blobs: bool = False,
+    server_module_path: Path | None = None,
+    resume: bool = False,
+    plan_only: bool = False,
 ):
     sample_payload = _make_sample_payload()
     sheet_payload = sample_payload["export"]["sheet_payload"]
@@ -449,6 +470,12 @@ async def _run_core_harvest(
         reference_dir=reference_dir,
         suggest_combos=suggest_combos,
         validate_combo=validate_combo,
+        index_compact_every=index_compact_every,
+        build_db_path=build_db_path,
+        dedup_blobs=dedup_blobs,
+        server_module_path=server_module_path,
+        resume=resume,
+        plan_only=plan_only,
     )
 
     return output_dir, index_path
@@ -873,6 +900,502 @@ def test_run_harvest_skips_unchanged_payload(tmp_path, monkeypatch):
     assert all(entry["status"] == "ok" for entry in index_payload["entries"])
 
 
+def test_request_fingerprint_tracks_params_catalog_and_server_module():
+    request = BuildRequest(class_name="Alchemist", mode="core", level=5)
+
+    def fingerprint(req=request, catalog="2026.04.03", module="abc"):
+        return request_fingerprint(req, catalog_version=catalog, module_hash=module)
+
+    assert fingerprint() == fingerprint()
+    assert fingerprint() != fingerprint(req=replace(request, level=10))
+    assert fingerprint() != fingerprint(req=replace(request, race="Elf"))
+    assert fingerprint() != fingerprint(
+        req=replace(request, body_params={"feat_plan": ["Power Attack"]})
+    )
+    assert fingerprint() != fingerprint(catalog="2026.05.01")
+    assert fingerprint() != fingerprint(module="def")
+
+
+def test_plan_incremental_harvest_reports_reasons(tmp_path):
+    requests = {
+        name: (BuildRequest(class_name=name, level=1), tmp_path / f"{name}.json", 1)
+        for name in ("missing", "unstamped", "changed", "indexed", "stamped")
+    }
+    fingerprints = {
+        destination: f"fp-{name}" for name, (_, destination, _) in requests.items()
+    }
+    (tmp_path / "unstamped.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "changed.json").write_text(
+        json.dumps({"request_fingerprint": "fp-old"}), encoding="utf-8"
+    )
+    (tmp_path / "indexed.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "stamped.json").write_text(
+        json.dumps({"request_fingerprint": "fp-stamped"}), encoding="utf-8"
+    )
+    existing_entries = {
+        str(tmp_path / "indexed.json"): {"request_fingerprint": "fp-indexed"}
+    }
+
+    plan = plan_incremental_harvest(
+        list(requests.values()), fingerprints, existing_entries
+    )
+
+    assert [destination.stem for _, destination, _ in plan.reuse] == [
+        "indexed",
+        "stamped",
+    ]
+    assert plan.summary() == {
+        "planned": 5,
+        "fetch": 3,
+        "skipped": 2,
+        "reasons": {"fingerprint_changed": 1, "missing_snapshot": 1, "unstamped": 1},
+    }
+
+
+def test_run_harvest_refetches_when_server_module_changes(tmp_path, monkeypatch):
+    server_module = tmp_path / "minmax_builder.txt"
+    server_module.write_text("v1", encoding="utf-8")
+    output_dir, index_path = asyncio.run(
+        _run_core_harvest(tmp_path, monkeypatch, server_module_path=server_module)
+    )
+    first = json.loads((output_dir / "alchemist_lvl05.json").read_text("utf-8"))
+    index_payload = json.loads(index_path.read_text(encoding="utf-8"))
+    assert first["request_fingerprint"]
+    assert all(entry["request_fingerprint"] for entry in index_payload["entries"])
+
+    asyncio.run(
+        _run_core_harvest(
+            tmp_path,
+            monkeypatch,
+            skip_unchanged=True,
+            server_module_path=server_module,
+        )
+    )
+    index_payload = json.loads(index_path.read_text(encoding="utf-8"))
+    assert index_payload["incremental_plan"]["skipped"] == 3
+
+    server_module.write_text("v2", encoding="utf-8")
+    asyncio.run(
+        _run_core_harvest(
+            tmp_path,
+            monkeypatch,
+            skip_unchanged=True,
+            server_module_path=server_module,
+        )
+    )
+    index_payload = json.loads(index_path.read_text(encoding="utf-8"))
+    assert index_payload["incremental_plan"] == {
+        "planned": 3,
+        "fetch": 3,
+        "skipped": 0,
+        "reasons": {"fingerprint_changed": 3},
+    }
+    second = json.loads((output_dir / "alchemist_lvl05.json").read_text("utf-8"))
+    assert second["request_fingerprint"] != first["request_fingerprint"]
+
+
+def _record_fetched_levels(monkeypatch, on_fetch=None) -> list[int]:
+    fetched: list[int] = []
+
+    async def recording_fetch_build(client, api_key, request, *args, **kwargs):
+        fetched.append(request.level)
+        if on_fetch is not None:
+            on_fetch(request)
+        # MockTransport non cede mai il controllo: simula l'attesa di rete
+        await asyncio.sleep(0)
+        return await fetch_build(client, api_key, request, *args, **kwargs)
+
+    monkeypatch.setattr("tools.generate_build_db.fetch_build", recording_fetch_build)
+    return fetched
+
+
+def test_run_harvest_resumes_after_aborted_run(tmp_path, monkeypatch):
+    def fail_on_level_10(request):
+        if request.level == 10:
+            raise ValidationError("schema non valido")
+
+    _record_fetched_levels(monkeypatch, fail_on_level_10)
+    with pytest.raises(ValidationError):
+        asyncio.run(_run_core_harvest(tmp_path, monkeypatch))
+
+    index_path = tmp_path / "build_index.json"
+    checkpoint = HarvestCheckpoint.for_index(index_path)
+    assert checkpoint.load() == 2
+    assert set(checkpoint.completed) == {("alchemist", 1), ("alchemist", 5)}
+    assert all(record["fingerprint"] for record in checkpoint.completed.values())
+    # l'indice parziale è stato salvato prima di propagare l'errore
+    index_payload = json.loads(index_path.read_text(encoding="utf-8"))
+    assert {entry["level"] for entry in index_payload["entries"]} == {1, 5}
+
+    fetched = _record_fetched_levels(monkeypatch)
+    asyncio.run(_run_core_harvest(tmp_path, monkeypatch, resume=True))
+
+    assert fetched == [10]
+    assert not checkpoint.path.exists()
+    index_payload = json.loads(index_path.read_text(encoding="utf-8"))
+    assert {entry["level"] for entry in index_payload["entries"]} == {1, 5, 10}
+
+
+def test_plan_only_keeps_checkpoint_of_aborted_run(tmp_path, monkeypatch):
+    def fail_on_level_10(request):
+        if request.level == 10:
+            raise ValidationError("schema non valido")
+
+    _record_fetched_levels(monkeypatch, fail_on_level_10)
+    with pytest.raises(ValidationError):
+        asyncio.run(_run_core_harvest(tmp_path, monkeypatch))
+
+    index_path = tmp_path / "build_index.json"
+    checkpoint_path = HarvestCheckpoint.for_index(index_path).path
+    checkpoint_before = checkpoint_path.read_bytes()
+    index_before = index_path.read_bytes()
+
+    fetched = _record_fetched_levels(monkeypatch)
+    asyncio.run(_run_core_harvest(tmp_path, monkeypatch, plan_only=True))
+    assert fetched == []
+    assert checkpoint_path.read_bytes() == checkpoint_before
+    assert index_path.read_bytes() == index_before
+
+    asyncio.run(_run_core_harvest(tmp_path, monkeypatch, resume=True))
+    assert fetched == [10]
+
+
+def test_run_harvest_resume_refetches_snapshots_with_stale_fingerprint(
+    tmp_path, monkeypatch
+):
+    server_module = tmp_path / "minmax_builder.txt"
+    server_module.write_text("v1", encoding="utf-8")
+
+    def fail_on_level_10(request):
+        if request.level == 10:
+            raise ValidationError("schema non valido")
+
+    _record_fetched_levels(monkeypatch, fail_on_level_10)
+    with pytest.raises(ValidationError):
+        asyncio.run(
+            _run_core_harvest(tmp_path, monkeypatch, server_module_path=server_module)
+        )
+
+    checkpoint = HarvestCheckpoint.for_index(tmp_path / "build_index.json")
+    checkpoint.load()
+    stale = {
+        level: record["fingerprint"]
+        for (_, level), record in checkpoint.completed.items()
+    }
+    assert set(stale) == {1, 5}
+
+    # il modulo servito cambia tra l'interruzione e il resume
+    server_module.write_text("v2", encoding="utf-8")
+    fetched = _record_fetched_levels(monkeypatch)
+    asyncio.run(
+        _run_core_harvest(
+            tmp_path, monkeypatch, server_module_path=server_module, resume=True
+        )
+    )
+
+    assert fetched == [1, 5, 10]
+    index_payload = json.loads(
+        (tmp_path / "build_index.json").read_text(encoding="utf-8")
+    )
+    fingerprints = {
+        entry["level"]: entry["request_fingerprint"]
+        for entry in index_payload["entries"]
+    }
+    assert set(fingerprints) == {1, 5, 10}
+    assert all(fingerprints[level] != stale[level] for level in stale)
+
+
+def test_run_harvest_drains_in_flight_snapshots_on_sigint(tmp_path, monkeypatch):
+    def interrupt_once(request):
+        if request.level == 1:
+            os.kill(os.getpid(), signal.SIGINT)
+
+    fetched = _record_fetched_levels(monkeypatch, interrupt_once)
+    with pytest.raises(HarvestInterrupted):
+        asyncio.run(_run_core_harvest(tmp_path, monkeypatch))
+
+    # lo snapshot in corso viene completato, nessuno nuovo viene avviato
+    assert fetched == [1]
+    assert (tmp_path / "builds" / "alchemist.json").is_file()
+    index_path = tmp_path / "build_index.json"
+    index_payload = json.loads(index_path.read_text(encoding="utf-8"))
+    assert [entry["level"] for entry in index_payload["entries"]] == [1]
+    assert signal.getsignal(signal.SIGINT) is signal.default_int_handler
+
+    fetched = _record_fetched_levels(monkeypatch)
+    asyncio.run(_run_core_harvest(tmp_path, monkeypatch, resume=True))
+    assert fetched == [5, 10]
+
+
+async def _run_module_harvest(tmp_path, monkeypatch, handler, modules):
+    requests_seen: list[str] = []
+
+    def recording_handler(request: httpx.Request) -> httpx.Response:
+        requests_seen.append(f"{request.method} {request.url.path}")
+        if request.url.path == "/health":
+            return httpx.Response(200, json={"status": "ok"})
+        return handler(request)
+
+    transport = httpx.MockTransport(recording_handler)
+    real_async_client = httpx.AsyncClient
+
+    def client_factory(*args, **kwargs):
+        kwargs.setdefault("transport", transport)
+        return real_async_client(*args, **kwargs)
+
+    monkeypatch.setattr("tools.generate_build_db.httpx.AsyncClient", client_factory)
+    monkeypatch.setattr(
+        "tools.generate_build_db.validate_with_schema", lambda *args, **kwargs: None
+    )
+
+    modules_dir = tmp_path / "modules"
+    module_index_path = tmp_path / "module_index.json"
+    await run_harvest(
+        [],
+        api_url="http://mock.api",
+        api_key="mock-key",
+        output_dir=tmp_path / "builds",
+        index_path=tmp_path / "build_index.json",
+        modules=modules,
+        modules_output_dir=modules_dir,
+        module_index_path=module_index_path,
+        concurrency=2,
+        max_retries=0,
+        spec_path=None,
+        discover=False,
+        include_filters=[],
+        exclude_filters=[],
+        strict=False,
+        keep_invalid=True,
+        require_complete=False,
+        skip_health_check=False,
+    )
+    entries = json.loads(module_index_path.read_text(encoding="utf-8"))["entries"]
+    return modules_dir, {entry["module"]: entry for entry in entries}, requests_seen
+
+
+def test_run_harvest_downloads_modules_in_one_batch(tmp_path, monkeypatch):
+    items = [
+        {
+            "name": "alpha.txt",
+            "status": 200,
+            "meta": {"name": "alpha.txt", "size_bytes": 5},
+            "content": "alpha",
+        },
+        {
+            "name": "hub.bin",
+            "status": 200,
+            "meta": {"name": "hub.bin", "size_bytes": 3},
+            "content_encoding": "base64",
+            "content": "AAEC",
+        },
+        {"name": "gone.txt", "status": 404, "detail": "Module not found"},
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/modules:batch":
+            assert json.loads(request.content)["names"] == [
+                "alpha.txt",
+                "hub.bin",
+                "gone.txt",
+            ]
+            body = "".join(json.dumps(item) + "\n" for item in items)
+            return httpx.Response(
+                200, text=body, headers={"content-type": "application/x-ndjson"}
+            )
+        return httpx.Response(500)
+
+    modules_dir, entries, requests_seen = asyncio.run(
+        _run_module_harvest(
+            tmp_path, monkeypatch, handler, ["alpha.txt", "hub.bin", "gone.txt"]
+        )
+    )
+
+    assert requests_seen == ["GET /health", "POST /modules:batch"]
+    assert (modules_dir / "alpha.txt").read_text(encoding="utf-8") == "alpha"
+    assert (modules_dir / "hub.bin").read_bytes() == b"\x00\x01\x02"
+    assert entries["alpha.txt"]["status"] == "ok"
+    assert entries["gone.txt"]["status"] == "error"
+    assert "404" in entries["gone.txt"]["error"]
+
+
+def test_run_harvest_falls_back_without_batch_endpoint(tmp_path, monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/modules/alpha.txt":
+            return httpx.Response(200, text="alpha")
+        if request.url.path == "/modules/alpha.txt/meta":
+            return httpx.Response(200, json={"name": "alpha.txt", "size_bytes": 5})
+        return httpx.Response(404)
+
+    modules_dir, entries, requests_seen = asyncio.run(
+        _run_module_harvest(tmp_path, monkeypatch, handler, ["alpha.txt"])
+    )
+
+    assert "POST /modules:batch" in requests_seen
+    assert "GET /modules/alpha.txt/meta" in requests_seen
+    assert (modules_dir / "alpha.txt").read_text(encoding="utf-8") == "alpha"
+    assert entries["alpha.txt"]["status"] == "ok"
+
+
+def test_build_index_journal_replays_and_compacts(tmp_path):
+    index_path = tmp_path / "build_index.json"
+    journal = BuildIndexJournal.for_index(index_path)
+    journal.append("a.json", {"file": "a.json", "status": "ok"})
+    journal.append("a.json", {"file": "a.json", "status": "invalid"})
+    journal.append("b.json", {"file": "b.json", "status": "ok"})
+    journal.close()
+    with journal.path.open("a", encoding="utf-8") as handle:
+        handle.write('{"key": "c.json", "entr')  # crash a metà riga
+
+    entries = {"old.json": {"file": "old.json", "status": "ok"}}
+    assert BuildIndexJournal.for_index(index_path).replay(entries) == 3
+    assert entries["a.json"]["status"] == "invalid"
+    assert sorted(entries) == ["a.json", "b.json", "old.json"]
+
+    journal.compact(index_path, {"entries": list(entries.values())})
+    assert not journal.path.exists()
+    assert len(json.loads(index_path.read_text(encoding="utf-8"))["entries"]) == 3
+
+
+def test_run_harvest_recovers_journal_of_interrupted_run(tmp_path, monkeypatch):
+    journal = BuildIndexJournal.for_index(tmp_path / "build_index.json")
+    journal.append(
+        "builds/bard.json",
+        {"file": "builds/bard.json", "class": "Bard", "level": 1, "status": "ok"},
+    )
+    journal.close()
+    compactions = []
+    original_compact = BuildIndexJournal.compact
+
+    def counting_compact(self, index_path, index_payload):
+        compactions.append(len(index_payload["entries"]))
+        original_compact(self, index_path, index_payload)
+
+    monkeypatch.setattr(BuildIndexJournal, "compact", counting_compact)
+
+    _, index_path = asyncio.run(
+        _run_core_harvest(tmp_path, monkeypatch, index_compact_every=2)
+    )
+
+    entries = json.loads(index_path.read_text(encoding="utf-8"))["entries"]
+    assert "builds/bard.json" in {entry["file"] for entry in entries}
+    assert len(entries) == 4
+    # recupero all'avvio, una compattazione dopo 2 snapshot e quella finale
+    assert compactions == [1, 3, 4]
+    assert not journal.path.exists()
+
+
+def test_build_store_round_trips_repository_database(tmp_path):
+    db_path = tmp_path / "builds.sqlite3"
+    export_root = tmp_path / "export"
+    index_path = ROOT / "src" / "data" / "build_index.json"
+
+    with BuildStore(db_path) as store:
+        imported = store.import_index(index_path, ROOT)
+        exported = store.export(export_root / "build_index.json", export_root)
+
+    assert imported == exported > 0
+    assert (export_root / "build_index.json").read_bytes() == index_path.read_bytes()
+    for entry in json.loads(index_path.read_text(encoding="utf-8"))["entries"]:
+        if entry.get("file") and (ROOT / entry["file"]).is_file():
+            exported_file = export_root / entry["file"]
+            assert exported_file.read_bytes() == (ROOT / entry["file"]).read_bytes()
+
+
+def test_build_store_filters_on_indexed_columns(tmp_path):
+    entries = [
+        {"file": "a.json", "class": "Alchemist", "level": 1, "status": "ok"},
+        {"file": "b.json", "class": "Alchemist", "level": 5, "status": "invalid"},
+        {"file": "c.json", "class": "Wizard", "level": 5, "status": "ok"},
+    ]
+    with BuildStore(tmp_path / "builds.sqlite3") as store:
+        store.write_index({"generated_at": "now", "entries": entries})
+
+        assert store.entries(classes=["alchemist"]) == entries[:2]
+        assert store.entries(levels=[5], status="ok") == [entries[2]]
+        assert store.entries(limit=1, offset=1) == [entries[1]]
+        with pytest.raises(ValueError):
+            store.entries(sheet_markdown="x")
+
+
+def test_run_harvest_mirrors_index_and_payloads_in_build_store(tmp_path, monkeypatch):
+    db_path = tmp_path / "builds.sqlite3"
+
+    _, index_path = asyncio.run(
+        _run_core_harvest(tmp_path, monkeypatch, build_db_path=db_path)
+    )
+
+    index_payload = json.loads(index_path.read_text(encoding="utf-8"))
+    assert load_build_index(db_path) == index_payload
+    with BuildStore(db_path) as store:
+        for entry in index_payload["entries"]:
+            assert (
+                store.payload_bytes(entry["file"]) == Path(entry["file"]).read_bytes()
+            )
+        assert [entry["level"] for entry in store.entries(levels=[5])] == [5]
+
+
+def test_run_harvest_closes_build_store_when_aborted_early(tmp_path, monkeypatch):
+    closed: list[Path] = []
+
+    class TrackingBuildStore(BuildStore):
+        def close(self) -> None:
+            closed.append(self.path)
+            super().close()
+
+    def broken_planner(*args, **kwargs):
+        raise RuntimeError("piano non disponibile")
+
+    monkeypatch.setattr("tools.generate_build_db.BuildStore", TrackingBuildStore)
+    monkeypatch.setattr(
+        "tools.generate_build_db.plan_incremental_harvest", broken_planner
+    )
+    db_path = tmp_path / "builds.sqlite3"
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            _run_core_harvest(
+                tmp_path, monkeypatch, build_db_path=db_path, skip_unchanged=True
+            )
+        )
+
+    assert closed == [db_path]
+
+
+def test_run_harvest_dedups_snapshots_into_blob_store(tmp_path, monkeypatch):
+    monkeypatch.setattr("tools.blob_store.BLOB_MIN_BYTES", 256)
+    db_path = tmp_path / "builds.sqlite3"
+
+    output_dir, index_path = asyncio.run(
+        _run_core_harvest(
+            tmp_path, monkeypatch, build_db_path=db_path, dedup_blobs=True
+        )
+    )
+
+    lvl05 = output_dir / "alchemist_lvl05.json"
+    lvl10 = output_dir / "alchemist_lvl10.json"
+    assert (output_dir / BLOB_DIRNAME).is_dir()
+    assert has_blob_refs(lvl05.read_text(encoding="utf-8"))
+    raw05 = json.loads(lvl05.read_text(encoding="utf-8"))
+    raw10 = json.loads(lvl10.read_text(encoding="utf-8"))
+    # sotto-alberi identici tra i checkpoint: stesso riferimento, un solo blob
+    assert set(raw05["build_state"]) == {"$blob"}
+    assert raw05["build_state"] == raw10["build_state"]
+    assert raw05["progressione"] == raw10["progressione"]
+
+    payload = load_snapshot(lvl05)
+    assert not has_blob_refs(json.dumps(payload))
+    assert payload["build_state"]["class"] == "Alchemist"
+    with BuildStore(db_path) as store:
+        assert store.load_payload(str(lvl05)) == payload
+
+    # l'archivio SQLite contiene anche i blob: l'export ricostruisce .blobs
+    shutil.rmtree(output_dir / BLOB_DIRNAME)
+    with BuildStore(db_path) as store:
+        store.export(tmp_path / "export" / "build_index.json", tmp_path / "export")
+    assert load_snapshot(lvl05) == payload
+
+
 def test_enrich_sheet_payload_trims_markdown_whitespace():
     payload = {
         "export": {
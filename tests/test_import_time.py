@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from tools.benchmark_import_time import measure_cold_start, parse_importtime
+
+
+def test_parse_importtime_reads_self_and_cumulative():
+    stderr = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |     _json",
+            "import time:      1500 |       2100 |   json",
+            "some unrelated warning",
+        ]
+    )
+
+    assert parse_importtime(stderr) == {"_json": (120, 120), "json": (1500, 2100)}
+
+
+def test_api_cold_start_skips_heavy_modules():
+    result = measure_cold_start()
+
+    # l'API non deve trascinarsi dietro harvester, jsonschema o pypdf; il budget
+    # in millisecondi resta in tools/benchmark_import_time.py
+    assert result["heavy"] == []
+    assert "tools.schema_validation" in result["times"]
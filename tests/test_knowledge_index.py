@@ -0,0 +1,170 @@
+import io
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import src.app as app_module
+from src.app import app
+from src.config import settings
+from src.knowledge_index import (
+    KnowledgeIndexUnavailable,
+    build_index,
+    ensure_indexes,
+    file_sha256,
+    load_index,
+)
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def _make_pdf(pages, outline=()):
+    """Minimal PDF with one Helvetica text line per page, plus an outline."""
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # pagine, note dopo aver numerato i figli
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = b"BT /F1 12 Tf 72 720 Td (%s) Tj ET" % text.encode("latin-1")
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]"
+            b" /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids),
+        len(kids),
+    )
+
+    body = io.BytesIO()
+    body.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(body.tell())
+        body.write(b"%d 0 obj\n%s\nendobj\n" % (number, obj))
+    xref = body.tell()
+    body.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        body.write(b"%010d 00000 n \n" % offset)
+    body.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref)
+    )
+
+    writer = pypdf.PdfWriter(clone_from=pypdf.PdfReader(io.BytesIO(body.getvalue())))
+    writer.add_metadata({"/Title": "Sample Guide"})
+    for title, page in outline:
+        writer.add_outline_item(title, page - 1)
+    result = io.BytesIO()
+    writer.write(result)
+    return result.getvalue()
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    source = data_dir / "guide.pdf"
+    source.write_bytes(
+        _make_pdf(
+            ["Prima pagina", "Armi e armature", "Oggetti magici"],
+            outline=[("Equipaggiamento", 2), ("Magia", 3)],
+        )
+    )
+    return source
+
+
+def test_build_index_serves_pages_from_sidecar(sample_pdf, tmp_path):
+    index_dir = tmp_path / "index"
+    built = build_index(sample_pdf, index_dir)
+
+    assert built.page_count == 3
+    assert built.read_page(2).strip() == "Armi e armature"
+    assert [item["title"] for item in built.outline] == ["Equipaggiamento", "Magia"]
+    assert built.document["title"] == "Sample Guide"
+    with pytest.raises(IndexError):
+        built.read_page(4)
+
+    loaded = load_index(index_dir, "guide.pdf", file_sha256(sample_pdf))
+    assert loaded.summary() == built.summary()
+    assert loaded.read_page(3) == built.read_page(3)
+    # un PDF modificato invalida l'indice
+    assert load_index(index_dir, "guide.pdf", "0" * 64) is None
+
+
+def test_ensure_indexes_skips_fresh_indexes(sample_pdf, tmp_path):
+    index_dir = tmp_path / "index"
+    (sample_pdf.parent / "notes.json").write_text("{}", encoding="utf-8")
+
+    assert ensure_indexes(sample_pdf.parent, index_dir) == {"guide.pdf": "built"}
+    assert ensure_indexes(sample_pdf.parent, index_dir) == {"guide.pdf": "fresh"}
+
+
+def test_build_index_requires_pypdf(sample_pdf, tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pypdf", None)
+
+    with pytest.raises(KnowledgeIndexUnavailable):
+        build_index(sample_pdf, tmp_path / "index")
+
+
+@pytest.fixture
+def knowledge_client(sample_pdf, tmp_path, monkeypatch):
+    original = (settings.api_key, settings.allow_anonymous)
+    settings.api_key = "test-api-key"
+    settings.allow_anonymous = False
+    monkeypatch.setattr(app_module, "DATA_DIR", sample_pdf.parent)
+    monkeypatch.setattr(settings, "knowledge_index_dir", tmp_path / "index")
+    monkeypatch.setattr(app_module, "_knowledge_indexes", {})
+    with TestClient(app) as client:
+        client.headers["x-api-key"] = "test-api-key"
+        yield client
+    settings.api_key, settings.allow_anonymous = original
+
+
+def test_knowledge_page_endpoint_builds_index_on_first_use(knowledge_client):
+    before = knowledge_client.get("/knowledge/guide.pdf/meta").json()
+    assert before["pages_indexed"] is False
+
+    page = knowledge_client.get("/knowledge/guide.pdf/pages/3")
+    assert page.status_code == 200
+    assert page.json()["text"].strip() == "Oggetti magici"
+    assert page.json()["page_count"] == 3
+    assert page.json()["section"] == "Magia"
+    assert (
+        knowledge_client.get("/knowledge/guide.pdf/pages/1").json()["section"] is None
+    )
+
+    cached = knowledge_client.get(
+        "/knowledge/guide.pdf/pages/3", headers={"If-None-Match": page.headers["ETag"]}
+    )
+    assert cached.status_code == 304
+
+    meta = knowledge_client.get("/knowledge/guide.pdf/meta").json()
+    assert meta["pages_indexed"] is True
+    assert meta["page_count"] == 3
+    assert meta["outline"][0] == {"title": "Equipaggiamento", "page": 2, "level": 1}
+
+
+def test_knowledge_page_endpoint_errors(knowledge_client, monkeypatch):
+    with monkeypatch.context() as patched:
+        patched.setitem(sys.modules, "pypdf", None)
+        unavailable = knowledge_client.get("/knowledge/guide.pdf/pages/1")
+        assert unavailable.status_code == 503
+        assert "pypdf" in unavailable.json()["detail"]
+
+    assert knowledge_client.get("/knowledge/guide.pdf/pages/0").status_code == 404
+    assert knowledge_client.get("/knowledge/guide.pdf/pages/9").status_code == 404
+    assert knowledge_client.get("/knowledge/missing.pdf/pages/1").status_code == 404
+
+    (app_module.DATA_DIR / "notes.md").write_text("# note", encoding="utf-8")
+    assert knowledge_client.get("/knowledge/notes.md/pages/1").status_code == 404
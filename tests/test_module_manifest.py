@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.module_manifest import DirectoryManifest, ManifestWatcher
+
+
+def _parser_calls(calls):
+    def parser(path: Path, raw: bytes):
+        calls.append(path.name)
+        return {"version": raw.decode("utf-8").split(":", 1)[-1].strip()}
+
+    return parser
+
+
+def test_rescan_reuses_unchanged_entries(tmp_path):
+    calls = []
+    (tmp_path / "a.txt").write_text("version: 1", encoding="utf-8")
+    (tmp_path / "b.txt").write_text("version: 2", encoding="utf-8")
+    (tmp_path / "nested").mkdir()
+
+    manifest = DirectoryManifest(tmp_path, metadata_parser=_parser_calls(calls))
+    first = manifest.rescan()
+
+    assert [item["name"] for item in first.listing] == ["a.txt", "b.txt"]
+    assert first.entries["a.txt"].metadata == {"version": "1"}
+    assert sorted(calls) == ["a.txt", "b.txt"]
+
+    (tmp_path / "b.txt").write_text("version: 3 (aggiornato)", encoding="utf-8")
+    second = manifest.rescan()
+
+    assert second.entries["a.txt"] is first.entries["a.txt"]
+    assert second.entries["b.txt"].metadata == {"version": "3 (aggiornato)"}
+    assert calls.count("a.txt") == 1
+
+
+def test_current_picks_up_added_and_removed_files(tmp_path):
+    (tmp_path / "a.txt").write_text("a", encoding="utf-8")
+    manifest = DirectoryManifest(tmp_path)
+    manifest.rescan()
+
+    (tmp_path / "b.txt").write_text("b", encoding="utf-8")
+    (tmp_path / "a.txt").unlink()
+    # garantisce un mtime di directory diverso anche su filesystem a bassa risoluzione
+    os.utime(tmp_path, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+
+    assert [item["name"] for item in manifest.current().listing] == ["b.txt"]
+
+
+def test_lookup_refreshes_modified_and_nested_files(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_text("uno", encoding="utf-8")
+    nested = tmp_path / "sub" / "c.txt"
+    nested.parent.mkdir()
+    nested.write_text("annidato", encoding="utf-8")
+
+    manifest = DirectoryManifest(tmp_path)
+    manifest.rescan()
+    original = manifest.lookup(target)
+
+    target.write_text("uno modificato", encoding="utf-8")
+    updated = manifest.lookup(target)
+
+    assert updated.sha256 != original.sha256
+    assert updated.size_bytes == target.stat().st_size
+    assert manifest.lookup(nested).name == "c.txt"
+    assert all(item["name"] != "c.txt" for item in manifest.current().listing)
+    assert manifest.lookup(tmp_path / "missing.txt") is None
+    assert manifest.lookup(nested.parent) is None
+
+
+def test_polling_watcher_refreshes_in_place_edits(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_text("uno", encoding="utf-8")
+    manifest = DirectoryManifest(tmp_path)
+    manifest.rescan()
+
+    watcher = ManifestWatcher([manifest], mode="poll", poll_interval=0.01)
+    watcher.start()
+    try:
+        target.write_text("uno, ma più lungo", encoding="utf-8")
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            if manifest.current().listing[0]["size_bytes"] == target.stat().st_size:
+                break
+            time.sleep(0.01)
+    finally:
+        watcher.stop()
+
+    assert manifest.current().listing[0]["size_bytes"] == target.stat().st_size
@@ -0,0 +1,96 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import src.module_search as module_search
+from src.module_search import SearchIndex, fold, snippet
+
+
+def _write(path: Path, text: str) -> None:
+    path.write_text(text, encoding="utf-8")
+
+
+def test_search_ranks_sections_with_bm25(tmp_path):
+    _write(
+        tmp_path / "taverna.txt",
+        "triggers:\n  - taglie\n  - taglie sui mostri\nobjectives:\n  - gestire la locanda\n",
+    )
+    _write(
+        tmp_path / "ledger.txt", "notes:\n  - una taglia pagata\n  - taglie\n  - oro\n"
+    )
+    index = SearchIndex({"modules": tmp_path})
+    index.refresh()
+
+    hits = index.search("taglie")
+
+    assert [(hit.name, hit.section) for hit in hits] == [
+        ("taverna.txt", "triggers"),
+        ("ledger.txt", "notes"),
+    ]
+    assert hits[0].score > hits[1].score
+    text = (tmp_path / "taverna.txt").read_text(encoding="utf-8")
+    assert text[hits[0].offset :].startswith("taglie")
+    assert "taglie" in hits[0].snippet
+    assert index.search("inesistente") == []
+
+
+def test_search_folds_accents_and_case(tmp_path):
+    _write(tmp_path / "a.md", "# Modalità\nEcho Gate attivo\n")
+    index = SearchIndex({"modules": tmp_path})
+    index.refresh()
+
+    assert index.search("modalita")[0].section == "modalita"
+    assert index.search("ECHO gate")[0].name == "a.md"
+    assert fold("Città") == "citta"
+
+
+def test_refresh_reindexes_only_changed_files(tmp_path, monkeypatch):
+    _write(tmp_path / "a.txt", "alpha: uno\n")
+    _write(tmp_path / "b.txt", "beta: due\n")
+    index = SearchIndex({"modules": tmp_path, "data": tmp_path / "missing"})
+    index.refresh()
+
+    calls = []
+    original = module_search.index_file
+
+    def counting_index_file(source, name, *args):
+        calls.append(name)
+        return original(source, name, *args)
+
+    monkeypatch.setattr(module_search, "index_file", counting_index_file)
+
+    _write(tmp_path / "b.txt", "beta: tre\n")
+    index.refresh()
+    assert calls == ["b.txt"]
+    assert index.search("tre")[0].name == "b.txt"
+    assert index.search("due") == []
+
+    # stesso contenuto con firma diversa: nessuna ri-tokenizzazione
+    stat_result = (tmp_path / "a.txt").stat()
+    os.utime(
+        tmp_path / "a.txt",
+        ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10**9),
+    )
+    index.refresh()
+    assert calls == ["b.txt"]
+
+    (tmp_path / "a.txt").unlink()
+    index.refresh()
+    assert index.search("uno") == []
+    assert set(index.files) == {"modules:b.txt"}
+
+
+def test_snippet_is_bounded_and_marks_elisions():
+    text = "parola " * 200 + "obiettivo " + "coda " * 200
+    offset = text.index("obiettivo")
+
+    result = snippet(text, offset)
+
+    assert "obiettivo" in result
+    assert result.startswith("…") and result.endswith("…")
+    assert (
+        len(result)
+        <= module_search.SNIPPET_BEFORE_CHARS + module_search.SNIPPET_AFTER_CHARS + 2
+    )
@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.module_sections import build_section_index, slugify
+
+YAML_LIKE = """module_name: Demo
+version: 1
+
+# ---------------------------------
+# 1) Objectives / Principles
+# ---------------------------------
+objectives:
+  - Uno
+principles:
+  - "Due"
+
+# ======================
+# COMMANDS
+# ======================
+commands:
+  - name: /start
+"""
+
+
+def test_yaml_like_index_tracks_keys_banners_and_byte_offsets():
+    raw = YAML_LIKE.encode("utf-8")
+    sections = {span.key: span for span in build_section_index(raw, ".txt")}
+
+    assert list(sections) == [
+        "module_name",
+        "version",
+        "1-objectives-principles",
+        "objectives",
+        "principles",
+        "commands-banner",
+        "commands",
+    ]
+    assert sections["commands-banner"].kind == "banner"
+    assert sections["commands"].parent == "commands-banner"
+    assert sections["objectives"].parent == "1-objectives-principles"
+    assert sections["module_name"].parent is None
+
+    objectives = sections["objectives"]
+    assert raw[objectives.start : objectives.end] == b"objectives:\n  - Uno\n"
+    banner = sections["1-objectives-principles"]
+    assert raw[banner.start : banner.end].endswith(b'  - "Due"\n\n')
+    assert sections["commands"].end == len(raw)
+
+
+def test_markdown_index_nests_headings_and_skips_code_fences():
+    raw = (
+        "# Guida\nintro\n## Modalità\ntesto\n```\n# non titolo\n```\n# Altro\n".encode(
+            "utf-8"
+        )
+    )
+    sections = build_section_index(raw, ".md")
+
+    assert [span.key for span in sections] == ["guida", "modalita", "altro"]
+    assert sections[1].parent == "guida"
+    assert raw[sections[0].start : sections[0].end].startswith(b"# Guida")
+    assert sections[0].end == sections[2].start
+    assert sections[1].end == sections[2].start
+
+
+def test_slugify_transliterates_accents():
+    assert slugify("2) Router / Modalità") == "2-router-modalita"
+    assert slugify("!!!") == "section"
@@ -0,0 +1,162 @@
+import copy
+import json
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from tools import schema_validation
+from tools.schema_compiler import (
+    SchemaCompileError,
+    cached_validator,
+    compile_schema,
+    load_validator,
+)
+
+BUILDS_DIR = Path(__file__).resolve().parent.parent / "src" / "data" / "builds"
+
+
+def _build_payloads():
+    payloads = []
+    for path in sorted(BUILDS_DIR.glob("*.json")):
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(payload, dict) and "build_state" in payload:
+            payloads.append(payload)
+    return payloads
+
+
+def _broken_variants(payload):
+    """A few typical schema violations derived from a real build."""
+
+    missing = copy.deepcopy(payload)
+    missing.pop("build_state", None)
+    wrong_type = copy.deepcopy(payload)
+    wrong_type["build_state"] = "non un oggetto"
+    extra = copy.deepcopy(payload)
+    extra["campo_sconosciuto"] = 1
+    bad_step = copy.deepcopy(payload)
+    if isinstance(bad_step.get("build_state"), dict):
+        bad_step["build_state"]["step_total"] = 0
+    return [missing, wrong_type, extra, bad_step]
+
+
+@pytest.fixture
+def compiled_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(schema_validation, "COMPILED_VALIDATOR_DIR", tmp_path)
+    monkeypatch.setattr(schema_validation, "COMPILED_VALIDATORS_ENABLED", True)
+    monkeypatch.setattr(schema_validation, "_compiled_cache", {})
+    return tmp_path
+
+
+@pytest.mark.parametrize("schema_filename", sorted(schema_validation.COMPILED_SCHEMAS))
+def test_compiled_validator_agrees_with_jsonschema(schema_filename, compiled_cache):
+    compiled = schema_validation.get_compiled_validator(schema_filename)
+    validator = schema_validation.get_validator(schema_filename)
+    assert compiled is not None
+
+    for payload in _build_payloads():
+        for candidate in [payload, *_broken_variants(payload)]:
+            assert compiled(candidate) == validator.is_valid(candidate)
+
+
+def test_validate_with_schema_reports_identical_errors(
+    compiled_cache, monkeypatch, caplog
+):
+    caplog.set_level(logging.CRITICAL)
+    payloads = _build_payloads()
+    candidates = [
+        p for payload in payloads[:10] for p in [payload, *_broken_variants(payload)]
+    ]
+    schema_filename = schema_validation.BUILD_SCHEMA_MAP["extended"]
+
+    def messages():
+        return [
+            schema_validation.validate_with_schema(
+                schema_filename, candidate, "test", strict=False
+            )
+            for candidate in candidates
+        ]
+
+    monkeypatch.setattr(schema_validation, "COMPILED_VALIDATORS_ENABLED", False)
+    expected = messages()
+    monkeypatch.setattr(schema_validation, "COMPILED_VALIDATORS_ENABLED", True)
+    assert messages() == expected
+    assert any(message is None for message in expected)
+    assert any(message is not None for message in expected)
+
+
+def test_valid_payload_skips_jsonschema(compiled_cache, monkeypatch):
+    schema_filename = schema_validation.BUILD_SCHEMA_MAP["extended"]
+    valid = next(
+        payload
+        for payload in _build_payloads()
+        if schema_validation.get_validator(schema_filename).is_valid(payload)
+    )
+
+    def no_jsonschema(name):
+        raise AssertionError(f"jsonschema usato per {name}")
+
+    monkeypatch.setattr(schema_validation, "get_validator", no_jsonschema)
+    assert (
+        schema_validation.validate_with_schema(
+            schema_filename, valid, "test", strict=True
+        )
+        is None
+    )
+
+
+def test_cached_validator_is_keyed_by_schema_hash(tmp_path):
+    schema = {
+        "$id": "https://example.test/sample.schema.json",
+        "type": "object",
+        "required": ["nome"],
+        "properties": {"nome": {"$ref": "#/$defs/nome"}},
+        "$defs": {"nome": {"type": "string", "minLength": 1}},
+        "additionalProperties": False,
+    }
+    options = {"base_uri": "file:///sample.schema.json", "name": "sample.schema.json"}
+
+    first, built = cached_validator(schema, {}, cache_dir=tmp_path, **options)
+    assert built is True
+    again, built = cached_validator(schema, {}, cache_dir=tmp_path, **options)
+    assert built is False
+    assert first({"nome": "Valeros"}) and again({"nome": "Valeros"})
+    assert not again({"nome": ""}) and not again({"nome": "x", "altro": 1})
+
+    schema["$defs"]["nome"]["minLength"] = 3
+    changed, built = cached_validator(schema, {}, cache_dir=tmp_path, **options)
+    assert built is True
+    assert not changed({"nome": "Ez"})
+    assert len(list(tmp_path.glob("sample-*.py"))) == 2
+
+
+def test_unsupported_keyword_falls_back_to_jsonschema(compiled_cache, monkeypatch):
+    with pytest.raises(SchemaCompileError):
+        compile_schema(
+            {"type": "array", "prefixItems": [{"type": "string"}]},
+            {},
+            base_uri="file:///tuple.schema.json",
+        )
+
+    def uncompilable(*args, **kwargs):
+        raise SchemaCompileError("keyword non supportata")
+
+    monkeypatch.setattr(schema_validation, "cached_validator", uncompilable)
+    assert schema_validation.get_compiled_validator("build_core.schema.json") is None
+    with pytest.raises(Exception, match="required property"):
+        schema_validation.validate_with_schema(
+            "build_core.schema.json", {"mode": "core"}, "test", strict=True
+        )
+
+
+def test_enum_with_mixed_types_uses_strict_equality():
+    validate = load_validator(
+        compile_schema({"enum": [1, "a", None]}, {}, base_uri="file:///enum.json")
+    )
+
+    assert validate(1) and validate("a") and validate(None)
+    # jsonschema distingue True da 1: il filtro compilato non deve accettarlo
+    assert not validate(True)
@@ -0,0 +1,174 @@
+import os
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src import taverna_saves
+from src.taverna_saves import QuotaLedger
+
+
+def _write(path: Path, size: int, mtime_ns: int) -> Path:
+    path.write_bytes(b"x" * size)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+@pytest.fixture
+def clock():
+    current = {"now": 0.0}
+
+    def now():
+        return current["now"]
+
+    now.advance = lambda delta: current.update(now=current["now"] + delta)
+    return now
+
+
+def test_snapshot_counts_only_json_saves(tmp_path, clock):
+    _write(tmp_path / "NPC-1.json", 10, 3_000)
+    _write(tmp_path / "NPC-2.json", 5, 1_000)
+    (tmp_path / "README.md").write_text("docs")
+    (tmp_path / ".gitkeep").write_text("")
+
+    snapshot = QuotaLedger(tmp_path, ttl=5, clock=clock).snapshot()
+
+    assert (snapshot.file_count, snapshot.total_bytes) == (2, 15)
+    assert snapshot.oldest.name == "NPC-2.json"
+    assert snapshot.disk_total_bytes > 0
+
+
+def test_snapshot_within_ttl_does_not_touch_disk(tmp_path, clock, monkeypatch):
+    ledger = QuotaLedger(tmp_path, ttl=5, clock=clock)
+    ledger.snapshot()
+
+    calls = []
+    monkeypatch.setattr(
+        taverna_saves.shutil, "disk_usage", lambda path: calls.append(path)
+    )
+    _write(tmp_path / "NPC-1.json", 4, 1_000)
+
+    assert ledger.snapshot().file_count == 0
+    assert calls == []
+
+    monkeypatch.undo()
+    clock.advance(5)
+    assert ledger.snapshot().file_count == 1
+
+
+def test_rescan_skips_unchanged_directory(tmp_path, clock, monkeypatch):
+    _write(tmp_path / "NPC-1.json", 4, 1_000)
+    ledger = QuotaLedger(tmp_path, ttl=0, clock=clock)
+    ledger.snapshot()
+
+    monkeypatch.setattr(
+        QuotaLedger, "_scan", lambda self, mtime: pytest.fail("unexpected rescan")
+    )
+    assert ledger.snapshot().file_count == 1
+
+
+def test_record_forget_and_refresh_keep_oldest_heap_consistent(tmp_path, clock):
+    first = _write(tmp_path / "NPC-1.json", 1, 1_000)
+    second = _write(tmp_path / "NPC-2.json", 2, 2_000)
+    ledger = QuotaLedger(tmp_path, ttl=60, clock=clock)
+    assert ledger.snapshot().oldest.name == "NPC-1.json"
+
+    # rewriting the oldest save makes it the newest
+    _write(first, 3, 5_000)
+    ledger.record(first)
+    assert ledger.oldest().name == "NPC-2.json"
+    assert ledger.snapshot().total_bytes == 5
+
+    second.unlink()
+    ledger.refresh([second, tmp_path / "README.md"])
+    snapshot = ledger.snapshot()
+    assert (snapshot.file_count, snapshot.oldest.name) == (1, "NPC-1.json")
+
+    ledger.forget("NPC-1.json")
+    assert ledger.snapshot().oldest is None
+
+
+def test_missing_directory_raises(tmp_path, clock):
+    with pytest.raises(OSError):
+        QuotaLedger(tmp_path / "missing", clock=clock).snapshot()
+
+
+STAMP = datetime(2024, 5, 1, 12, 30)
+
+
+def test_save_auto_names_never_clobber(tmp_path, clock):
+    ledger = QuotaLedger(tmp_path, clock=clock)
+
+    first = ledger.save(b'{"a": 1}', max_files=10, timestamp=STAMP)
+    second = ledger.save(b'{"a": 2}', max_files=10, timestamp=STAMP)
+
+    assert (first.name, second.name) == (
+        "NPC-20240501-1230.json",
+        "NPC-20240501-1230-2.json",
+    )
+    assert (tmp_path / first.name).read_bytes() == b'{"a": 1}'
+    assert first.created and second.created
+    # no temp files left behind, and they never count as saves
+    assert {p.name for p in tmp_path.iterdir()} - {".lock"} == {
+        first.name,
+        second.name,
+    }
+
+
+def test_save_explicit_name_overwrites_atomically(tmp_path, clock):
+    ledger = QuotaLedger(tmp_path, clock=clock)
+
+    created = ledger.save(b"{}", max_files=10, name="Brenna.json")
+    replaced = ledger.save(b'{"hp": 12}', max_files=10, name="Brenna")
+
+    assert created.created and not replaced.created
+    assert replaced.name == "Brenna.json"
+    assert (tmp_path / "Brenna.json").read_bytes() == b'{"hp": 12}'
+    assert ledger.snapshot().file_count == 1
+
+    with pytest.raises(ValueError):
+        ledger.save(b"{}", max_files=10, name="../escape")
+
+
+def test_save_evicts_oldest_over_quota(tmp_path, clock):
+    for index in range(3):
+        _write(tmp_path / f"old-{index}.json", 1, (index + 1) * 1_000)
+    (tmp_path / "README.md").write_text("docs")
+    ledger = QuotaLedger(tmp_path, clock=clock)
+
+    result = ledger.save(b"{}", max_files=2, name="fresh")
+
+    assert result.evicted == ("old-0.json", "old-1.json")
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == [
+        "fresh.json",
+        "old-2.json",
+    ]
+    assert (tmp_path / "README.md").exists()
+    assert ledger.snapshot().file_count == 2
+
+
+def test_concurrent_saves_respect_quota(tmp_path):
+    ledgers = [QuotaLedger(tmp_path), QuotaLedger(tmp_path)]  # due "worker"
+    results = []
+
+    def save(ledger, index):
+        for attempt in range(10):
+            results.append(
+                ledger.save(b'{"i": %d}' % attempt, max_files=5, timestamp=STAMP)
+            )
+
+    threads = [
+        threading.Thread(target=save, args=(ledgers[i % 2], i)) for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 40
+    assert len(list(tmp_path.glob("*.json"))) == 5
+    assert sum(len(result.evicted) for result in results) == 35
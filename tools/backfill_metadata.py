@@ -12,12 +12,23 @@ import hashlib
 import json
 import os
 import re
+import sys
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Iterable, Mapping, MutableMapping, Sequence
 
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.blob_store import (  # noqa: E402
+    load_snapshot,
+    snapshot_blob_store,
+    write_snapshot,
+)
+
 
 def _json_load(path: Path) -> MutableMapping:
     with path.open("r", encoding="utf-8") as fh:
@@ -181,7 +192,8 @@ def backfill_builds(paths: Paths) -> None:
         source_path = paths.source_root / file_ref
         if not source_path.exists():
             continue
-        payload = _json_load(source_path)
+        # snapshot deduplicati (--dedup-blobs): si lavora sul payload completo
+        payload = load_snapshot(source_path)
 
         checkpoints = _build_checkpoints(entry, payload)
         payload["checkpoints"] = checkpoints
@@ -189,7 +201,7 @@ def backfill_builds(paths: Paths) -> None:
         payload["citation"] = _extract_citation(payload)
 
         out_path = paths.resolve_out(source_path)
-        _json_dump(out_path, payload)
+        write_snapshot(out_path, payload, snapshot_blob_store(out_path))
 
         entry["checkpoints"] = checkpoints
         entry["feat_plan"] = payload.get("feat_plan")
@@ -0,0 +1,121 @@
+"""Benchmark: throughput di ``require_api_key`` con molti client distinti.
+
+Simula un credential stuffing distribuito: ogni richiesta arriva da un client
+diverso con una API key errata, quindi ogni chiamata registra un fallimento nel
+tracker del backoff. Riporta richieste al secondo, client tracciati, evizioni
+LRU e picco di memoria allocata (tracemalloc, misurato in un secondo passaggio
+per non falsare il tempo). Il logging è disattivato durante la misura per
+isolare il costo del tracker.
+
+Esempio::
+
+    python tools/benchmark_auth_backoff.py --clients 100000
+    python tools/benchmark_auth_backoff.py --clients 100000 --max-clients 1000 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+for candidate in (ROOT, ROOT / "src"):
+    if str(candidate) not in sys.path:
+        sys.path.insert(0, str(candidate))
+
+from fastapi import HTTPException  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from src import app as app_module  # noqa: E402
+from src.auth_backoff import MemoryBackoffTracker  # noqa: E402
+
+
+def _requests(count: int) -> List[Request]:
+    return [
+        Request(
+            {
+                "type": "http",
+                "method": "GET",
+                "path": "/modules",
+                "headers": [(b"x-api-key", b"wrong")],
+                "client": (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 40000),
+            }
+        )
+        for i in range(count)
+    ]
+
+
+async def _drive(requests: List[Request]) -> None:
+    for request in requests:
+        try:
+            await app_module.require_api_key(request, x_api_key="wrong")
+        except HTTPException:
+            pass
+
+
+def _run_scenario(max_clients: int, requests: List[Request]) -> Dict[str, float]:
+    tracker = MemoryBackoffTracker(max_clients)
+    app_module._failed_attempts = tracker
+
+    started = perf_counter()
+    asyncio.run(_drive(requests))
+    elapsed = perf_counter() - started
+    tracked, evictions = len(tracker), tracker.evictions
+
+    tracker.clear()
+    tracemalloc.start()
+    asyncio.run(_drive(requests))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "max_clients": max_clients,
+        "rps": len(requests) / elapsed,
+        "tracked": tracked,
+        "evictions": evictions,
+        "peak_mib": peak / (1024 * 1024),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Misura require_api_key con molti client che sbagliano chiave."
+    )
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument(
+        "--max-clients",
+        type=int,
+        nargs="+",
+        default=[app_module.settings.auth_backoff_max_clients],
+        help="Valori di AUTH_BACKOFF_MAX_CLIENTS da confrontare",
+    )
+    args = parser.parse_args()
+
+    app_module.settings.api_key = "bench-key"
+    app_module.settings.allow_anonymous = False
+    logging.disable(logging.CRITICAL)
+    requests = _requests(args.clients)
+    original = app_module._failed_attempts
+
+    print(f"{'max':>8} {'req/s':>10} {'tracked':>8} {'evicted':>8} {'peak MiB':>9}")
+    try:
+        for max_clients in args.max_clients:
+            result = _run_scenario(max_clients, requests)
+            print(
+                f"{result['max_clients']:>8} {result['rps']:>10.0f}"
+                f" {result['tracked']:>8} {result['evictions']:>8}"
+                f" {result['peak_mib']:>9.2f}"
+            )
+    finally:
+        app_module._failed_attempts = original
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+"""Benchmark: latenza di /health sotto carico concorrente su /modules/{name}.
+
+Confronta l'esecuzione inline sull'event loop (``API_IO_WORKERS=0``, il
+comportamento precedente) con il pool di thread limitato usato dagli handler.
+La cache moduli e la memo degli stub sono disattivate per default, così ogni
+richiesta di carico paga davvero lettura da disco e validazione jsonschema.
+Con il page cache caldo le letture costano microsecondi: ``--simulated-io-ms``
+aggiunge una latenza fissa a ogni lettura modulo per riprodurre storage lento
+(disco freddo, volume di rete), il caso in cui l'event loop si blocca davvero.
+
+Esempio::
+
+    python tools/benchmark_event_loop.py --workers 0 8 --concurrency 32
+    python tools/benchmark_event_loop.py --workers 0 8 --simulated-io-ms 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+for candidate in (ROOT, ROOT / "src"):
+    if str(candidate) not in sys.path:
+        sys.path.insert(0, str(candidate))
+
+os.environ.setdefault("ALLOW_ANONYMOUS", "true")
+os.environ.setdefault("MODULE_CACHE_MAX_BYTES", "0")
+os.environ.setdefault("STUB_CACHE_MAX_ENTRIES", "0")
+os.environ.setdefault("MODULE_MANIFEST_WATCH", "off")
+
+import httpx  # noqa: E402
+
+from src import app as app_module  # noqa: E402
+
+DEFAULT_LOAD_PATHS = [
+    "/modules/Taverna_NPC.txt",
+    "/modules/minmax_builder.txt",
+    "/modules/adventurer_ledger.txt",
+    "/modules/minmax_builder.txt?stub=true&class=Wizard&level=5",
+]
+
+
+def _simulate_slow_storage(delay_ms: float) -> None:
+    cache = app_module._module_cache
+    read = type(cache).get
+
+    def slow_get(path: Path):
+        time.sleep(delay_ms / 1000)
+        return read(cache, path)
+
+    cache.get = slow_get
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _load_worker(
+    client: httpx.AsyncClient, paths: List[str], stop: asyncio.Event
+) -> int:
+    sent = 0
+    while not stop.is_set():
+        response = await client.get(paths[sent % len(paths)])
+        if response.status_code >= 500:
+            raise RuntimeError(f"{response.url}: HTTP {response.status_code}")
+        sent += 1
+    return sent
+
+
+async def _run_scenario(
+    workers: int, concurrency: int, health_samples: int, paths: List[str]
+) -> Dict[str, float]:
+    app_module._shutdown_blocking_executor()
+    app_module.settings.api_io_workers = workers
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await client.get("/health")
+        stop = asyncio.Event()
+        load = [
+            asyncio.create_task(_load_worker(client, paths, stop))
+            for _ in range(concurrency)
+        ]
+        latencies: List[float] = []
+        started = perf_counter()
+        try:
+            for _ in range(health_samples):
+                begin = perf_counter()
+                response = await client.get("/health")
+                latencies.append((perf_counter() - begin) * 1000)
+                response.raise_for_status()
+                await asyncio.sleep(0.005)
+        finally:
+            stop.set()
+            sent = sum(await asyncio.gather(*load))
+        elapsed = perf_counter() - started
+
+    app_module._shutdown_blocking_executor()
+    return {
+        "workers": workers,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": _percentile(latencies, 99),
+        "max_ms": max(latencies),
+        "load_rps": sent / elapsed,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Misura la latenza di /health con /modules sotto carico."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[0, 8],
+        help="Valori di API_IO_WORKERS da confrontare (0 = inline sull'event loop)",
+    )
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--health-samples", type=int, default=300)
+    parser.add_argument(
+        "--simulated-io-ms",
+        type=float,
+        default=0.0,
+        help="Latenza aggiunta a ogni lettura modulo (storage lento simulato)",
+    )
+    parser.add_argument(
+        "--path",
+        action="append",
+        dest="paths",
+        help="Percorso di carico (ripetibile); default: moduli grandi + stub",
+    )
+    args = parser.parse_args()
+
+    paths = args.paths or DEFAULT_LOAD_PATHS
+    if args.simulated_io_ms > 0:
+        _simulate_slow_storage(args.simulated_io_ms)
+    print(f"{'workers':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'load rps':>9}")
+    for workers in args.workers:
+        result = asyncio.run(
+            _run_scenario(workers, args.concurrency, args.health_samples, paths)
+        )
+        print(
+            f"{result['workers']:>8} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}"
+            f" {result['max_ms']:>9.2f} {result['load_rps']:>9.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,147 @@
+"""Benchmark: tempo di avvio a freddo del processo API.
+
+Ogni run è un interprete nuovo che importa ``src.app`` con ``-X importtime``
+ed esegue il lifespan di FastAPI (startup + shutdown), senza servire
+richieste. Riporta la mediana di:
+
+- ``import``: tempo cumulativo di ``import src.app`` misurato da importtime;
+- ``startup``: durata del lifespan fino al primo yield (directory, manifest,
+  indice di ricerca, watcher);
+- ``process``: wall clock dell'intero processo, interprete incluso;
+- ``rss``: picco di memoria residente del processo.
+
+Elenca poi i moduli con il costo cumulativo più alto ed esce con codice 1 se
+la mediana di ``import`` supera ``--budget-ms`` o se ``src.app`` ha caricato
+uno dei moduli pesanti che l'API non deve importare (``HEAVY_MODULES``).
+
+Esempio::
+
+    python tools/benchmark_import_time.py --runs 5
+    python tools/benchmark_import_time.py --runs 5 --budget-ms 600 --top 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Obiettivo di cold start di ``import src.app`` (mediana, ms) su un host di CI.
+API_IMPORT_BUDGET_MS = 600
+# Moduli dell'harvester e dipendenze opzionali caricati solo su richiesta.
+HEAVY_MODULES = (
+    "tools.generate_build_db",
+    "httpx",
+    "jinja2",
+    "jsonschema",
+    "pypdf",
+)
+
+_PROBE = """
+import asyncio, json, resource, sys
+from time import perf_counter
+import src.app as app_module
+
+async def lifespan():
+    started = perf_counter()
+    async with app_module.app.router.lifespan_context(app_module.app):
+        ready = perf_counter()
+    return ready - started
+
+startup = asyncio.run(lifespan())
+heavy = [name for name in {heavy!r} if name in sys.modules]
+rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"startup_s": startup, "heavy": heavy, "rss_kib": rss_kib}}))
+"""
+
+ImportTimes = Dict[str, Tuple[int, int]]
+
+
+def parse_importtime(stderr: str) -> ImportTimes:
+    """Map each module to ``(self_us, cumulative_us)`` from ``-X importtime``."""
+
+    times: ImportTimes = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # riga di intestazione
+        times[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return times
+
+
+def measure_cold_start() -> Dict[str, object]:
+    env = {**os.environ, "MODULE_MANIFEST_WATCH": "off"}
+    started = perf_counter()
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            _PROBE.format(heavy=HEAVY_MODULES),
+        ],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    process_s = perf_counter() - started
+    probe = json.loads(completed.stdout.strip().splitlines()[-1])
+    times = parse_importtime(completed.stderr)
+    return {
+        "import_ms": times["src.app"][1] / 1000,
+        "startup_ms": probe["startup_s"] * 1000,
+        "process_ms": process_s * 1000,
+        "rss_mib": probe["rss_kib"] / 1024,
+        "heavy": probe["heavy"],
+        "times": times,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Misura import e avvio a freddo dell'API in processi nuovi."
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=API_IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs: List[Dict[str, object]] = [measure_cold_start() for _ in range(args.runs)]
+
+    def median(key: str) -> float:
+        return statistics.median(float(run[key]) for run in runs)
+
+    import_ms = median("import_ms")
+    print(
+        f"import {import_ms:.0f} ms | startup {median('startup_ms'):.0f} ms"
+        f" | process {median('process_ms'):.0f} ms | rss {median('rss_mib'):.1f} MiB"
+        f" (mediana di {len(runs)} run, budget import {args.budget_ms:.0f} ms)"
+    )
+
+    last: ImportTimes = runs[-1]["times"]  # type: ignore[assignment]
+    top_level = [name for name in last if "." not in name]
+    print(f"\n{'cumul ms':>9} {'self ms':>8}  modulo (primo livello)")
+    for name in sorted(top_level, key=lambda n: last[n][1], reverse=True)[: args.top]:
+        self_us, cumulative_us = last[name]
+        print(f"{cumulative_us / 1000:>9.1f} {self_us / 1000:>8.1f}  {name}")
+
+    heavy = sorted({name for run in runs for name in run["heavy"]})
+    if heavy:
+        print(f"\nModuli pesanti importati da src.app: {', '.join(heavy)}")
+    return 1 if heavy or import_ms > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
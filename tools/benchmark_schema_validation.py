@@ -0,0 +1,155 @@
+"""Benchmark: validazioni al secondo con e senza validatori compilati.
+
+Valida ogni build di ``src/data/builds`` contro ``build_core``,
+``build_extended`` e ``build_full_pg`` con :func:`validate_with_schema`, una
+volta solo con jsonschema (``SCHEMA_COMPILED_VALIDATORS=false``) e una con il
+validatore compilato davanti. Il corpus contiene sia build valide sia build
+che violano lo schema: le colonne ``ok`` misurano il percorso felice, le
+colonne ``ko`` quello con errori (dove il validatore compilato delega a
+jsonschema). Per ogni payload i messaggi d'errore dei due percorsi devono
+coincidere, altrimenti lo script esce con codice 1.
+
+Riporta anche il costo una tantum del validatore compilato: generazione del
+sorgente (cache vuota) e caricamento dal file in cache, che con il bytecode in
+``__pycache__`` evita anche la compilazione del sorgente.
+
+Esempio::
+
+    python tools/benchmark_schema_validation.py
+    python tools/benchmark_schema_validation.py --rounds 20 --builds-dir src/data/builds
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, List, Mapping
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools import schema_validation  # noqa: E402
+from tools.blob_store import load_snapshot  # noqa: E402
+from tools.schema_compiler import cached_validator  # noqa: E402
+
+DEFAULT_BUILDS_DIR = ROOT / "src" / "data" / "builds"
+
+
+def load_payloads(builds_dir: Path) -> List[Mapping]:
+    payloads = []
+    for path in sorted(builds_dir.glob("*.json")):
+        payload = load_snapshot(path)
+        if isinstance(payload, Mapping) and "build_state" in payload:
+            payloads.append(payload)
+    return payloads
+
+
+def validations_per_second(
+    schema_filename: str, payloads: List[Mapping], rounds: int, *, compiled: bool
+) -> float | None:
+    if not payloads:
+        return None
+    schema_validation.COMPILED_VALIDATORS_ENABLED = compiled
+    # riscaldamento: import di jsonschema, schema store e compilazione fuori misura
+    schema_validation.validate_with_schema(
+        schema_filename, payloads[0], "benchmark", strict=False
+    )
+    started = perf_counter()
+    for _ in range(rounds):
+        for payload in payloads:
+            schema_validation.validate_with_schema(
+                schema_filename, payload, "benchmark", strict=False
+            )
+    return rounds * len(payloads) / (perf_counter() - started)
+
+
+def error_messages(
+    schema_filename: str, payloads: List[Mapping], *, compiled: bool
+) -> List[str | None]:
+    schema_validation.COMPILED_VALIDATORS_ENABLED = compiled
+    return [
+        schema_validation.validate_with_schema(
+            schema_filename, payload, "benchmark", strict=False
+        )
+        for payload in payloads
+    ]
+
+
+def measure_compile(schema_filename: str) -> Dict[str, float]:
+    schema_validation._bootstrap_schema_store()
+    path = schema_validation.SCHEMAS_DIR / schema_filename
+    schema = json.loads(path.read_text(encoding="utf-8"))
+    timings = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ("compile", "load"):
+            started = perf_counter()
+            cached_validator(
+                schema,
+                schema_validation._schema_store,
+                base_uri=path.resolve().as_uri(),
+                name=schema_filename,
+                cache_dir=Path(cache_dir),
+            )
+            timings[label] = (perf_counter() - started) * 1000
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Confronta jsonschema e validatori compilati sugli schemi di build."
+    )
+    parser.add_argument("--builds-dir", type=Path, default=DEFAULT_BUILDS_DIR)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    # i payload non validi loggano un warning ciascuno
+    logging.disable(logging.CRITICAL)
+
+    payloads = load_payloads(args.builds_dir)
+    if not payloads:
+        print(f"Nessuna build in {args.builds_dir}")
+        return 2
+
+    print(
+        f"{'schema':<28} {'validi':>7} {'ok jsonschema/s':>16} {'ok compilato/s':>15}"
+        f" {'ko jsonschema/s':>16} {'ko compilato/s':>15}"
+        f" {'compile ms':>11} {'load ms':>8}"
+    )
+    mismatches = 0
+    for schema_filename in schema_validation.BUILD_SCHEMA_MAP.values():
+        expected = error_messages(schema_filename, payloads, compiled=False)
+        actual = error_messages(schema_filename, payloads, compiled=True)
+        mismatches += sum(1 for pair in zip(expected, actual) if pair[0] != pair[1])
+
+        valid = [p for p, message in zip(payloads, expected) if message is None]
+        invalid = [p for p, message in zip(payloads, expected) if message is not None]
+        rates = [
+            validations_per_second(
+                schema_filename, subset, args.rounds, compiled=compiled
+            )
+            for subset in (valid, invalid)
+            for compiled in (False, True)
+        ]
+        timings = measure_compile(schema_filename)
+        print(
+            f"{schema_filename:<28} {len(valid):>3}/{len(payloads):<3}"
+            + "".join(
+                f" {'-' if rate is None else f'{rate:.0f}':>{width}}"
+                for rate, width in zip(rates, (16, 15, 16, 15))
+            )
+            + f" {timings['compile']:>11.1f} {timings['load']:>8.1f}"
+        )
+
+    if mismatches:
+        print(f"\n{mismatches} payload con messaggi d'errore diversi tra i percorsi")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
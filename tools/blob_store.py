@@ -0,0 +1,301 @@
+"""Archivio content-addressed dei sotto-documenti degli snapshot di build.
+
+Gli snapshot di ``src/data/builds`` ripetono interi sotto-alberi identici
+(``catalog_manifest``, ``build_state.step_labels``, i blocchi ``ledger``,
+``step_audit`` e la loro copia in ``composite``...). Con un :class:`BlobStore`
+ogni sotto-albero di almeno ``BLOB_MIN_BYTES`` byte viene scritto una sola
+volta in ``<cartella snapshot>/.blobs/<aa>/<sha256>`` e nello snapshot resta un
+riferimento ``{"$blob": "sha256:<digest>"}``. La deduplica procede dalle foglie
+verso la radice, quindi anche un blob può riferirne altri.
+
+:func:`load_snapshot` rilegge uno snapshot sostituendo i riferimenti con il
+contenuto originale: i loader che la usano vedono sempre il payload completo,
+deduplicato o no.
+
+Esempio::
+
+    python tools/blob_store.py report --builds-dir src/data/builds
+    python tools/blob_store.py pack --builds-dir /tmp/builds_copy
+    python tools/blob_store.py unpack --builds-dir /tmp/builds_copy
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Iterator, Mapping, Sequence
+
+BLOB_DIRNAME = ".blobs"
+BLOB_REF_KEY = "$blob"
+BLOB_DIGEST_PREFIX = "sha256:"
+# blob più piccoli risparmiano byte logici ma occupano comunque un blocco
+# intero su disco: 2 KiB è il minimo di spazio allocato sulla matrice attuale
+BLOB_MIN_BYTES = int(os.environ.get("BUILD_BLOB_MIN_BYTES", "2048"))
+
+
+def dump_snapshot(payload: Any) -> str:
+    # stesso formato di generate_build_db.write_json
+    return json.dumps(payload, indent=2, ensure_ascii=False)
+
+
+def _dump_blob(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def blob_ref(digest: str) -> dict[str, str]:
+    return {BLOB_REF_KEY: f"{BLOB_DIGEST_PREFIX}{digest}"}
+
+
+def _ref_digest(value: Any) -> str | None:
+    if isinstance(value, Mapping) and len(value) == 1:
+        target = value.get(BLOB_REF_KEY)
+        if isinstance(target, str) and target.startswith(BLOB_DIGEST_PREFIX):
+            return target[len(BLOB_DIGEST_PREFIX) :]
+    return None
+
+
+def has_blob_refs(text: str | bytes) -> bool:
+    """Cheap pre-check on the raw JSON before walking the decoded payload."""
+
+    marker = f'"{BLOB_REF_KEY}"'
+    return (marker.encode("utf-8") if isinstance(text, bytes) else marker) in text
+
+
+def iter_blob_refs(value: Any) -> Iterator[str]:
+    """Digests referenced directly by ``value`` (not those nested in blobs)."""
+
+    digest = _ref_digest(value)
+    if digest is not None:
+        yield digest
+    elif isinstance(value, Mapping):
+        for item in value.values():
+            yield from iter_blob_refs(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_blob_refs(item)
+
+
+def rehydrate(value: Any, fetch: Callable[[str], bytes]) -> Any:
+    """Replace every blob reference in ``value`` with the content returned by ``fetch``."""
+
+    fetched: dict[str, bytes] = {}
+
+    def _walk(node: Any) -> Any:
+        digest = _ref_digest(node)
+        if digest is not None:
+            if digest not in fetched:
+                fetched[digest] = fetch(digest)
+            # decodifica a ogni uso: lo stesso blob può comparire più volte
+            # nello snapshot e le copie devono restare indipendenti
+            return _walk(json.loads(fetched[digest]))
+        if isinstance(node, Mapping):
+            return {key: _walk(item) for key, item in node.items()}
+        if isinstance(node, list):
+            return [_walk(item) for item in node]
+        return node
+
+    return _walk(value)
+
+
+def blob_closure(value: Any, fetch: Callable[[str], bytes]) -> dict[str, bytes]:
+    """Every blob reachable from ``value``, keyed by digest."""
+
+    closure: dict[str, bytes] = {}
+    pending = list(iter_blob_refs(value))
+    while pending:
+        digest = pending.pop()
+        if digest in closure:
+            continue
+        closure[digest] = fetch(digest)
+        pending.extend(iter_blob_refs(json.loads(closure[digest])))
+    return closure
+
+
+class BlobStore:
+    """Write-once store of JSON sub-documents addressed by their SHA-256."""
+
+    def __init__(self, root: Path, *, min_bytes: int | None = None) -> None:
+        self.root = root
+        self.min_bytes = BLOB_MIN_BYTES if min_bytes is None else min_bytes
+        self.written = 0
+        self.reused = 0
+
+    @classmethod
+    def for_snapshot(cls, path: Path, **kwargs: Any) -> "BlobStore":
+        return cls(path.parent / BLOB_DIRNAME, **kwargs)
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def put(self, content: bytes) -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path_for(digest)
+        if path.exists():
+            self.reused += 1
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{digest[:8]}-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(content)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        self.written += 1
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return self.path_for(digest).read_bytes()
+
+    def dedup(self, payload: Any) -> Any:
+        """Copy of ``payload`` with large sub-trees moved to the store."""
+
+        def _walk(node: Any, depth: int) -> Any:
+            if isinstance(node, Mapping):
+                node = {key: _walk(item, depth + 1) for key, item in node.items()}
+            elif isinstance(node, list):
+                node = [_walk(item, depth + 1) for item in node]
+            else:
+                return node
+            if depth == 0:
+                return node
+            content = _dump_blob(node)
+            if len(content) < self.min_bytes:
+                return node
+            return blob_ref(self.put(content))
+
+        return _walk(payload, 0)
+
+    def rehydrate(self, value: Any) -> Any:
+        return rehydrate(value, self.get)
+
+    def closure(self, value: Any) -> dict[str, bytes]:
+        return blob_closure(value, self.get)
+
+
+def snapshot_blob_store(path: Path) -> BlobStore | None:
+    """The store next to ``path`` if its directory has already been deduplicated."""
+
+    store = BlobStore.for_snapshot(path)
+    return store if store.root.is_dir() else None
+
+
+def load_snapshot(path: Path) -> Any:
+    """Read a build snapshot, resolving blob references next to it."""
+
+    text = path.read_text(encoding="utf-8")
+    payload = json.loads(text)
+    if has_blob_refs(text):
+        payload = BlobStore.for_snapshot(path).rehydrate(payload)
+    return payload
+
+
+def write_snapshot(path: Path, payload: Any, store: BlobStore | None = None) -> None:
+    """Write a snapshot, deduplicated into ``store`` when one is given."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if store is not None:
+        payload = store.dedup(payload)
+    path.write_text(dump_snapshot(payload), encoding="utf-8")
+
+
+def _snapshot_paths(builds_dir: Path) -> list[Path]:
+    return sorted(builds_dir.glob("*.json"))
+
+
+def pack_directory(builds_dir: Path, *, min_bytes: int | None = None) -> int:
+    store = BlobStore(builds_dir / BLOB_DIRNAME, min_bytes=min_bytes)
+    packed = 0
+    for path in _snapshot_paths(builds_dir):
+        write_snapshot(path, load_snapshot(path), store)
+        packed += 1
+    return packed
+
+
+def unpack_directory(builds_dir: Path) -> int:
+    unpacked = 0
+    for path in _snapshot_paths(builds_dir):
+        write_snapshot(path, load_snapshot(path))
+        unpacked += 1
+    shutil.rmtree(builds_dir / BLOB_DIRNAME, ignore_errors=True)
+    return unpacked
+
+
+def _allocated(path: Path) -> int:
+    # byte effettivamente occupati su disco (blocchi), non la lunghezza logica
+    return getattr(path.stat(), "st_blocks", 0) * 512 or path.stat().st_size
+
+
+def disk_usage_report(builds_dir: Path) -> dict[str, Any]:
+    """Disk usage of ``builds_dir`` compared with the fully expanded snapshots."""
+
+    store = BlobStore(builds_dir / BLOB_DIRNAME)
+    snapshots = _snapshot_paths(builds_dir)
+    referenced: set[str] = set()
+    expanded_bytes = 0
+    for path in snapshots:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+        referenced.update(store.closure(raw))
+        expanded_bytes += len(dump_snapshot(store.rehydrate(raw)).encode("utf-8"))
+    blobs = [path for path in store.root.glob("*/*") if path.is_file()]
+    snapshot_bytes = sum(path.stat().st_size for path in snapshots)
+    blob_bytes = sum(path.stat().st_size for path in blobs)
+    stored_bytes = snapshot_bytes + blob_bytes
+    return {
+        "builds_dir": str(builds_dir),
+        "snapshots": len(snapshots),
+        "blobs": len(blobs),
+        "orphan_blobs": len({path.name for path in blobs} - referenced),
+        "expanded_bytes": expanded_bytes,
+        "snapshot_bytes": snapshot_bytes,
+        "blob_bytes": blob_bytes,
+        "stored_bytes": stored_bytes,
+        "saved_bytes": expanded_bytes - stored_bytes,
+        "saved_ratio": (
+            round(1 - stored_bytes / expanded_bytes, 4) if expanded_bytes else 0.0
+        ),
+        "allocated_bytes": sum(_allocated(path) for path in [*snapshots, *blobs]),
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Deduplica gli snapshot di build in un archivio content-addressed."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("pack", "Sposta i sotto-alberi condivisi degli snapshot in .blobs"),
+        ("unpack", "Riscrive gli snapshot completi ed elimina .blobs"),
+        ("report", "Stampa come JSON lo spazio risparmiato dalla deduplica"),
+    ):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument("--builds-dir", type=Path, required=True)
+    subparsers.choices["pack"].add_argument(
+        "--min-bytes", type=int, default=BLOB_MIN_BYTES
+    )
+    subparsers.choices["report"].add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        packed = pack_directory(args.builds_dir, min_bytes=args.min_bytes)
+        print(f"Deduplicati {packed} snapshot in {args.builds_dir / BLOB_DIRNAME}")
+    elif args.command == "unpack":
+        unpacked = unpack_directory(args.builds_dir)
+        print(f"Ripristinati {unpacked} snapshot completi in {args.builds_dir}")
+    else:
+        report = json.dumps(disk_usage_report(args.builds_dir), indent=2)
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            args.output.write_text(report, encoding="utf-8")
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,59 @@
+"""Genera offline gli indici delle pagine dei PDF di ``/knowledge``.
+
+Estrae numero di pagine, outline e testo per pagina di ogni PDF nella
+directory dati e li scrive come sidecar in ``KNOWLEDGE_INDEX_DIR``, così
+``GET /knowledge/{name}/pages/{n}`` non deve mai analizzare un PDF. Gli indici
+già aggiornati (stesso sha256 del PDF) vengono lasciati intatti. Richiede il
+pacchetto ``pypdf``.
+
+Esempio::
+
+    python tools/build_knowledge_index.py
+    python tools/build_knowledge_index.py --index-dir /srv/master_dd/knowledge_index
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.config import DATA_DIR, settings  # noqa: E402
+from src.knowledge_index import (  # noqa: E402
+    KnowledgeIndexUnavailable,
+    ensure_indexes,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Indicizza per pagina i PDF serviti da /knowledge."
+    )
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument(
+        "--index-dir",
+        type=Path,
+        default=settings.knowledge_index_dir,
+        help="Directory dei sidecar (default: KNOWLEDGE_INDEX_DIR)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+    try:
+        outcomes = ensure_indexes(args.data_dir, args.index_dir)
+    except KnowledgeIndexUnavailable as exc:
+        logging.error("%s", exc)
+        return 2
+    for name, outcome in outcomes.items():
+        print(f"{outcome:>6}  {name}")
+    return 1 if "error" in outcomes.values() else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
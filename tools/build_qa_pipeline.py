@@ -17,6 +17,7 @@ from __future__ import annotations
 import argparse
 import json
 import logging
+import sys
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
@@ -24,6 +25,13 @@ from typing import Any, Iterable, Mapping
 
 import httpx
 
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.blob_store import load_snapshot  # noqa: E402
+from tools.build_store import BuildStore  # noqa: E402
+
 DEFAULT_INDEX_PATH = Path("src/data/build_index.json")
 DEFAULT_REPORT_PATH = Path("reports/build_qa_report.json")
 
@@ -608,6 +616,14 @@ def parse_args() -> argparse.Namespace:
         type=int,
         help="Checkpoint di livello da includere",
     )
+    parser.add_argument(
+        "--build-db",
+        type=Path,
+        help=(
+            "Archivio SQLite di tools/build_store.py: filtri e payload letti con "
+            "query indicizzate invece che da --index-path e dai file JSON"
+        ),
+    )
     parser.add_argument(
         "--max-items",
         type=int,
@@ -657,8 +673,7 @@ def filter_entries(
 
 
 def load_payload(payload_path: Path) -> Mapping[str, Any]:
-    with payload_path.open("r", encoding="utf-8") as fh:
-        return json.load(fh)
+    return load_snapshot(payload_path)
 
 
 def write_report(report: Mapping[str, Any], report_path: Path) -> None:
@@ -671,16 +686,29 @@ def main() -> None:
     args = parse_args()
     logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 
-    index = load_index(args.index_path)
-    entries = index.get("entries", [])
-
-    filtered_entries = filter_entries(
-        entries=entries,
-        classes=args.filter_classes,
-        levels=args.filter_levels,
-        max_items=args.max_items,
-        offset=args.offset,
-    )
+    stored_payloads: dict[str, Mapping[str, Any] | None] = {}
+    if args.build_db:
+        with BuildStore(args.build_db) as store:
+            filtered_entries = store.entries(
+                classes=args.filter_classes,
+                levels=args.filter_levels,
+                limit=args.max_items,
+                offset=args.offset,
+            )
+            for entry in filtered_entries:
+                if entry.get("file"):
+                    stored_payloads[str(entry["file"])] = store.load_payload(
+                        str(entry["file"])
+                    )
+    else:
+        index = load_index(args.index_path)
+        filtered_entries = filter_entries(
+            entries=index.get("entries", []),
+            classes=args.filter_classes,
+            levels=args.filter_levels,
+            max_items=args.max_items,
+            offset=args.offset,
+        )
 
     headers: dict[str, str] = {}
     if args.api_key:
@@ -703,7 +731,9 @@ def main() -> None:
         for entry in filtered_entries:
             payload_path = Path(entry.get("file", ""))
             try:
-                payload = load_payload(payload_path)
+                payload = stored_payloads.get(str(payload_path)) or load_payload(
+                    payload_path
+                )
             except FileNotFoundError:
                 logging.error("Payload mancante: %s", payload_path)
                 missing = BuildReportEntry(
@@ -0,0 +1,377 @@
+"""Archivio SQLite opzionale del database delle build.
+
+Affianca ``build_index.json`` e i file di ``src/data/builds``: ogni entry
+dell'indice diventa una riga con colonne normalizzate e indicizzate (classe,
+razza, archetipo, livello, modalità, stato, meta tier, ruling badge, versione
+del catalogo), mentre i payload sono salvati byte per byte come blob. I tool
+che filtrano il database possono così interrogare solo le righe che servono
+invece di rileggere ogni JSON.
+
+L'archivio non sostituisce il layout JSON: :meth:`BuildStore.export` rigenera
+``build_index.json`` e i payload identici bit per bit a quelli scritti
+dall'harvester. Per gli snapshot deduplicati con ``tools/blob_store.py`` anche
+i blob referenziati vengono copiati nell'archivio ed esportati in ``.blobs``.
+
+Esempio::
+
+    python tools/build_store.py import --db src/data/builds.sqlite3
+    python tools/build_store.py query --db src/data/builds.sqlite3 --class Alchemist --level 5
+    python tools/build_store.py export --db src/data/builds.sqlite3 --root /tmp/export
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Sequence
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.blob_store import (  # noqa: E402
+    BlobStore,
+    blob_closure,
+    has_blob_refs,
+    rehydrate,
+)
+
+DEFAULT_INDEX_PATH = Path("src/data/build_index.json")
+BUILD_STORE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+# colonna -> chiave dell'entry dell'indice da cui viene valorizzata
+INDEXED_COLUMNS = {
+    "class": "class",
+    "race": "race",
+    "archetype": "archetype",
+    "level": "level",
+    "mode": "mode_normalized",
+    "status": "status",
+    "meta_tier": "meta_tier",
+    "ruling_badge": "ruling_badge",
+    "catalog_version": "catalog_version",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS index_header (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    header TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS builds (
+    position INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    file TEXT,
+    class TEXT COLLATE NOCASE,
+    race TEXT COLLATE NOCASE,
+    archetype TEXT COLLATE NOCASE,
+    level INTEGER,
+    mode TEXT,
+    status TEXT,
+    meta_tier TEXT,
+    ruling_badge TEXT,
+    catalog_version TEXT,
+    entry TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS payloads (
+    file TEXT PRIMARY KEY,
+    content BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    content BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS builds_class_level ON builds (class, level);
+CREATE INDEX IF NOT EXISTS builds_race_archetype ON builds (race, archetype);
+CREATE INDEX IF NOT EXISTS builds_level ON builds (level);
+CREATE INDEX IF NOT EXISTS builds_mode ON builds (mode);
+CREATE INDEX IF NOT EXISTS builds_status ON builds (status);
+CREATE INDEX IF NOT EXISTS builds_meta_tier ON builds (meta_tier);
+CREATE INDEX IF NOT EXISTS builds_ruling_badge ON builds (ruling_badge);
+CREATE INDEX IF NOT EXISTS builds_catalog_version ON builds (catalog_version);
+CREATE INDEX IF NOT EXISTS builds_key ON builds (key);
+CREATE INDEX IF NOT EXISTS builds_file ON builds (file);
+"""
+
+
+def is_build_store(path: Path | None) -> bool:
+    return path is not None and path.suffix in BUILD_STORE_SUFFIXES
+
+
+def _dump_index(index_payload: Mapping) -> bytes:
+    # stesso formato di generate_build_db.write_json
+    return json.dumps(index_payload, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def _column_value(value: object) -> object:
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        # es. catalog_version: ["2026.04.03"]
+        return ",".join(str(item) for item in value)
+    if isinstance(value, Mapping):
+        for key in ("badge", "label", "value"):
+            if isinstance(value.get(key), str):
+                return value[key]
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _entry_key(entry: Mapping) -> str:
+    # stessa chiave con cui run_harvest fonde le entry dell'indice
+    return str(
+        entry.get("file") or f"{entry.get('output_prefix')}@{entry.get('level')}"
+    )
+
+
+class BuildStore:
+    """SQLite mirror of ``build_index.json`` plus the snapshot payloads."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path))
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> "BuildStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def put_payload(
+        self, file: str, content: bytes, blobs: Mapping[str, bytes] | None = None
+    ) -> None:
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO payloads (file, content) VALUES (?, ?)"
+                " ON CONFLICT (file) DO UPDATE SET content = excluded.content",
+                (file, content),
+            )
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO blobs (digest, content) VALUES (?, ?)",
+                (blobs or {}).items(),
+            )
+
+    def put_snapshot(self, file: str, path: Path) -> None:
+        """Store the snapshot at ``path`` and the blobs it references."""
+
+        content = path.read_bytes()
+        blobs = None
+        if has_blob_refs(content):
+            blobs = BlobStore.for_snapshot(path).closure(json.loads(content))
+        self.put_payload(file, content, blobs)
+
+    def write_index(self, index_payload: Mapping) -> None:
+        """Replace header and entries with those of ``index_payload``."""
+
+        entries = list(index_payload.get("entries") or [])
+        header = {
+            key: (None if key == "entries" else value)
+            for key, value in index_payload.items()
+        }
+        rows = []
+        for position, entry in enumerate(entries):
+            rows.append(
+                (
+                    position,
+                    _entry_key(entry),
+                    entry.get("file"),
+                    *(
+                        _column_value(entry.get(source))
+                        for source in INDEXED_COLUMNS.values()
+                    ),
+                    json.dumps(entry, ensure_ascii=False),
+                )
+            )
+        columns = ", ".join(INDEXED_COLUMNS)
+        placeholders = ", ".join("?" for _ in range(len(INDEXED_COLUMNS) + 4))
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO index_header (id, header) VALUES (1, ?)"
+                " ON CONFLICT (id) DO UPDATE SET header = excluded.header",
+                (json.dumps(header, ensure_ascii=False),),
+            )
+            self._connection.execute("DELETE FROM builds")
+            self._connection.executemany(
+                f"INSERT INTO builds (position, key, file, {columns}, entry)"
+                f" VALUES ({placeholders})",
+                rows,
+            )
+
+    def entries(
+        self,
+        *,
+        classes: Iterable[str] | None = None,
+        levels: Iterable[int] | None = None,
+        limit: int | None = None,
+        offset: int = 0,
+        **filters: object,
+    ) -> list[dict[str, Any]]:
+        """Index entries matching the filters, in index order.
+
+        ``classes`` and ``levels`` accept several values (class names are
+        case-insensitive); ``filters`` maps any other column of
+        ``INDEXED_COLUMNS`` (``status``, ``meta_tier``, ...) to one value.
+        """
+
+        clauses: list[str] = []
+        params: list[object] = []
+        for column, values in (("class", classes), ("level", levels)):
+            values = list(values or [])
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+        for column, value in filters.items():
+            if column not in INDEXED_COLUMNS:
+                raise ValueError(f"Colonna non indicizzata: {column}")
+            clauses.append(f"{column} = ?")
+            params.append(_column_value(value))
+        query = "SELECT entry FROM builds"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY position LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None or limit < 0 else limit, max(0, offset)])
+        return [
+            json.loads(entry)
+            for (entry,) in self._connection.execute(query, params).fetchall()
+        ]
+
+    def index_payload(self) -> dict[str, Any]:
+        """The ``build_index.json`` document, entries included."""
+
+        row = self._connection.execute(
+            "SELECT header FROM index_header WHERE id = 1"
+        ).fetchone()
+        index_payload = json.loads(row[0]) if row else {"entries": None}
+        index_payload["entries"] = self.entries()
+        return index_payload
+
+    def payload_bytes(self, file: str) -> bytes | None:
+        row = self._connection.execute(
+            "SELECT content FROM payloads WHERE file = ?", (file,)
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def blob_bytes(self, digest: str) -> bytes:
+        row = self._connection.execute(
+            "SELECT content FROM blobs WHERE digest = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Blob mancante nell'archivio: {digest}")
+        return bytes(row[0])
+
+    def load_payload(self, file: str) -> Mapping[str, Any] | None:
+        content = self.payload_bytes(file)
+        if content is None:
+            return None
+        payload = json.loads(content)
+        if has_blob_refs(content):
+            payload = rehydrate(payload, self.blob_bytes)
+        return payload
+
+    def import_index(self, index_path: Path, root: Path = Path(".")) -> int:
+        """Load a JSON index and the payloads it references; return payloads read."""
+
+        index_payload = json.loads(index_path.read_text(encoding="utf-8"))
+        self.write_index(index_payload)
+        imported = 0
+        for entry in index_payload.get("entries") or []:
+            file = entry.get("file")
+            source = root / str(file) if file else None
+            if source is not None and source.is_file():
+                self.put_snapshot(str(file), source)
+                imported += 1
+        return imported
+
+    def export(self, index_path: Path, root: Path) -> int:
+        """Write the JSON index and every stored payload under ``root``."""
+
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index_path.write_bytes(_dump_index(self.index_payload()))
+        exported = 0
+        for file, content in self._connection.execute(
+            "SELECT file, content FROM payloads ORDER BY file"
+        ):
+            destination = root / file
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.write_bytes(content)
+            if has_blob_refs(content):
+                blobs = BlobStore.for_snapshot(destination)
+                for blob in blob_closure(json.loads(content), self.blob_bytes).values():
+                    blobs.put(blob)
+            exported += 1
+        return exported
+
+
+def load_build_index(path: Path) -> Mapping[str, Any]:
+    """Read ``build_index.json`` or the index mirrored in a :class:`BuildStore`."""
+
+    if is_build_store(path):
+        with BuildStore(path) as store:
+            return store.index_payload()
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Importa, interroga ed esporta l'archivio SQLite delle build."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("import", "Carica build_index.json e i payload nell'archivio"),
+        ("export", "Rigenera build_index.json e i payload dall'archivio"),
+        ("query", "Stampa come NDJSON le entry che rispettano i filtri"),
+    ):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument("--db", type=Path, required=True)
+        if name != "query":
+            command.add_argument(
+                "--root",
+                type=Path,
+                default=Path("."),
+                help="Directory rispetto a cui risolvere i campi 'file' delle entry",
+            )
+            command.add_argument(
+                "--index-path",
+                type=Path,
+                help=f"Indice JSON (default: <root>/{DEFAULT_INDEX_PATH})",
+            )
+    query = subparsers.choices["query"]
+    query.add_argument("--class", dest="classes", nargs="*")
+    query.add_argument("--level", dest="levels", nargs="*", type=int)
+    for column in INDEXED_COLUMNS:
+        if column not in ("class", "level"):
+            query.add_argument(f"--{column.replace('_', '-')}", dest=column)
+    query.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+
+    with BuildStore(args.db) as store:
+        if args.command == "query":
+            filters = {
+                column: getattr(args, column)
+                for column in INDEXED_COLUMNS
+                if column not in ("class", "level") and getattr(args, column)
+            }
+            for entry in store.entries(
+                classes=args.classes, levels=args.levels, limit=args.limit, **filters
+            ):
+                print(json.dumps(entry, ensure_ascii=False))
+            return 0
+
+        index_path = args.index_path or args.root / DEFAULT_INDEX_PATH
+        if args.command == "import":
+            imported = store.import_index(index_path, args.root)
+            print(f"Importate {len(store.entries())} entry e {imported} payload")
+        else:
+            exported = store.export(index_path, args.root)
+            print(f"Esportati {index_path} e {exported} payload in {args.root}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
 from collections import Counter, defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timezone
@@ -11,6 +12,12 @@ from pathlib import Path
 from typing import Any, Iterable, Mapping
 from urllib.parse import urlparse
 
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.build_store import load_build_index  # noqa: E402
+
 DEFAULT_BUILD_INDEX = Path("src/data/build_index.json")
 DEFAULT_MODULE_INDEX = Path("src/data/module_index.json")
 DEFAULT_MANIFEST = Path("data/reference/manifest.json")
@@ -98,7 +105,8 @@ def validate_urls(urls: Iterable[str]) -> list[str]:
 
 
 def analyze_build_index(path: Path, manifest_version: str | None) -> TableQuality:
-    data = json.loads(path.read_text(encoding="utf-8"))
+    # path può essere anche un archivio SQLite di tools/build_store.py
+    data = load_build_index(path)
     entries: list[Mapping[str, Any]] = data.get("entries", [])
 
     nulls = null_percentages(
@@ -380,7 +388,7 @@ def main() -> None:
         "--build-index",
         type=Path,
         default=DEFAULT_BUILD_INDEX,
-        help="Path to build_index.json",
+        help="Path to build_index.json (or a tools/build_store.py SQLite database)",
     )
     parser.add_argument(
         "--module-index",
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import argparse
+import base64
 import hashlib
 import asyncio
 import json
@@ -10,6 +11,8 @@ import logging
 import os
 import random
 import shutil
+import signal
+import sys
 import textwrap
 import re
 from fnmatch import fnmatchcase
@@ -17,10 +20,19 @@ from dataclasses import dataclass, field, replace
 from datetime import datetime, timezone
 from itertools import islice, product
 from pathlib import Path
-from typing import Any, Iterable, List, Mapping, MutableMapping, Sequence
+from typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    List,
+    Mapping,
+    MutableMapping,
+    Sequence,
+)
 from email.utils import parsedate_to_datetime
 
-DEFAULT_REFERENCE_DIR = Path(__file__).resolve().parent.parent / "data" / "reference"
 REFERENCE_SCHEMA = "reference_catalog.schema.json"
 
 logger = logging.getLogger(__name__)
@@ -30,7 +42,6 @@ from jinja2 import BaseLoader, ChainableUndefined
 from jinja2.nativetypes import NativeEnvironment
 
 import httpx
-from jsonschema import Draft202012Validator, RefResolver
 from jsonschema.exceptions import ValidationError
 from utils.aon_detector import is_aon_url
 
@@ -44,6 +55,31 @@ except ModuleNotFoundError:  # pragma: no cover - usato in CI/ambienti vanilla
     def is_aon_url(url: str) -> bool:
         return "aonprd.com" in (url or "").lower()
 
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from tools.blob_store import (  # noqa: E402
+    BLOB_DIRNAME,
+    BlobStore,
+    load_snapshot,
+    snapshot_blob_store,
+    write_snapshot,
+)
+from tools.build_store import BuildStore, is_build_store, load_build_index  # noqa: E402
+from tools.schema_validation import (  # noqa: E402 - re-esportati per compatibilità
+    BUILD_SCHEMA_MAP,
+    DEFAULT_REFERENCE_DIR,
+    SCHEMAS_DIR,
+    get_reference_manifest,
+    get_validator,
+    load_reference_manifest,
+    now_iso_utc,
+    schema_for_mode,
+    validate_with_schema,
+)
+
 # Lista di classi PF1e target supportate dal builder
 PF1E_CLASSES: List[str] = [
     "Alchemist",
@@ -174,13 +210,15 @@ MODULE_ENDPOINT = "/modules/minmax_builder.txt"
 MODULE_DUMP_ENDPOINT = "/modules/{name}"
 MODULE_META_ENDPOINT = "/modules/{name}/meta"
 MODULE_LIST_ENDPOINT = "/modules"
+MODULE_BATCH_ENDPOINT = "/modules:batch"
+MODULE_BATCH_SIZE = 500
+# copia locale del modulo servito da MODULE_ENDPOINT (l'API serve src/modules)
+SERVER_MODULE_PATH = REPO_ROOT / "src" / "modules" / Path(MODULE_ENDPOINT).name
+# da incrementare quando cambia la composizione di request_fingerprint
+REQUEST_FINGERPRINT_VERSION = 1
+# Entry di build_index accumulate nel journal prima di riscrivere l'indice JSON.
+BUILD_INDEX_COMPACT_EVERY = 200
 
-SCHEMAS_DIR = Path(__file__).resolve().parent.parent / "schemas"
-BUILD_SCHEMA_MAP = {
-    "core": "build_core.schema.json",
-    "extended": "build_extended.schema.json",
-    "full-pg": "build_full_pg.schema.json",
-}
 MODULE_SCHEMA = "module_metadata.schema.json"
 
 # Moduli "grezzi" utili per generare schede e flussi completi
@@ -196,12 +234,6 @@ DEFAULT_MODULE_TARGETS: Sequence[str] = (
 SHEET_MODULE_TARGETS: Sequence[str] = ("scheda_pg_markdown_template.md",)
 
 
-def now_iso_utc() -> str:
-    return (
-        datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
-    )
-
-
 def log_build_event(event: Mapping[str, object]) -> None:
     """Append an audit event to the build_events log."""
 
@@ -326,6 +358,10 @@ class BuildRequest:
         return metadata
 
 
+class HarvestInterrupted(KeyboardInterrupt):
+    """Raised by :func:`run_harvest` after a SIGINT, once progress has been saved."""
+
+
 class BuildFetchError(Exception):
     """Raised when the build API does not return usable data."""
 
@@ -490,31 +526,10 @@ def load_reference_catalog(
     return catalog
 
 
-def load_reference_manifest(
-    reference_dir: Path | None = None,
-) -> Mapping[str, object]:
-    directory = reference_dir or DEFAULT_REFERENCE_DIR
-    manifest_path = directory / "manifest.json"
-    if not manifest_path.is_file():
-        return {}
-
-    try:
-        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
-    except Exception as exc:  # pragma: no cover - defensive log
-        logging.warning("Impossibile leggere il manifest del catalogo: %s", exc)
-        return {}
-
-    if not isinstance(manifest, Mapping):
-        return {}
-
-    return manifest
-
-
 _reference_catalog_cache: dict[
     tuple[str, bool],
     dict[str, dict[str, Mapping[str, object]]],
 ] = {}
-_reference_manifest_cache: dict[str, Mapping[str, object]] = {}
 
 
 def get_reference_catalog(
@@ -530,17 +545,6 @@ def get_reference_catalog(
     return catalog
 
 
-def get_reference_manifest(reference_dir: Path | None = None) -> Mapping[str, object]:
-    directory = (reference_dir or DEFAULT_REFERENCE_DIR).resolve()
-    key = str(directory)
-    cached = _reference_manifest_cache.get(key)
-    if cached is not None:
-        return cached
-    manifest = load_reference_manifest(directory)
-    _reference_manifest_cache[key] = manifest
-    return manifest
-
-
 def _reference_url_coverage(
     catalog: Mapping[str, Mapping[str, Mapping[str, object]]],
 ) -> dict[str, object]:
@@ -996,7 +1000,7 @@ def export_race_inventory(
     counter: Counter[str] = Counter()
     for json_file in build_dir.rglob("*.json"):
         try:
-            data = json.loads(json_file.read_text(encoding="utf-8"))
+            data = load_snapshot(json_file)
         except Exception:
             continue
 
@@ -1388,166 +1392,6 @@ def _render_sheet_template(template_text: str, context: Mapping[str, object]) ->
     return rendered.strip()
 
 
-_validator_cache: dict[str, Draft202012Validator] = {}
-_schema_store: dict[str, Mapping] = {}
-
-
-def _bootstrap_schema_store() -> None:
-    """Preload every local schema so $id references resolve offline."""
-
-    if _schema_store.get("__bootstrapped__"):
-        return
-
-    for path in SCHEMAS_DIR.glob("*.schema.json"):
-        schema = json.loads(path.read_text(encoding="utf-8"))
-        _schema_store[path.name] = schema
-        if "$id" in schema:
-            _schema_store[schema["$id"]] = schema
-
-    _schema_store["__bootstrapped__"] = {"loaded": True}
-
-
-def _load_validator(schema_filename: str) -> Draft202012Validator:
-    _bootstrap_schema_store()
-    path = SCHEMAS_DIR / schema_filename
-    if not path.is_file():
-        raise FileNotFoundError(f"Schema non trovato: {path}")
-
-    schema = json.loads(path.read_text(encoding="utf-8"))
-    _schema_store[schema_filename] = schema
-    if "$id" in schema:
-        _schema_store[schema["$id"]] = schema
-    resolver = RefResolver(
-        base_uri=path.resolve().as_uri(), referrer=schema, store=_schema_store
-    )
-    return Draft202012Validator(schema, resolver=resolver)
-
-
-def get_validator(schema_filename: str) -> Draft202012Validator:
-    if schema_filename not in _validator_cache:
-        _validator_cache[schema_filename] = _load_validator(schema_filename)
-    return _validator_cache[schema_filename]
-
-
-def schema_for_mode(mode: str) -> str:
-    normalized = str(mode or "").lower()
-    if normalized.startswith("core"):
-        return BUILD_SCHEMA_MAP["core"]
-    if normalized.startswith("extended"):
-        return BUILD_SCHEMA_MAP["extended"]
-    return BUILD_SCHEMA_MAP["full-pg"]
-
-
-def validate_with_schema(
-    schema_filename: str, payload: Mapping, context: str, *, strict: bool
-) -> str | None:
-    augmented_payload = payload
-
-    # Reference catalog entries are lists, not mappings; only inject metadata when
-    # a mapping payload is provided. This prevents attempting to coerce a list
-    # to a dict, which raises a ValueError and stops report generation.
-    if isinstance(payload, Mapping) and "reference_catalog_version" not in payload:
-        manifest_version = (get_reference_manifest() or {}).get("version")
-        if manifest_version:
-            augmented_payload = dict(payload)
-            augmented_payload["reference_catalog_version"] = str(manifest_version)
-
-    if schema_filename in BUILD_SCHEMA_MAP.values():
-        needs_copy = augmented_payload is payload
-        base_payload = dict(augmented_payload) if needs_copy else augmented_payload
-        composite_payload: Mapping | None = None
-        build_bundle: Mapping | None = None
-        if isinstance(base_payload.get("composite"), Mapping):
-            composite_payload = (
-                dict(base_payload["composite"])
-                if base_payload["composite"] is augmented_payload.get("composite")
-                else base_payload["composite"]
-            )
-            build_bundle = (
-                dict(composite_payload.get("build", {}))
-                if isinstance(composite_payload.get("build"), Mapping)
-                else None
-            )
-
-        build_defaults = "stub-build-id-00000000000000000000000000000000"
-        if "build_id" not in base_payload:
-            base_payload["build_id"] = build_defaults
-            needs_copy = False
-        if build_bundle is not None and "build_id" not in build_bundle:
-            build_bundle["build_id"] = build_defaults
-
-        step_audit_defaults = base_payload.get("step_audit")
-        if "step_audit" not in base_payload:
-            step_labels = (
-                base_payload.get("build_state", {}).get("step_labels", {})
-                if isinstance(base_payload.get("build_state"), Mapping)
-                else {}
-            )
-            step_total = (
-                base_payload.get("build_state", {}).get("step_total")
-                if isinstance(base_payload.get("build_state"), Mapping)
-                else None
-            )
-            mode = (
-                base_payload.get("mode")
-                or base_payload.get("build_state", {}).get("mode")
-                if isinstance(base_payload.get("build_state"), Mapping)
-                else None
-            )
-            step_audit_defaults = {
-                "request_timestamp": now_iso_utc(),
-                "client_fingerprint_hash": (
-                    "stub-fingerprint-00000000000000000000000000000000"
-                ),
-                "outcome": "accepted",
-                "attempt_count": 1,
-                "backoff_reason": None,
-                "normalized_mode": str(mode).lower() or None,
-                "expected_step_total": step_total,
-                "observed_step_total": step_total,
-                "step_total_ok": bool(step_total),
-                "step_labels_count": len(step_labels) if step_labels else None,
-                "has_extended_steps": (str(mode).lower() == "extended"),
-            }
-            base_payload["step_audit"] = step_audit_defaults
-            needs_copy = False
-        if build_bundle is not None and "step_audit" not in build_bundle:
-            build_bundle["step_audit"] = base_payload.get(
-                "step_audit", step_audit_defaults
-            )
-
-        if composite_payload is not None and build_bundle is not None:
-            composite_payload["build"] = build_bundle
-            base_payload["composite"] = composite_payload
-        augmented_payload = base_payload
-
-    validator = get_validator(schema_filename)
-    errors = sorted(validator.iter_errors(augmented_payload), key=lambda err: err.path)
-    if not errors:
-        return None
-
-    message = "; ".join(error.message for error in errors)
-    log_fn = logging.error if strict else logging.warning
-    log_fn(
-        "Payload %s non valido (%s): %s",
-        context,
-        schema_filename,
-        message,
-        extra={
-            "event": "schema_validation_failed",
-            "context": context,
-            "schema": schema_filename,
-            "errors": [error.message for error in errors],
-            "paths": [
-                "/".join(str(segment) for segment in error.path) for error in errors
-            ],
-        },
-    )
-    if strict:
-        raise ValidationError(message)
-    return message
-
-
 def _empty_review_section() -> dict[str, Any]:
     return {
         "total": 0,
@@ -1631,7 +1475,7 @@ def _load_build_index_entries(
         return {}
 
     try:
-        build_index_payload = json.loads(build_index_path.read_text(encoding="utf-8"))
+        build_index_payload = load_build_index(build_index_path)
         raw_entries: Sequence[Mapping[str, object]] = (
             build_index_payload.get("entries") or []
         )
@@ -1713,7 +1557,7 @@ def review_local_database(
     build_index_meta: dict[str, object] = {}
     if build_index_path and build_index_path.is_file():
         try:
-            existing_index = json.loads(build_index_path.read_text(encoding="utf-8"))
+            existing_index = load_build_index(build_index_path)
             build_index_meta.update(
                 {
                     "api_url": existing_index.get("api_url"),
@@ -1771,7 +1615,7 @@ def review_local_database(
             continue
 
         try:
-            payload = json.loads(path.read_text(encoding="utf-8"))
+            payload = load_snapshot(path)
             entry.update(
                 {
                     "class": payload.get("class")
@@ -2135,7 +1979,7 @@ def review_local_database(
             ),
         }
         index_payload["checkpoints"] = _checkpoint_summary_from_entries(index_entries)
-        write_json(build_index_path, index_payload)
+        write_build_index(build_index_path, index_payload)
 
     if output_path:
         write_json(output_path, report)
@@ -2559,7 +2403,62 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--skip-unchanged",
         action="store_true",
-        help="Evita di riscrivere i payload invariati confrontando i JSON generati con i file già presenti",
+        help=(
+            "Riscarica solo gli snapshot mancanti o con fingerprint cambiato (parametri "
+            "della richiesta, versione del catalogo, hash del modulo del server) ed evita "
+            "di riscrivere i payload invariati"
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Riprende un harvest interrotto (eccezione o Ctrl-C) saltando gli snapshot "
+            "già completati nel checkpoint <index-path>.checkpoint.ndjson"
+        ),
+    )
+    parser.add_argument(
+        "--plan-only",
+        action="store_true",
+        help=(
+            "Calcola il piano incrementale di --skip-unchanged (snapshot da scaricare e "
+            "invariati) senza contattare l'API ed esce"
+        ),
+    )
+    parser.add_argument(
+        "--server-module-path",
+        type=Path,
+        default=SERVER_MODULE_PATH,
+        help=(
+            "Copia locale del modulo servito da %s usata per l'hash nel fingerprint "
+            "degli snapshot (default: %%(default)s)" % MODULE_ENDPOINT
+        ),
+    )
+    parser.add_argument(
+        "--index-compact-every",
+        type=int,
+        default=BUILD_INDEX_COMPACT_EVERY,
+        help=(
+            "Ogni quante entry del journal NDJSON riscrivere build_index.json "
+            "durante l'harvest (default: %(default)s)"
+        ),
+    )
+    parser.add_argument(
+        "--build-db",
+        type=Path,
+        default=None,
+        help=(
+            "Archivio SQLite opzionale (tools/build_store.py) aggiornato insieme a "
+            "build_index.json con entry indicizzate e payload"
+        ),
+    )
+    parser.add_argument(
+        "--dedup-blobs",
+        action="store_true",
+        help=(
+            "Scrive i sotto-documenti condivisi degli snapshot una sola volta in "
+            "<output-dir>/.blobs (tools/blob_store.py) e li referenzia per hash"
+        ),
     )
     parser.add_argument(
         "--dual-pass",
@@ -4188,6 +4087,289 @@ class RulingCache:
                 )
 
 
+@dataclass
+class BuildIndexJournal:
+    """Append-only NDJSON journal of ``build_index.json`` entries.
+
+    Each completed snapshot appends one ``{"key", "entry"}`` line, so the
+    per-snapshot cost does not grow with the index and a crash loses at most
+    the line being written. :meth:`replay` folds the lines left by an
+    interrupted run into the existing entries; :meth:`compact` rewrites the
+    canonical index atomically and removes the journal.
+    """
+
+    path: Path
+    appended: int = 0
+    handle: IO[str] | None = None
+
+    @classmethod
+    def for_index(cls, index_path: Path) -> "BuildIndexJournal":
+        return cls(path=index_path.with_suffix(".journal.ndjson"))
+
+    def replay(self, entries: MutableMapping[str, Mapping]) -> int:
+        if not self.path.is_file():
+            return 0
+        replayed = 0
+        with self.path.open(encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # ultima riga scritta a metà da un processo interrotto
+                    logger.warning("Riga incompleta ignorata nel journal %s", self.path)
+                    continue
+                key = record.get("key") if isinstance(record, Mapping) else None
+                entry = record.get("entry") if isinstance(record, Mapping) else None
+                if key and isinstance(entry, Mapping):
+                    entries[str(key)] = entry
+                    replayed += 1
+        return replayed
+
+    def append(self, key: str, entry: Mapping) -> None:
+        if self.handle is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.handle = self.path.open("a", encoding="utf-8")
+        self.handle.write(
+            json.dumps({"key": key, "entry": entry}, ensure_ascii=False, default=str)
+            + "\n"
+        )
+        self.handle.flush()
+        self.appended += 1
+
+    def compact(self, index_path: Path, index_payload: Mapping) -> None:
+        tmp = index_path.with_suffix(index_path.suffix + ".tmp")
+        write_json(tmp, index_payload)
+        tmp.replace(index_path)
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.appended = 0
+
+    def close(self) -> None:
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+@dataclass
+class HarvestCheckpoint:
+    """Append-only NDJSON record of the snapshots completed by a harvest.
+
+    Each line stores the ``(request, level)`` pair of a finished snapshot, its
+    ``request_fingerprint`` and, if the snapshot entered the index, its key
+    and entry. Unlike :class:`BuildIndexJournal` the file survives index
+    compaction: ``--resume`` loads it to skip the snapshots whose fingerprint
+    still matches and restore their entries. A run that completes removes it.
+    """
+
+    path: Path
+    completed: dict[tuple[str, int | None], Mapping] = field(default_factory=dict)
+    handle: IO[str] | None = None
+
+    @classmethod
+    def for_index(cls, index_path: Path) -> "HarvestCheckpoint":
+        return cls(path=index_path.with_suffix(".checkpoint.ndjson"))
+
+    def load(self) -> int:
+        if not self.path.is_file():
+            return 0
+        with self.path.open(encoding="utf-8") as checkpoint:
+            for line in checkpoint:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(
+                        "Riga incompleta ignorata nel checkpoint %s", self.path
+                    )
+                    continue
+                if not isinstance(record, Mapping) or not record.get("request"):
+                    continue
+                # l'ultima riga per coppia vince: uno snapshot riscaricato
+                # sostituisce il record precedente
+                self.completed[(str(record["request"]), record.get("level"))] = record
+        return len(self.completed)
+
+    def is_completed(self, request: BuildRequest, fingerprint: str | None) -> bool:
+        """True if ``request`` finished with the same ``request_fingerprint``."""
+
+        record = self.completed.get((request.output_name(), request.level))
+        return (
+            record is not None
+            and fingerprint is not None
+            and record.get("fingerprint") == fingerprint
+        )
+
+    def is_stale(self, request: BuildRequest, fingerprint: str | None) -> bool:
+        pair = (request.output_name(), request.level)
+        return pair in self.completed and not self.is_completed(request, fingerprint)
+
+    def entry_for(self, request: BuildRequest) -> tuple[str, Mapping] | None:
+        record = self.completed.get((request.output_name(), request.level)) or {}
+        if record.get("key") and isinstance(record.get("entry"), Mapping):
+            return str(record["key"]), record["entry"]
+        return None
+
+    def record(self, entry: Mapping, key: str | None, fingerprint: str | None) -> None:
+        if self.handle is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.handle = self.path.open("a", encoding="utf-8")
+        pair = (str(entry.get("output_prefix")), entry.get("level"))
+        record = {
+            "request": pair[0],
+            "level": pair[1],
+            "fingerprint": fingerprint,
+            "key": key,
+        }
+        if key:
+            record["entry"] = entry
+        self.handle.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self.handle.flush()
+        self.completed[pair] = record
+
+    def discard(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def _install_sigint_handler(stop: asyncio.Event) -> Callable[[], None]:
+    """Turn the first SIGINT into ``stop.set()``; return the uninstaller."""
+
+    loop = asyncio.get_running_loop()
+
+    def _on_sigint() -> None:
+        logging.warning(
+            "SIGINT ricevuto: completo gli snapshot in corso e salvo lo stato "
+            "(un secondo Ctrl-C interrompe subito)"
+        )
+        stop.set()
+        loop.remove_signal_handler(signal.SIGINT)
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, _on_sigint)
+    except (NotImplementedError, RuntimeError, ValueError):  # pragma: no cover
+        # Windows o event loop fuori dal thread principale: Ctrl-C resta immediato
+        return lambda: None
+    return lambda: loop.remove_signal_handler(signal.SIGINT)
+
+
+def _compose_build_index(
+    builds_index: MutableMapping[str, object], *entry_maps: Mapping[str, Mapping]
+) -> MutableMapping[str, object]:
+    """Fill ``builds_index`` with the merged entries; later maps win per key."""
+
+    merged: dict[str, Mapping] = {}
+    for entries in entry_maps:
+        merged.update(entries)
+    builds_index["entries"] = [merged[key] for key in sorted(merged)]
+    builds_index["checkpoints"] = _checkpoint_summary_from_entries(
+        builds_index["entries"]
+    )
+    return builds_index
+
+
+def server_module_hash(path: Path | None = None) -> str | None:
+    """SHA-256 of the builder module the API serves, read from the local copy."""
+
+    path = path or SERVER_MODULE_PATH
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        logging.warning(
+            "Modulo del server %s non leggibile: fingerprint senza hash", path
+        )
+        return None
+
+
+def request_fingerprint(
+    request: BuildRequest,
+    *,
+    catalog_version: str | None,
+    module_hash: str | None,
+) -> str:
+    """Hash of everything that determines the snapshot served for ``request``."""
+
+    raw = json.dumps(
+        {
+            "version": REQUEST_FINGERPRINT_VERSION,
+            "api_params": request.api_params(level=request.level),
+            "body_params": dict(request.body_params or {}),
+            "catalog_version": catalog_version,
+            "server_module": module_hash,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class HarvestPlan:
+    """Snapshots to fetch and to reuse, decided from fingerprints only."""
+
+    fetch: list[tuple[BuildRequest, Path, int]] = field(default_factory=list)
+    reuse: list[tuple[BuildRequest, Path, int]] = field(default_factory=list)
+    reasons: dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> dict[str, object]:
+        return {
+            "planned": len(self.fetch) + len(self.reuse),
+            "fetch": len(self.fetch),
+            "skipped": len(self.reuse),
+            "reasons": dict(sorted(self.reasons.items())),
+        }
+
+
+def _stored_fingerprint(
+    destination: Path, existing_entries: Mapping[str, Mapping]
+) -> str | None:
+    entry = existing_entries.get(str(destination)) or {}
+    if entry.get("request_fingerprint"):
+        return str(entry["request_fingerprint"])
+    try:
+        payload = load_snapshot(destination)
+    except Exception:  # pragma: no cover - snapshot corrotto: si riscarica
+        return None
+    if isinstance(payload, Mapping) and payload.get("request_fingerprint"):
+        return str(payload["request_fingerprint"])
+    return None
+
+
+def plan_incremental_harvest(
+    planned_snapshots: Sequence[tuple[BuildRequest, Path, int]],
+    fingerprints: Mapping[Path, str],
+    existing_entries: Mapping[str, Mapping],
+) -> HarvestPlan:
+    """Split ``planned_snapshots`` by comparing fingerprints with the stored ones.
+
+    The stored fingerprint comes from the previous ``build_index.json`` entry
+    or, failing that, from the snapshot itself: no network call is made.
+    """
+
+    plan = HarvestPlan()
+    for planned in planned_snapshots:
+        destination = planned[1]
+        if not destination.exists():
+            reason = "missing_snapshot"
+        else:
+            stored = _stored_fingerprint(destination, existing_entries)
+            if stored is None:
+                reason = "unstamped"
+            elif stored != fingerprints[destination]:
+                reason = "fingerprint_changed"
+            else:
+                plan.reuse.append(planned)
+                continue
+        plan.fetch.append(planned)
+        plan.reasons[reason] = plan.reasons.get(reason, 0) + 1
+    return plan
+
+
 def _ruling_cache_key(
     payload: Mapping[str, Any], context: Mapping[str, Any]
 ) -> str | None:
@@ -5459,6 +5641,40 @@ async def fetch_module(
     return content_resp.text, meta_resp.json()
 
 
+async def stream_module_batch(
+    client: httpx.AsyncClient, api_key: str | None, names: Sequence[str]
+) -> AsyncIterator[Mapping]:
+    """Yield the NDJSON items of ``POST /modules:batch`` one at a time.
+
+    Raises ``httpx.HTTPStatusError`` when the endpoint is missing (servers
+    older than the batch API answer 404/405): callers fall back to
+    :func:`fetch_module`.
+    """
+
+    headers = {"x-api-key": api_key} if api_key else {}
+    async with client.stream(
+        "POST",
+        MODULE_BATCH_ENDPOINT,
+        headers=headers,
+        json={"names": list(names)},
+        timeout=120,
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, Mapping) and item.get("name"):
+                yield item
+
+
+def decode_batch_content(item: Mapping) -> str | bytes:
+    content = item.get("content") or ""
+    if item.get("content_encoding") == "base64":
+        return base64.b64decode(content)
+    return str(content)
+
+
 async def discover_modules(
     client: httpx.AsyncClient, api_key: str | None, max_retries: int
 ) -> list[str]:
@@ -5502,6 +5718,16 @@ def write_json(path: Path, data: Mapping) -> None:
     path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
 
 
+def write_build_index(path: Path, index_payload: Mapping) -> None:
+    """Write ``build_index.json``, or the index table of a :class:`BuildStore`."""
+
+    if is_build_store(path):
+        with BuildStore(path) as store:
+            store.write_index(index_payload)
+    else:
+        write_json(path, index_payload)
+
+
 def _benchmark_scores_for_index(
     benchmark: Mapping[str, object] | None,
 ) -> tuple[float, float]:
@@ -5566,6 +5792,9 @@ def _index_meta_from_payload(payload: Mapping[str, object] | None) -> dict[str,
         if benchmark.get(field):
             metadata[field] = benchmark[field]
 
+    if payload.get("request_fingerprint"):
+        metadata["request_fingerprint"] = payload["request_fingerprint"]
+
     ruling_log = payload.get("ruling_log")
     if isinstance(ruling_log, Sequence) and not isinstance(ruling_log, (str, bytes)):
         metadata["ruling_log"] = list(map(str, ruling_log))
@@ -5596,7 +5825,7 @@ def analyze_indices(
     def _load_index(path: Path) -> Mapping[str, Any]:
         if path.is_file():
             try:
-                return json.loads(path.read_text(encoding="utf-8"))
+                return load_build_index(path)
             except Exception as exc:  # pragma: no cover - defensive logging
                 logging.warning("Impossibile leggere l'indice %s: %s", path, exc)
         return {"entries": []}
@@ -5804,7 +6033,7 @@ def module_index_entry(
     return entry
 
 
-async def run_harvest(
+async def _run_harvest(
     requests: Iterable[BuildRequest],
     api_url: str,
     api_key: str | None,
@@ -5845,6 +6074,12 @@ async def run_harvest(
     ruling_concurrency: int | None = None,
     skip_modules: bool = False,
     fail_on_invalid: bool = False,
+    index_compact_every: int = BUILD_INDEX_COMPACT_EVERY,
+    build_store: BuildStore | None = None,
+    dedup_blobs: bool = False,
+    server_module_path: Path | None = None,
+    plan_only: bool = False,
+    resume: bool = False,
 ) -> None:
     requests = list(requests)
     max_items = int(max_items) if max_items is not None else None
@@ -5894,6 +6129,41 @@ async def run_harvest(
         or (str(spec_path) if spec_path else None),
         "entries": [],
     }
+    build_journal = BuildIndexJournal.for_index(index_path)
+    blob_store = BlobStore(output_dir / BLOB_DIRNAME) if dedup_blobs else None
+
+    def _persist_build_index(index_payload: Mapping) -> None:
+        build_journal.compact(index_path, index_payload)
+        if build_store is not None:
+            build_store.write_index(index_payload)
+
+    recovered = build_journal.replay(existing_build_entries)
+    if recovered:
+        logging.warning(
+            "Recuperate %s entry dal journal %s di un'esecuzione interrotta",
+            recovered,
+            build_journal.path,
+        )
+        # --plan-only non ha effetti collaterali: il journal resta da compattare
+        if not plan_only:
+            _persist_build_index(
+                _compose_build_index(builds_index, existing_build_entries)
+            )
+    harvest_checkpoint = HarvestCheckpoint.for_index(index_path)
+    if resume:
+        resumed = harvest_checkpoint.load()
+        if resumed:
+            logging.info(
+                "Resume: %s snapshot già completati secondo %s",
+                resumed,
+                harvest_checkpoint.path,
+            )
+    elif harvest_checkpoint.path.is_file() and not plan_only:
+        logging.warning(
+            "Checkpoint %s di un'esecuzione interrotta scartato: usa --resume per riprenderla",
+            harvest_checkpoint.path,
+        )
+        harvest_checkpoint.discard()
     modules_index: dict[str, object] = {
         "generated_at": now_iso_utc(),
         "api_url": api_url,
@@ -5981,7 +6251,11 @@ async def run_harvest(
 
     snapshots_planned = 0
     skipped_for_limit = 0
+    resumed_skipped = 0
+    resumed_stale = 0
     limit_reached = False
+    module_hash = server_module_hash(server_module_path)
+    snapshot_fingerprints: dict[Path, str] = {}
     for build_request in requests:
         if limit_reached:
             break
@@ -6020,8 +6294,22 @@ async def run_harvest(
                 level=level,
                 level_checkpoints=tuple(level_plan),
             )
+            fingerprint = request_fingerprint(
+                task_request,
+                catalog_version=manifest_version,
+                module_hash=module_hash,
+            )
+            if harvest_checkpoint.is_completed(task_request, fingerprint):
+                resumed_skipped += 1
+                restored = harvest_checkpoint.entry_for(task_request)
+                if restored is not None:
+                    existing_build_entries[restored[0]] = restored[1]
+                continue
+            if harvest_checkpoint.is_stale(task_request, fingerprint):
+                resumed_stale += 1
             suffix = "" if level == 1 else f"_lvl{level:02d}"
             output_file = output_dir / f"{task_request.output_name()}{suffix}.json"
+            snapshot_fingerprints[output_file] = fingerprint
             planned_snapshots.append((task_request, output_file, base_level))
             snapshots_planned += 1
 
@@ -6031,13 +6319,42 @@ async def run_harvest(
             max_items,
             skipped_for_limit,
         )
-
-    all_cached = bool(
-        skip_unchanged
-        and planned_snapshots
-        and all(destination.exists() for _, destination, _ in planned_snapshots)
+    if resumed_skipped:
+        logging.info(
+            "Resume: salto %s snapshot completati, ne restano %s",
+            resumed_skipped,
+            len(planned_snapshots),
+        )
+    if resumed_stale:
+        logging.info(
+            "Resume: %s snapshot del checkpoint hanno un fingerprint diverso "
+            "(matrice, catalogo o modulo cambiati): li riscarico",
+            resumed_stale,
+        )
+    harvest_plan: HarvestPlan | None = None
+    if skip_unchanged or plan_only:
+        harvest_plan = plan_incremental_harvest(
+            planned_snapshots, snapshot_fingerprints, existing_build_entries
+        )
+        plan_summary = harvest_plan.summary()
+        builds_index["incremental_plan"] = plan_summary
+        logging.info(
+            "Piano incrementale: %s snapshot pianificati, %s da scaricare, %s invariati %s",
+            plan_summary["planned"],
+            plan_summary["fetch"],
+            plan_summary["skipped"],
+            plan_summary["reasons"],
+        )
+        if plan_only:
+            return
+    reusable = (
+        {destination for _, destination, _ in harvest_plan.reuse}
+        if harvest_plan is not None
+        else set()
     )
 
+    all_cached = bool(harvest_plan and planned_snapshots and not harvest_plan.fetch)
+
     async with httpx.AsyncClient(
         base_url=api_url.rstrip("/"),
         follow_redirects=True,
@@ -6100,9 +6417,9 @@ async def run_harvest(
             request: BuildRequest, destination: Path, base_level: int
         ) -> tuple[str, Mapping]:
             async with semaphore:
-                if skip_unchanged and destination.exists():
+                if destination in reusable:
                     try:
-                        payload = json.loads(destination.read_text(encoding="utf-8"))
+                        payload = load_snapshot(destination)
                     except (
                         Exception
                     ) as exc:  # pragma: no cover - defensive logging only
@@ -6128,10 +6445,7 @@ async def run_harvest(
                             json.dumps(payload, sort_keys=True, default=str)
                             != normalized_payload_before
                         ):
-                            destination.write_text(
-                                json.dumps(payload, indent=2, ensure_ascii=False),
-                                encoding="utf-8",
-                            )
+                            write_snapshot(destination, payload, blob_store)
                         validation_error = validate_with_schema(
                             schema_for_mode(request.mode),
                             payload,
@@ -6244,7 +6558,9 @@ async def run_harvest(
                                                     ).setdefault(
                                                         "ruling_badge", existing_badge
                                                     )
-                                                write_json(destination, payload)
+                                                write_snapshot(
+                                                    destination, payload, blob_store
+                                                )
                                         else:
                                             reuse_ok = False
 
@@ -6352,6 +6668,7 @@ async def run_harvest(
                         target_level=request.level,
                         normalized_mode=normalize_mode(request.mode),
                     )
+                    payload["request_fingerprint"] = snapshot_fingerprints[destination]
                     validation_error = validate_with_schema(
                         schema_for_mode(request.mode),
                         payload,
@@ -6470,9 +6787,7 @@ async def run_harvest(
                     if should_write and status != "pruned":
                         if skip_unchanged and destination.exists():
                             try:
-                                existing_payload = json.loads(
-                                    destination.read_text(encoding="utf-8")
-                                )
+                                existing_payload = load_snapshot(destination)
                             except Exception:
                                 existing_payload = None
 
@@ -6506,10 +6821,7 @@ async def run_harvest(
                                     **meta_data,
                                 )
 
-                        destination.write_text(
-                            json.dumps(payload, indent=2, ensure_ascii=False),
-                            encoding="utf-8",
-                        )
+                        write_snapshot(destination, payload, blob_store)
                         output_path = destination
                         if (
                             previous_best_path
@@ -6648,7 +6960,7 @@ async def run_harvest(
                         **meta_data,
                     )
 
-        def _record_build_result(entry: Mapping) -> None:
+        def _record_build_result(entry: Mapping) -> str | None:
             combo_id = entry.get("combo_id") if isinstance(entry, Mapping) else None
             if combo_best_only and combo_id:
                 class_slug = slugify(str(entry.get("class") or ""))
@@ -6666,9 +6978,9 @@ async def run_harvest(
                         not candidate_path
                         or Path(candidate_path).resolve() != best_path.resolve()
                     ):
-                        return
+                        return None
                 elif key in build_results:
-                    return
+                    return None
             else:
                 key = (
                     entry.get("file")
@@ -6677,9 +6989,76 @@ async def run_harvest(
 
             if key:
                 build_results[str(key)] = entry
+                build_journal.append(str(key), entry)
+                snapshot_file = entry.get("file")
+                if build_store is not None and snapshot_file:
+                    snapshot_path = Path(str(snapshot_file))
+                    if snapshot_path.is_file():
+                        build_store.put_snapshot(str(snapshot_file), snapshot_path)
+                if build_journal.appended >= max(1, index_compact_every):
+                    _persist_build_index(
+                        _compose_build_index(
+                            builds_index, existing_build_entries, build_results
+                        )
+                    )
+                return str(key)
+            return None
+
+        def _complete_snapshot(name: str, entry: Mapping) -> None:
+            key = _record_build_result(entry)
+            # gli errori di fetch non contano come completati: --resume li ritenta
+            if entry.get("status") != "error":
+                harvest_checkpoint.record(
+                    entry, key, snapshot_fingerprints.get(output_dir / name)
+                )
+
+        async def _save_partial_state() -> None:
+            if ruling_cache is not None:
+                await ruling_cache.flush()
+            _persist_build_index(
+                _compose_build_index(
+                    builds_index, existing_build_entries, build_results
+                )
+            )
+            harvest_checkpoint.close()
 
         module_results: dict[str, Mapping] = {}
 
+        def store_module(
+            name: str, destination: Path, content: str | bytes, meta: Mapping
+        ) -> tuple[str, Mapping]:
+            validation_error = validate_with_schema(
+                MODULE_SCHEMA,
+                meta,
+                f"module meta {name}",
+                strict=strict,
+            )
+            status = "ok" if validation_error is None else "invalid"
+            record_status = _record_status_from_result(status)
+            destination_path: Path | None = None
+            normalized_meta = _normalize_module_meta(
+                meta,
+                record_status=record_status,
+                actor="generate_build_db",
+                note=(
+                    None
+                    if validation_error is None
+                    else f"meta validation: {validation_error}"
+                ),
+            )
+            if status == "ok" or keep_invalid:
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                if isinstance(content, bytes):
+                    destination.write_bytes(content)
+                else:
+                    destination.write_text(content, encoding="utf-8")
+                destination_path = destination
+            elif destination.exists():
+                destination.unlink()
+            return name, module_index_entry(
+                name, destination_path, status, normalized_meta, validation_error
+            )
+
         async def process_module(name: str, destination: Path) -> tuple[str, Mapping]:
             async with semaphore:
                 if skip_unchanged and destination.exists():
@@ -6702,42 +7081,7 @@ async def run_harvest(
                     content, meta = await fetch_module(
                         client, api_key, name, max_retries
                     )
-                    validation_error = validate_with_schema(
-                        MODULE_SCHEMA,
-                        meta,
-                        f"module meta {name}",
-                        strict=strict,
-                    )
-                    status = "ok" if validation_error is None else "invalid"
-                    record_status = _record_status_from_result(status)
-                    destination_path: Path | None = None
-                    normalized_meta = _normalize_module_meta(
-                        meta,
-                        record_status=record_status,
-                        actor="generate_build_db",
-                        note=(
-                            None
-                            if validation_error is None
-                            else f"meta validation: {validation_error}"
-                        ),
-                    )
-                    if status == "ok" or keep_invalid:
-                        destination.parent.mkdir(parents=True, exist_ok=True)
-                        destination.write_text(content, encoding="utf-8")
-                        destination_path = destination
-                    elif destination.exists():
-                        destination.unlink()
-                    return name, module_index_entry(
-                        name,
-                        destination_path,
-                        status,
-                        (
-                            normalized_meta
-                            if validation_error is None
-                            else normalized_meta
-                        ),
-                        validation_error,
-                    )
+                    return store_module(name, destination, content, meta)
                 except ValidationError:
                     raise
                 except Exception as exc:  # pragma: no cover - network dependent
@@ -6748,11 +7092,15 @@ async def run_harvest(
             plan: Iterable[tuple[object, ...]] | Iterable[object],
             launcher: callable,
             consume_result: callable,
+            stop: asyncio.Event | None = None,
         ) -> None:
             iterator = iter(plan)
             in_flight: set[asyncio.Task] = set()
 
             def _launch_next() -> None:
+                if stop is not None and stop.is_set():
+                    # interruzione: i task in corso finiscono, nessuno nuovo parte
+                    return
                 try:
                     task_args = next(iterator)
                 except StopIteration:
@@ -6780,31 +7128,97 @@ async def run_harvest(
                     consume_result(result)
                     _launch_next()
 
-        await process_plan(
-            planned_snapshots,
-            lambda req, dest, base: process_class(req, dest, base),
-            lambda result: _record_build_result(result[1]),
-        )
+        stop_requested = asyncio.Event()
+        remove_sigint_handler = _install_sigint_handler(stop_requested)
+        try:
+            await process_plan(
+                planned_snapshots,
+                lambda req, dest, base: process_class(req, dest, base),
+                lambda result: _complete_snapshot(*result),
+                stop=stop_requested,
+            )
+        except BaseException:
+            # il checkpoint resta su disco: --resume riparte da qui
+            await _save_partial_state()
+            raise
+        finally:
+            remove_sigint_handler()
+        if stop_requested.is_set():
+            await _save_partial_state()
+            raise HarvestInterrupted(
+                f"Harvest interrotto dopo {len(harvest_checkpoint.completed)} "
+                f"snapshot completati: riprendi con --resume ({harvest_checkpoint.path})"
+            )
+
+        async def process_module_batch(names: list[str]) -> set[str]:
+            """Download ``names`` through ``/modules:batch``; return those handled.
+
+            One streamed request per ``MODULE_BATCH_SIZE`` modules replaces the
+            content + meta round trips of :func:`fetch_module`. If the server
+            lacks the endpoint or the stream breaks, the modules not yet
+            handled go through the per-module path.
+            """
+
+            handled: set[str] = set()
+            for start in range(0, len(names), MODULE_BATCH_SIZE):
+                chunk = set(names[start : start + MODULE_BATCH_SIZE])
+                try:
+                    async for item in stream_module_batch(
+                        client, api_key, names[start : start + MODULE_BATCH_SIZE]
+                    ):
+                        name = str(item["name"])
+                        if name not in chunk or name in handled:
+                            continue
+                        status = item.get("status")
+                        if status in (200, 206):
+                            _, entry = store_module(
+                                name,
+                                modules_output_dir / name,
+                                decode_batch_content(item),
+                                item.get("meta") or {},
+                            )
+                        else:
+                            entry = module_index_entry(
+                                name,
+                                None,
+                                "error",
+                                error=f"HTTP {status}: {item.get('detail')}",
+                            )
+                        module_results[name] = entry
+                        handled.add(name)
+                except (httpx.HTTPError, ValueError) as exc:
+                    logging.warning(
+                        "Download batch dei moduli non disponibile (%s): "
+                        "proseguo modulo per modulo",
+                        exc,
+                    )
+                    break
+            return handled
+
+        batched_modules: set[str] = set()
+        batch_plan = [
+            name
+            for name in module_plan
+            if not (skip_unchanged and (modules_output_dir / name).exists())
+        ]
+        if batch_plan:
+            logging.info(
+                "Scarico %s moduli via %s", len(batch_plan), MODULE_BATCH_ENDPOINT
+            )
+            batched_modules = await process_module_batch(batch_plan)
 
         await process_plan(
-            ((name, modules_output_dir / name) for name in module_plan),
+            (
+                (name, modules_output_dir / name)
+                for name in module_plan
+                if name not in batched_modules
+            ),
             lambda name, path: process_module(name, path),
             lambda result: module_results.__setitem__(result[0], result[1]),
         )
 
-    new_build_entries = build_results
-
-    merged_build_entries = []
-    for key in sorted(set(new_build_entries) | set(existing_build_entries)):
-        if key in new_build_entries:
-            merged_build_entries.append(new_build_entries[key])
-        else:
-            merged_build_entries.append(existing_build_entries[key])
-
-    builds_index["entries"] = merged_build_entries
-    builds_index["checkpoints"] = _checkpoint_summary_from_entries(
-        builds_index["entries"]
-    )
+    _compose_build_index(builds_index, existing_build_entries, build_results)
+    merged_build_entries = builds_index["entries"]
     new_module_entries = dict(module_results)
     merged_module_entries = []
     for name in sorted(set(new_module_entries) | set(existing_module_entries)):
@@ -6820,7 +7234,15 @@ async def run_harvest(
     if ruling_cache is not None:
         await ruling_cache.flush()
 
-    write_json(index_path, builds_index)
+    _persist_build_index(builds_index)
+    harvest_checkpoint.discard()
+    if blob_store is not None:
+        logging.info(
+            "Blob store %s: %s blob scritti, %s riutilizzati",
+            blob_store.root,
+            blob_store.written,
+            blob_store.reused,
+        )
     write_json(module_index_path, modules_index)
     logging.info("Indici aggiornati: %s e %s", index_path, module_index_path)
 
@@ -6886,6 +7308,20 @@ async def run_harvest(
             raise SystemExit(2)
 
 
+async def run_harvest(
+    *args: Any, build_db_path: Path | None = None, **kwargs: Any
+) -> None:
+    """Run :func:`_run_harvest`, closing the optional SQLite store on every exit."""
+
+    plan_only = kwargs.get("plan_only", False)
+    build_store = BuildStore(build_db_path) if build_db_path and not plan_only else None
+    try:
+        await _run_harvest(*args, build_store=build_store, **kwargs)
+    finally:
+        if build_store is not None:
+            build_store.close()
+
+
 def _snapshot_request_from_payload(payload: Mapping[str, object]) -> BuildRequest:
     request_meta = payload.get("request")
     if isinstance(request_meta, Mapping):
@@ -6970,7 +7406,7 @@ async def backfill_ruling_badges(
         async def _work(file_path: Path) -> None:
             async with sem:
                 try:
-                    payload = json.loads(file_path.read_text(encoding="utf-8"))
+                    payload = load_snapshot(file_path)
                 except Exception as exc:
                     logging.warning("Backfill: JSON invalido %s (%s)", file_path, exc)
                     return
@@ -6994,7 +7430,9 @@ async def backfill_ruling_badges(
                                 "ruling_badge", badge.strip()
                             )
                             if not dry_run:
-                                write_json(file_path, payload)
+                                write_snapshot(
+                                    file_path, payload, snapshot_blob_store(file_path)
+                                )
                             updated.append(
                                 (
                                     file_path,
@@ -7023,7 +7461,7 @@ async def backfill_ruling_badges(
                         "ruling_badge", badge
                     )
                 if not dry_run:
-                    write_json(file_path, payload)
+                    write_snapshot(file_path, payload, snapshot_blob_store(file_path))
                 updated.append((file_path, badge, payload.get("ruling_sources")))
 
         if files:
@@ -7168,6 +7606,10 @@ def run_dual_pass_harvest(args: argparse.Namespace) -> Mapping[str, Any]:
                 # In dual-pass la passata tolerant deve poter completare prima
                 # di decidere se fallire (altrimenti lo strict può abortire presto).
                 fail_on_invalid=False,
+                index_compact_every=args.index_compact_every,
+                dedup_blobs=args.dedup_blobs,
+                server_module_path=args.server_module_path,
+                resume=args.resume,
             )
         )
         report["strict"]["status"] = "ok"
@@ -7242,6 +7684,11 @@ def run_dual_pass_harvest(args: argparse.Namespace) -> Mapping[str, Any]:
                 ruling_concurrency=args.ruling_concurrency,
                 skip_modules=args.skip_modules,
                 fail_on_invalid=args.fail_on_invalid,
+                index_compact_every=args.index_compact_every,
+                build_db_path=args.build_db,
+                dedup_blobs=args.dedup_blobs,
+                server_module_path=args.server_module_path,
+                resume=args.resume,
             )
         )
         report["tolerant"]["status"] = "ok"
@@ -7295,12 +7742,13 @@ def main() -> None:
         (not args.skip_ruling_expert)
         and (not args.ruling_expert_url)
         and (not args.validate_db)
+        and (not args.plan_only)
     ):
         raise ValueError(
             "--ruling-expert-url è obbligatorio per salvare nuovi snapshot (oppure usa --skip-ruling-expert per debug)"
         )
 
-    if args.dual_pass:
+    if args.dual_pass and not args.plan_only:
         run_dual_pass_harvest(args)
         return
 
@@ -7405,9 +7853,19 @@ def main() -> None:
             ruling_concurrency=args.ruling_concurrency,
             skip_modules=args.skip_modules,
             fail_on_invalid=args.fail_on_invalid,
+            index_compact_every=args.index_compact_every,
+            build_db_path=args.build_db,
+            dedup_blobs=args.dedup_blobs,
+            server_module_path=args.server_module_path,
+            resume=args.resume,
+            plan_only=args.plan_only,
         )
     )
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except HarvestInterrupted as exc:
+        logging.warning("%s", exc)
+        raise SystemExit(130)
@@ -2,13 +2,18 @@
 
 from __future__ import annotations
 
-import json
+import sys
 from pathlib import Path
 from typing import Any
 
 from fastapi import FastAPI, HTTPException, Query, Response
 
 ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.blob_store import load_snapshot  # noqa: E402
+
 BUILDS_DIR = ROOT / "src" / "data" / "builds"
 MODULES_DIR = ROOT / "src" / "data" / "modules"
 MODULE_INDEX = ROOT / "src" / "data" / "module_index.json"
@@ -23,7 +28,8 @@ def _slugify(name: str) -> str:
 def _load_json(path: Path) -> Any:
     if not path.is_file():
         raise HTTPException(status_code=404, detail=f"File non trovato: {path}")
-    return json.loads(path.read_text(encoding="utf-8"))
+    # gli snapshot deduplicati vengono serviti già ricomposti
+    return load_snapshot(path)
 
 
 @app.get("/health")
@@ -0,0 +1,601 @@
+"""Compila gli schemi JSON in funzioni Python (stile fastjsonschema).
+
+Uno schema Draft 2020-12 diventa sorgente Python con una funzione
+``validate(data) -> bool`` che non dipende da ``jsonschema``: niente
+``RefResolver``, niente oggetti ``ValidationError``, solo ``isinstance`` e
+confronti. Il sorgente generato viene salvato su disco con il fingerprint
+dello schema (e dei documenti che referenzia) nel nome, quindi uno schema
+modificato produce un nuovo file invece di riusare quello vecchio.
+
+Il validatore compilato è un filtro conservativo: restituisce ``True`` solo
+se ``Draft202012Validator`` non troverebbe errori, ma può restituire
+``False`` su casi limite che jsonschema accetta (ad es. interi scritti come
+``1.0``). Su ``False`` il chiamante ripete la validazione con jsonschema, che
+produce i messaggi d'errore. Una keyword che il compilatore non conosce
+solleva :class:`SchemaCompileError`, così lo schema resta su jsonschema invece
+di essere validato a metà.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, Tuple
+from urllib.parse import unquote, urldefrag, urljoin
+
+# Da incrementare quando cambia il codice generato: invalida i file in cache.
+COMPILER_VERSION = 1
+
+CompiledValidator = Callable[[object], bool]
+
+# Keyword descrittive, che Draft202012Validator non usa come asserzioni.
+# ``format`` compreso: senza format_checker jsonschema non lo verifica.
+_ANNOTATIONS = frozenset(
+    {
+        "$schema",
+        "$comment",
+        "$defs",
+        "definitions",
+        "title",
+        "description",
+        "default",
+        "examples",
+        "format",
+        "readOnly",
+        "writeOnly",
+        "deprecated",
+        "contentEncoding",
+        "contentMediaType",
+    }
+)
+_KEYWORDS = frozenset(
+    {
+        "$id",
+        "$ref",
+        "type",
+        "enum",
+        "const",
+        "minLength",
+        "maxLength",
+        "pattern",
+        "minimum",
+        "maximum",
+        "exclusiveMinimum",
+        "exclusiveMaximum",
+        "required",
+        "properties",
+        "patternProperties",
+        "additionalProperties",
+        "minProperties",
+        "maxProperties",
+        "items",
+        "minItems",
+        "maxItems",
+        "uniqueItems",
+        "allOf",
+        "anyOf",
+        "oneOf",
+        "not",
+    }
+)
+
+_TYPE_CHECKS = {
+    "object": "isinstance({var}, dict)",
+    "array": "isinstance({var}, list)",
+    "string": "isinstance({var}, str)",
+    "boolean": "isinstance({var}, bool)",
+    "null": "{var} is None",
+    "number": "(isinstance({var}, (int, float)) and not isinstance({var}, bool))",
+    # gli interi scritti come float (1.0) ricadono su jsonschema
+    "integer": "(isinstance({var}, int) and not isinstance({var}, bool))",
+}
+
+# Helper copiati in ogni modulo generato, che resta così autosufficiente.
+_RUNTIME = """
+def _same(one, two):
+    if type(one) is not type(two):
+        return False
+    if isinstance(one, list):
+        return len(one) == len(two) and all(map(_same, one, two))
+    if isinstance(one, dict):
+        return one.keys() == two.keys() and all(_same(one[k], two[k]) for k in one)
+    return one == two
+
+
+def _unique(items):
+    try:
+        return len(set(items)) == len(items)
+    except TypeError:
+        return not any(
+            item == other
+            for index, item in enumerate(items)
+            for other in items[index + 1 :]
+        )
+"""
+
+
+class SchemaCompileError(ValueError):
+    """The schema uses a construct the compiler does not translate."""
+
+
+def _canonical(document: object) -> bytes:
+    return json.dumps(document, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _iter_refs(node: object) -> Iterator[str]:
+    if isinstance(node, Mapping):
+        ref = node.get("$ref")
+        if isinstance(ref, str):
+            yield ref
+        for value in node.values():
+            yield from _iter_refs(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _iter_refs(value)
+
+
+def _lookup_document(store: Mapping[str, Mapping], uri: str) -> Mapping | None:
+    document = store.get(uri)
+    if document is None:
+        # lo store indicizza i file locali anche per nome
+        document = store.get(uri.rsplit("/", 1)[-1])
+    return document
+
+
+def _document_base(document: Mapping, fallback: str) -> str:
+    identifier = document.get("$id")
+    return identifier if isinstance(identifier, str) else fallback
+
+
+def schema_fingerprint(
+    schema: Mapping, store: Mapping[str, Mapping], *, base_uri: str
+) -> str:
+    """sha256 of the schema, every document it references and the compiler."""
+
+    digest = hashlib.sha256(b"schema-compiler-v%d\n" % COMPILER_VERSION)
+    seen: Dict[str, Mapping] = {}
+    pending: List[Tuple[str, Mapping]] = [(_document_base(schema, base_uri), schema)]
+    while pending:
+        base, document = pending.pop()
+        if base in seen:
+            continue
+        seen[base] = document
+        for ref in _iter_refs(document):
+            uri, _ = urldefrag(urljoin(base, ref))
+            target = _lookup_document(store, uri) if uri != base else document
+            if target is None:
+                raise SchemaCompileError(f"Riferimento non risolto: {ref} ({base})")
+            pending.append((_document_base(target, uri), target))
+    for base in sorted(seen):
+        digest.update(base.encode("utf-8") + b"\n" + _canonical(seen[base]) + b"\n")
+    return digest.hexdigest()
+
+
+class _Compiler:
+    def __init__(self, store: Mapping[str, Mapping]) -> None:
+        self._store = store
+        self._functions: Dict[str, str] = {}
+        self._pending: List[Tuple[str, object, str, str]] = []
+        self._constants: List[str] = []
+        self._counter = 0
+
+    def compile(self, schema: Mapping, base_uri: str, title: str) -> str:
+        base = _document_base(schema, base_uri)
+        root = self._function(schema, base, f"{base}#")
+        bodies: List[str] = []
+        while self._pending:
+            name, subschema, sub_base, location = self._pending.pop(0)
+            lines = [f"def {name}(data):"]
+            self._emit(subschema, "data", sub_base, location, lines, 1)
+            lines.append("    return True")
+            bodies.append("\n".join(lines))
+        header = (
+            f'"""Validatore compilato per {title}.\n\n'
+            'Generato da tools/schema_compiler.py: non modificare."""\n\n'
+            "import re as _re"
+        )
+        sections = [header, _RUNTIME.strip(), "\n".join(self._constants), *bodies]
+        sections.append(f"def validate(data):\n    return {root}(data)")
+        return "\n\n\n".join(section for section in sections if section) + "\n"
+
+    def _name(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix}{self._counter}"
+
+    def _constant(self, expression: str) -> str:
+        name = self._name("_c")
+        self._constants.append(f"{name} = {expression}")
+        return name
+
+    def _function(self, schema: object, base: str, location: str) -> str:
+        name = self._functions.get(location)
+        if name is None:
+            name = self._functions[location] = self._name("_v")
+            self._pending.append((name, schema, base, location))
+        return name
+
+    def _resolve(self, ref: str, base: str) -> str:
+        uri, fragment = urldefrag(urljoin(base, ref))
+        document = _lookup_document(self._store, uri)
+        if document is None:
+            raise SchemaCompileError(f"Riferimento non risolto: {ref} ({base})")
+        if fragment and not fragment.startswith("/"):
+            raise SchemaCompileError(f"Ancore non supportate: {ref}")
+        doc_base = _document_base(document, uri)
+        target: object = document
+        for token in fragment.split("/")[1:]:
+            token = unquote(token).replace("~1", "/").replace("~0", "~")
+            try:
+                target = target[int(token) if isinstance(target, list) else token]
+            except (KeyError, IndexError, TypeError, ValueError):
+                raise SchemaCompileError(f"Riferimento non risolto: {ref}") from None
+        return self._function(target, doc_base, f"{doc_base}#{fragment}")
+
+    def _emit(
+        self,
+        schema: object,
+        var: str,
+        base: str,
+        location: str,
+        lines: List[str],
+        depth: int,
+    ) -> None:
+        pad = "    " * depth
+        if schema is True:
+            return
+        if schema is False:
+            lines.append(f"{pad}return False")
+            return
+        if not isinstance(schema, Mapping):
+            raise SchemaCompileError(f"Schema non valido in {location}")
+        unknown = set(schema) - _KEYWORDS - _ANNOTATIONS
+        if unknown:
+            raise SchemaCompileError(
+                f"Keyword non supportate in {location}: {', '.join(sorted(unknown))}"
+            )
+        if "$id" in schema and not location.endswith("#"):
+            raise SchemaCompileError(f"$id annidati non supportati: {location}")
+
+        types = schema.get("type")
+        known: frozenset | None = None
+        if types is not None:
+            names = [types] if isinstance(types, str) else list(types)
+            if not names or any(name not in _TYPE_CHECKS for name in names):
+                raise SchemaCompileError(f"type non supportato in {location}")
+            known = frozenset(names)
+            check = " or ".join(_TYPE_CHECKS[name].format(var=var) for name in names)
+            lines.append(f"{pad}if not ({check}):")
+            lines.append(f"{pad}    return False")
+
+        for keyword in ("enum", "const"):
+            if keyword not in schema:
+                continue
+            values = schema["enum"] if keyword == "enum" else [schema["const"]]
+            if not isinstance(values, list):
+                raise SchemaCompileError(f"enum non valido in {location}")
+            if all(isinstance(value, str) for value in values):
+                allowed = self._constant(f"frozenset({sorted(values)!r})")
+                lines.append(
+                    f"{pad}if not (isinstance({var}, str) and {var} in {allowed}):"
+                )
+            else:
+                allowed = self._constant(repr(tuple(values)))
+                lines.append(f"{pad}if not any(_same({var}, v) for v in {allowed}):")
+            lines.append(f"{pad}    return False")
+
+        for type_name, emitter in (
+            ("string", self._emit_string),
+            ("number", self._emit_number),
+            ("object", self._emit_object),
+            ("array", self._emit_array),
+        ):
+            if not _TYPE_KEYWORDS[type_name] & schema.keys():
+                continue
+            applies = _APPLIES_TO[type_name]
+            if known is not None and not known & applies:
+                continue  # il controllo di type esclude già questo tipo
+            if known is not None and known <= applies:
+                emitter(schema, var, base, location, lines, depth)
+                continue
+            mark = _open(lines, f"{pad}if {_TYPE_CHECKS[type_name].format(var=var)}:")
+            emitter(schema, var, base, location, lines, depth + 1)
+            _close(lines, mark, depth + 1)
+
+        for index, subschema in enumerate(schema.get("allOf", ())):
+            self._emit(subschema, var, base, f"{location}/allOf/{index}", lines, depth)
+        for keyword, template in (
+            ("anyOf", "if not ({calls}):"),
+            ("oneOf", "if ({calls}) != 1:"),
+        ):
+            if keyword not in schema:
+                continue
+            joiner = " or " if keyword == "anyOf" else " + "
+            calls = joiner.join(
+                f"{self._function(sub, base, f'{location}/{keyword}/{index}')}({var})"
+                for index, sub in enumerate(schema[keyword])
+            )
+            lines.append(pad + template.format(calls=calls))
+            lines.append(f"{pad}    return False")
+        if "not" in schema:
+            negated = self._function(schema["not"], base, f"{location}/not")
+            lines.append(f"{pad}if {negated}({var}):")
+            lines.append(f"{pad}    return False")
+        if "$ref" in schema:
+            target = self._resolve(schema["$ref"], base)
+            lines.append(f"{pad}if not {target}({var}):")
+            lines.append(f"{pad}    return False")
+
+    def _emit_string(self, schema, var, base, location, lines, depth) -> None:
+        pad = "    " * depth
+        checks = []
+        if "minLength" in schema:
+            checks.append(f"len({var}) < {int(schema['minLength'])}")
+        if "maxLength" in schema:
+            checks.append(f"len({var}) > {int(schema['maxLength'])}")
+        if "pattern" in schema:
+            pattern = self._constant(f"_re.compile({schema['pattern']!r})")
+            checks.append(f"not {pattern}.search({var})")
+        for check in checks:
+            lines.append(f"{pad}if {check}:")
+            lines.append(f"{pad}    return False")
+
+    def _emit_number(self, schema, var, base, location, lines, depth) -> None:
+        pad = "    " * depth
+        for keyword, operator in (
+            ("minimum", "<"),
+            ("maximum", ">"),
+            ("exclusiveMinimum", "<="),
+            ("exclusiveMaximum", ">="),
+        ):
+            if keyword not in schema:
+                continue
+            bound = schema[keyword]
+            if isinstance(bound, bool) or not isinstance(bound, (int, float)):
+                raise SchemaCompileError(f"{keyword} non numerico in {location}")
+            lines.append(f"{pad}if {var} {operator} {bound!r}:")
+            lines.append(f"{pad}    return False")
+
+    def _emit_object(self, schema, var, base, location, lines, depth) -> None:
+        pad = "    " * depth
+        for keyword, operator in (("minProperties", "<"), ("maxProperties", ">")):
+            if keyword in schema:
+                lines.append(f"{pad}if len({var}) {operator} {int(schema[keyword])}:")
+                lines.append(f"{pad}    return False")
+        if schema.get("required"):
+            names = self._constant(f"frozenset({sorted(schema['required'])!r})")
+            lines.append(f"{pad}if not {var}.keys() >= {names}:")
+            lines.append(f"{pad}    return False")
+
+        properties = schema.get("properties") or {}
+        for name, subschema in properties.items():
+            if _is_trivial(subschema):
+                continue
+            child = self._name("_x")
+            lines.append(f"{pad}if {name!r} in {var}:")
+            lines.append(f"{pad}    {child} = {var}[{name!r}]")
+            self._emit(
+                subschema,
+                child,
+                base,
+                f"{location}/properties/{_escape(name)}",
+                lines,
+                depth + 1,
+            )
+
+        patterns = []
+        for pattern, subschema in (schema.get("patternProperties") or {}).items():
+            compiled = self._constant(f"_re.compile({pattern!r})")
+            patterns.append(compiled)
+            if _is_trivial(subschema):
+                continue
+            key, child = self._name("_k"), self._name("_x")
+            lines.append(f"{pad}for {key}, {child} in {var}.items():")
+            mark = _open(lines, f"{pad}    if {compiled}.search({key}):")
+            self._emit(
+                subschema,
+                child,
+                base,
+                f"{location}/patternProperties/{_escape(pattern)}",
+                lines,
+                depth + 2,
+            )
+            _close(lines, mark, depth + 2)
+
+        additional = schema.get("additionalProperties", True)
+        if _is_trivial(additional):
+            return
+        key, child = self._name("_k"), self._name("_x")
+        conditions = []
+        if properties:
+            declared = self._constant(f"frozenset({sorted(properties)!r})")
+            conditions.append(f"{key} not in {declared}")
+        conditions.extend(f"not {compiled}.search({key})" for compiled in patterns)
+        lines.append(f"{pad}for {key}, {child} in {var}.items():")
+        inner = depth + 1
+        if conditions:
+            lines.append(f"{pad}    if {' and '.join(conditions)}:")
+            inner += 1
+        mark = len(lines)
+        self._emit(
+            additional, child, base, f"{location}/additionalProperties", lines, inner
+        )
+        _close(lines, mark, inner)
+
+    def _emit_array(self, schema, var, base, location, lines, depth) -> None:
+        pad = "    " * depth
+        for keyword, operator in (("minItems", "<"), ("maxItems", ">")):
+            if keyword in schema:
+                lines.append(f"{pad}if len({var}) {operator} {int(schema[keyword])}:")
+                lines.append(f"{pad}    return False")
+        if schema.get("uniqueItems"):
+            lines.append(f"{pad}if not _unique({var}):")
+            lines.append(f"{pad}    return False")
+        if "items" in schema and not _is_trivial(schema["items"]):
+            child = self._name("_x")
+            mark = _open(lines, f"{pad}for {child} in {var}:")
+            self._emit(
+                schema["items"], child, base, f"{location}/items", lines, depth + 1
+            )
+            _close(lines, mark, depth + 1)
+
+
+_TYPE_KEYWORDS = {
+    "string": frozenset({"minLength", "maxLength", "pattern"}),
+    "number": frozenset({"minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum"}),
+    "object": frozenset(
+        {
+            "required",
+            "properties",
+            "patternProperties",
+            "additionalProperties",
+            "minProperties",
+            "maxProperties",
+        }
+    ),
+    "array": frozenset({"items", "minItems", "maxItems", "uniqueItems"}),
+}
+_APPLIES_TO = {
+    "string": frozenset({"string"}),
+    "number": frozenset({"number", "integer"}),
+    "object": frozenset({"object"}),
+    "array": frozenset({"array"}),
+}
+
+
+def _is_trivial(schema: object) -> bool:
+    """``True`` for schemas that accept everything (``true``, ``{}``, annotations)."""
+
+    return schema is True or (
+        isinstance(schema, Mapping) and not set(schema) - _ANNOTATIONS
+    )
+
+
+def _open(lines: List[str], header: str) -> int:
+    lines.append(header)
+    return len(lines)
+
+
+def _close(lines: List[str], mark: int, depth: int) -> None:
+    # un blocco rimasto vuoto (es. sotto-schema senza asserzioni) va chiuso
+    if len(lines) == mark:
+        lines.append("    " * depth + "pass")
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def compile_schema(
+    schema: Mapping,
+    store: Mapping[str, Mapping],
+    *,
+    base_uri: str,
+    title: str = "schema",
+) -> str:
+    """Return the Python source of a ``validate(data) -> bool`` for ``schema``.
+
+    ``store`` maps ``$id`` URIs (or file names) to the documents that
+    ``$ref`` may point to, like the jsonschema resolver store.
+    """
+
+    documents = dict(store)
+    documents.setdefault(_document_base(schema, base_uri), schema)
+    return _Compiler(documents).compile(schema, base_uri, title)
+
+
+def load_validator(source: str, filename: str = "<schema>") -> CompiledValidator:
+    """Execute generated source and return its ``validate`` function."""
+
+    namespace: Dict[str, object] = {}
+    try:
+        exec(compile(source, filename, "exec"), namespace)
+    except SyntaxError as exc:  # es. troppi blocchi annidati
+        raise SchemaCompileError(f"Sorgente generato non valido: {exc}") from exc
+    return _validate_function(namespace, filename)
+
+
+def _import_validator(path: Path) -> CompiledValidator:
+    # import dal file invece di exec: il bytecode finisce in __pycache__ e i
+    # processi successivi saltano anche la compilazione del sorgente
+    spec = importlib.util.spec_from_file_location(
+        f"_schema_validator_{path.stem.replace('-', '_')}", path
+    )
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except SyntaxError as exc:
+        raise SchemaCompileError(f"Sorgente generato non valido: {exc}") from exc
+    return _validate_function(vars(module), str(path))
+
+
+def _validate_function(
+    namespace: Mapping[str, object], filename: str
+) -> CompiledValidator:
+    validate = namespace.get("validate")
+    if not callable(validate):
+        raise SchemaCompileError(f"{filename} non definisce validate()")
+    return validate  # type: ignore[return-value]
+
+
+def _private_cache_dir(cache_dir: Path) -> bool:
+    """Create ``cache_dir`` and check nobody else can plant code in it."""
+
+    cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not hasattr(os, "getuid"):  # pragma: no cover - Windows
+        return True
+    info = cache_dir.stat()
+    return info.st_uid == os.getuid() and not info.st_mode & 0o022
+
+
+def cached_validator(
+    schema: Mapping,
+    store: Mapping[str, Mapping],
+    *,
+    base_uri: str,
+    name: str,
+    cache_dir: Path | None,
+) -> Tuple[CompiledValidator, bool]:
+    """Load the compiled validator of ``schema`` from ``cache_dir`` or build it.
+
+    The file is ``<name>-<fingerprint>.py``; the flag is ``True`` when the
+    source was generated now. Without ``cache_dir`` (or when the directory is
+    not private to the current user) the source is compiled in memory only.
+    """
+
+    fingerprint = schema_fingerprint(schema, store, base_uri=base_uri)
+    path: Path | None = None
+    if cache_dir is not None and _private_cache_dir(cache_dir):
+        path = cache_dir / f"{name.split('.', 1)[0]}-{fingerprint[:16]}.py"
+        if path.is_file():
+            try:
+                return _import_validator(path), False
+            except SchemaCompileError:
+                pass  # file illeggibile: si rigenera
+
+    source = compile_schema(
+        schema, store, base_uri=base_uri, title=f"{name} (sha256 {fingerprint})"
+    )
+    if path is None:
+        return load_validator(source, f"<{name}>"), True
+    _atomic_write(path, source.encode("utf-8"))
+    return _import_validator(path), True
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    descriptor, raw_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".part"
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        # resta 0600 come lo crea mkstemp: è codice che verrà eseguito
+        os.replace(raw_path, path)
+    except BaseException:
+        Path(raw_path).unlink(missing_ok=True)
+        raise
@@ -0,0 +1,300 @@
+"""Helper di validazione degli schemi condivisi da API e harvester.
+
+``src/app.py`` only needs :func:`schema_for_mode` and
+:func:`validate_with_schema`; importing them from ``tools.generate_build_db``
+dragged httpx, jinja2 and the whole harvester into every API worker. This
+module depends on the standard library only: ``jsonschema`` is imported by
+:func:`get_validator` the first time a payload is validated.
+
+The build schemas also get a validator compiled to plain Python by
+:mod:`tools.schema_compiler` and cached on disk. Valid payloads — the common
+case for the API stub and the harvester — are accepted by the compiled
+function alone; jsonschema only runs when that check fails, so error messages
+are exactly the ones jsonschema reports.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Mapping
+
+from tools.schema_compiler import (
+    CompiledValidator,
+    SchemaCompileError,
+    cached_validator,
+)
+
+if TYPE_CHECKING:  # pragma: no cover - solo per i type checker
+    from jsonschema import Draft202012Validator
+
+DEFAULT_REFERENCE_DIR = Path(__file__).resolve().parent.parent / "data" / "reference"
+SCHEMAS_DIR = Path(__file__).resolve().parent.parent / "schemas"
+BUILD_SCHEMA_MAP = {
+    "core": "build_core.schema.json",
+    "extended": "build_extended.schema.json",
+    "full-pg": "build_full_pg.schema.json",
+}
+# Validatori compilati per gli schemi di build (vedi tools/schema_compiler.py):
+# SCHEMA_COMPILED_VALIDATORS=false torna a usare solo jsonschema.
+COMPILED_SCHEMAS = frozenset(BUILD_SCHEMA_MAP.values())
+COMPILED_VALIDATORS_ENABLED = os.environ.get(
+    "SCHEMA_COMPILED_VALIDATORS", "true"
+).lower() in ("1", "true", "yes", "y")
+COMPILED_VALIDATOR_DIR = Path(
+    os.environ.get(
+        "SCHEMA_VALIDATOR_CACHE_DIR",
+        str(Path(tempfile.gettempdir()) / "master_dd_schema_validators"),
+    )
+)
+
+
+def now_iso_utc() -> str:
+    return (
+        datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+    )
+
+
+def load_reference_manifest(
+    reference_dir: Path | None = None,
+) -> Mapping[str, object]:
+    directory = reference_dir or DEFAULT_REFERENCE_DIR
+    manifest_path = directory / "manifest.json"
+    if not manifest_path.is_file():
+        return {}
+
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except Exception as exc:  # pragma: no cover - defensive log
+        logging.warning("Impossibile leggere il manifest del catalogo: %s", exc)
+        return {}
+
+    if not isinstance(manifest, Mapping):
+        return {}
+
+    return manifest
+
+
+_reference_manifest_cache: dict[str, Mapping[str, object]] = {}
+
+
+def get_reference_manifest(reference_dir: Path | None = None) -> Mapping[str, object]:
+    directory = (reference_dir or DEFAULT_REFERENCE_DIR).resolve()
+    key = str(directory)
+    cached = _reference_manifest_cache.get(key)
+    if cached is not None:
+        return cached
+    manifest = load_reference_manifest(directory)
+    _reference_manifest_cache[key] = manifest
+    return manifest
+
+
+_validator_cache: dict[str, Draft202012Validator] = {}
+_schema_store: dict[str, Mapping] = {}
+
+
+def _bootstrap_schema_store() -> None:
+    """Preload every local schema so $id references resolve offline."""
+
+    if _schema_store.get("__bootstrapped__"):
+        return
+
+    for path in SCHEMAS_DIR.glob("*.schema.json"):
+        schema = json.loads(path.read_text(encoding="utf-8"))
+        _schema_store[path.name] = schema
+        if "$id" in schema:
+            _schema_store[schema["$id"]] = schema
+
+    _schema_store["__bootstrapped__"] = {"loaded": True}
+
+
+def _load_validator(schema_filename: str) -> Draft202012Validator:
+    # jsonschema (con referencing/rpds) si carica alla prima validazione
+    from jsonschema import Draft202012Validator, RefResolver
+
+    _bootstrap_schema_store()
+    path = SCHEMAS_DIR / schema_filename
+    if not path.is_file():
+        raise FileNotFoundError(f"Schema non trovato: {path}")
+
+    schema = json.loads(path.read_text(encoding="utf-8"))
+    _schema_store[schema_filename] = schema
+    if "$id" in schema:
+        _schema_store[schema["$id"]] = schema
+    resolver = RefResolver(
+        base_uri=path.resolve().as_uri(), referrer=schema, store=_schema_store
+    )
+    return Draft202012Validator(schema, resolver=resolver)
+
+
+def get_validator(schema_filename: str) -> Draft202012Validator:
+    if schema_filename not in _validator_cache:
+        _validator_cache[schema_filename] = _load_validator(schema_filename)
+    return _validator_cache[schema_filename]
+
+
+_compiled_cache: dict[str, CompiledValidator | None] = {}
+
+
+def get_compiled_validator(schema_filename: str) -> CompiledValidator | None:
+    """Compiled fast-path validator for ``schema_filename``, if available.
+
+    ``None`` when compiled validators are disabled, the schema is not one of
+    ``COMPILED_SCHEMAS`` or it cannot be compiled; callers then use
+    :func:`get_validator` directly.
+    """
+
+    if not COMPILED_VALIDATORS_ENABLED or schema_filename not in COMPILED_SCHEMAS:
+        return None
+    if schema_filename in _compiled_cache:
+        return _compiled_cache[schema_filename]
+
+    _bootstrap_schema_store()
+    path = SCHEMAS_DIR / schema_filename
+    compiled: CompiledValidator | None = None
+    try:
+        schema = json.loads(path.read_text(encoding="utf-8"))
+        compiled, _ = cached_validator(
+            schema,
+            _schema_store,
+            base_uri=path.resolve().as_uri(),
+            name=schema_filename,
+            cache_dir=COMPILED_VALIDATOR_DIR,
+        )
+    except (OSError, SchemaCompileError) as exc:
+        logging.warning(
+            "Validatore compilato non disponibile per %s, uso jsonschema: %s",
+            schema_filename,
+            exc,
+        )
+    _compiled_cache[schema_filename] = compiled
+    return compiled
+
+
+def schema_for_mode(mode: str) -> str:
+    normalized = str(mode or "").lower()
+    if normalized.startswith("core"):
+        return BUILD_SCHEMA_MAP["core"]
+    if normalized.startswith("extended"):
+        return BUILD_SCHEMA_MAP["extended"]
+    return BUILD_SCHEMA_MAP["full-pg"]
+
+
+def validate_with_schema(
+    schema_filename: str, payload: Mapping, context: str, *, strict: bool
+) -> str | None:
+    augmented_payload = payload
+
+    # Reference catalog entries are lists, not mappings; only inject metadata when
+    # a mapping payload is provided. This prevents attempting to coerce a list
+    # to a dict, which raises a ValueError and stops report generation.
+    if isinstance(payload, Mapping) and "reference_catalog_version" not in payload:
+        manifest_version = (get_reference_manifest() or {}).get("version")
+        if manifest_version:
+            augmented_payload = dict(payload)
+            augmented_payload["reference_catalog_version"] = str(manifest_version)
+
+    if schema_filename in BUILD_SCHEMA_MAP.values():
+        needs_copy = augmented_payload is payload
+        base_payload = dict(augmented_payload) if needs_copy else augmented_payload
+        composite_payload: Mapping | None = None
+        build_bundle: Mapping | None = None
+        if isinstance(base_payload.get("composite"), Mapping):
+            composite_payload = (
+                dict(base_payload["composite"])
+                if base_payload["composite"] is augmented_payload.get("composite")
+                else base_payload["composite"]
+            )
+            build_bundle = (
+                dict(composite_payload.get("build", {}))
+                if isinstance(composite_payload.get("build"), Mapping)
+                else None
+            )
+
+        build_defaults = "stub-build-id-00000000000000000000000000000000"
+        if "build_id" not in base_payload:
+            base_payload["build_id"] = build_defaults
+            needs_copy = False
+        if build_bundle is not None and "build_id" not in build_bundle:
+            build_bundle["build_id"] = build_defaults
+
+        step_audit_defaults = base_payload.get("step_audit")
+        if "step_audit" not in base_payload:
+            step_labels = (
+                base_payload.get("build_state", {}).get("step_labels", {})
+                if isinstance(base_payload.get("build_state"), Mapping)
+                else {}
+            )
+            step_total = (
+                base_payload.get("build_state", {}).get("step_total")
+                if isinstance(base_payload.get("build_state"), Mapping)
+                else None
+            )
+            mode = (
+                base_payload.get("mode")
+                or base_payload.get("build_state", {}).get("mode")
+                if isinstance(base_payload.get("build_state"), Mapping)
+                else None
+            )
+            step_audit_defaults = {
+                "request_timestamp": now_iso_utc(),
+                "client_fingerprint_hash": (
+                    "stub-fingerprint-00000000000000000000000000000000"
+                ),
+                "outcome": "accepted",
+                "attempt_count": 1,
+                "backoff_reason": None,
+                "normalized_mode": str(mode).lower() or None,
+                "expected_step_total": step_total,
+                "observed_step_total": step_total,
+                "step_total_ok": bool(step_total),
+                "step_labels_count": len(step_labels) if step_labels else None,
+                "has_extended_steps": (str(mode).lower() == "extended"),
+            }
+            base_payload["step_audit"] = step_audit_defaults
+            needs_copy = False
+        if build_bundle is not None and "step_audit" not in build_bundle:
+            build_bundle["step_audit"] = base_payload.get(
+                "step_audit", step_audit_defaults
+            )
+
+        if composite_payload is not None and build_bundle is not None:
+            composite_payload["build"] = build_bundle
+            base_payload["composite"] = composite_payload
+        augmented_payload = base_payload
+
+    compiled = get_compiled_validator(schema_filename)
+    if compiled is not None and compiled(augmented_payload):
+        return None
+
+    validator = get_validator(schema_filename)
+    errors = sorted(validator.iter_errors(augmented_payload), key=lambda err: err.path)
+    if not errors:
+        return None
+
+    message = "; ".join(error.message for error in errors)
+    log_fn = logging.error if strict else logging.warning
+    log_fn(
+        "Payload %s non valido (%s): %s",
+        context,
+        schema_filename,
+        message,
+        extra={
+            "event": "schema_validation_failed",
+            "context": context,
+            "schema": schema_filename,
+            "errors": [error.message for error in errors],
+            "paths": [
+                "/".join(str(segment) for segment in error.path) for error in errors
+            ],
+        },
+    )
+    if strict:
+        from jsonschema.exceptions import ValidationError
+
+        raise ValidationError(message)
+    return message